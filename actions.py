@@ -1,6 +1,6 @@
 from node import Node
 from networkx.readwrite import json_graph
-import copy
+from undo import AddNodeCommand, UndoCommand
 
 class Action:
     def execute(self, editor):
@@ -13,26 +13,26 @@ class NoOpAction(Action):
 
 class AddNodeAction(Action):
     def execute(self, editor):
-        editor._sync_node_names_to_graph()
-        editor.undo_stack.push(copy.deepcopy(editor.nx_graph))
         center_x = editor.screen.get_width() // 2
         center_y = editor.screen.get_height() // 2
         world_x = (center_x + editor.panning_state.offset_x * editor.zoom) / editor.zoom
         world_y = (center_y + editor.panning_state.offset_y * editor.zoom) / editor.zoom
         node = Node(world_x, world_y, editor.next_node_id)
-        editor.nodes.append(node)
-        editor.nx_graph.add_node(editor.next_node_id,name=node.node_name, pos=(world_x, world_y))
-        editor.next_node_id += 1
+        editor.apply_command(AddNodeCommand(node))
 
 class DeleteAllAction(Action):
     def execute(self, editor):
         # Clear the undo stack so clear all cannot be undone
         editor.undo_stack.clear()
-        editor.nodes.clear()
-        editor.connections.clear()
-        editor.nx_graph.clear()
+        # Nodes of a lazily opened file must not be loaded again
+        editor.graph_persistence.close_lazy()
+        editor.selection.clear_selection(editor.nodes)
+        editor.marked_connection = None
+        editor.model.clear()
         editor.next_node_id = 1
         editor.selected_node = None
+        editor.damage.add_full()
+        editor._journal_reset()
 
 class DumpGraphAction(Action):
     def execute(self, editor):
@@ -42,17 +42,22 @@ class DumpGraphAction(Action):
         print("=== Undo Stack (most recent last) ===")
         for i, g in enumerate(editor.undo_stack.stack):
             print(f"UndoStack[{i}]: {g}")
-            pprint(json_graph.node_link_data(g, edges="edges"))
+            if not isinstance(g, UndoCommand):
+                pprint(json_graph.node_link_data(g, edges="edges"))
         print("======================")
 
 class UndoAction(Action):
     def execute(self, editor):
         editor.undo()
 
+class RedoAction(Action):
+    def execute(self, editor):
+        editor.redo()
+
 class SaveGraphAction(Action):
     def execute(self, editor):
-        editor.save_graph()
+        editor.graph_persistence.save_graph_async()
 
 class LoadGraphAction(Action):
     def execute(self, editor):
-        editor.load_graph()
+        editor.graph_persistence.load_graph_async()
@@ -0,0 +1,41 @@
+import threading
+
+
+class BackgroundJob:
+    """
+    Runs work(job) on a daemon thread.
+
+    The work reports its progress with job.report(fraction). The main thread
+    checks finished() once per frame and then collects result(), which
+    re-raises an exception the work ended with.
+    """
+    def __init__(self, label, work):
+        self.label = label
+        self.progress = 0.0
+        self._result = None
+        self._error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(work,), name=label, daemon=True)
+        self._thread.start()
+
+    def _run(self, work):
+        try:
+            self._result = work(self)
+        except Exception as error:  # Handed to the main thread by result()
+            self._error = error
+        finally:
+            self._done.set()
+
+    def report(self, fraction):
+        self.progress = max(0.0, min(1.0, fraction))
+
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        return self._result
@@ -0,0 +1,68 @@
+"""
+Time of drawing unlabeled connections one by one versus as a batch.
+
+Run from the project directory:
+    uv run python -m benchmarks.bench_edges
+"""
+import os
+import random
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+from connection import Connection
+from constants import WINDOW_WIDTH, WINDOW_HEIGHT
+from node import Node
+from renderer import draw_connection_batch
+
+EDGE_COUNTS = (1_000, 10_000, 100_000)
+FRAMES = 5
+OFFSET_X = 0.0
+OFFSET_Y = 0.0
+ZOOM = 1.0
+
+
+def make_connections(count, seed=0):
+    # Nodes spread over the window, each edge joins two nodes close to each other
+    rng = random.Random(seed)
+    nodes = [Node(rng.uniform(0, WINDOW_WIDTH), rng.uniform(0, WINDOW_HEIGHT), i)
+             for i in range(max(2, count // 4))]
+    nodes.sort(key=lambda node: (node.x, node.y))
+    connections = []
+    for _ in range(count):
+        i = rng.randrange(len(nodes) - 1)
+        j = min(len(nodes) - 1, i + rng.randint(1, 8))
+        connections.append(Connection(nodes[i], nodes[j]))
+    return connections
+
+
+def draw_per_edge(screen, connections):
+    for conn in connections:
+        conn.draw(screen, OFFSET_X, OFFSET_Y, zoom=ZOOM)
+
+
+def draw_batched(screen, connections):
+    draw_connection_batch(screen, connections, OFFSET_X, OFFSET_Y, ZOOM, max(1, int(2 * ZOOM)))
+
+
+def time_frames(draw, screen, connections, frames=FRAMES):
+    start = time.perf_counter()
+    for _ in range(frames):
+        screen.fill((0, 0, 0))
+        draw(screen, connections)
+    return (time.perf_counter() - start) / frames * 1000.0
+
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    print(f"{'edges':>8} {'per-edge ms':>12} {'batched ms':>11} {'speedup':>8}")
+    for count in EDGE_COUNTS:
+        connections = make_connections(count)
+        per_edge = time_frames(draw_per_edge, screen, connections)
+        batched = time_frames(draw_batched, screen, connections)
+        print(f"{count:>8} {per_edge:>12.2f} {batched:>11.2f} {per_edge / batched:>7.1f}x")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
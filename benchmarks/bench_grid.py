@@ -0,0 +1,61 @@
+"""
+Frame time of the background grid across zoom levels.
+
+Run from the project directory:
+    uv run python -m benchmarks.bench_grid
+"""
+import os
+import time
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+from canvas_panning import CanvasPanning
+from constants import (BLUEPRINT_COLOR, BLUEPRINT_LINE_COLOR, BLUEPRINT_GRID_SIZE,
+                       TOOLBAR_WIDTH, WINDOW_WIDTH, WINDOW_HEIGHT)
+from renderer import GridRenderer
+
+ZOOM_LEVELS = (0.1, 0.25, 0.5, 1.0, 2.0)
+FRAMES = 200
+
+
+def draw_grid_lines(screen, panning_state, zoom):
+    # Reference: one draw call per grid line, as GridRenderer did before caching
+    screen.fill(BLUEPRINT_COLOR)
+    grid_size = BLUEPRINT_GRID_SIZE * zoom
+    screen_w = screen.get_width()
+    screen_h = screen.get_height()
+    x = TOOLBAR_WIDTH - (panning_state.offset_x % BLUEPRINT_GRID_SIZE) * zoom
+    while x < screen_w:
+        pygame.draw.line(screen, BLUEPRINT_LINE_COLOR, (x, 0), (x, screen_h))
+        x += grid_size
+    y = - (panning_state.offset_y % BLUEPRINT_GRID_SIZE) * zoom
+    while y < screen_h:
+        pygame.draw.line(screen, BLUEPRINT_LINE_COLOR, (TOOLBAR_WIDTH, y), (screen_w, y))
+        y += grid_size
+
+
+def time_frames(draw, screen, zoom, frames=FRAMES):
+    panning_state = CanvasPanning()
+    start = time.perf_counter()
+    for i in range(frames):
+        # Pan a little every frame so the pattern offset changes
+        panning_state.offset_x = i * 3.7
+        panning_state.offset_y = i * 1.3
+        draw(screen, panning_state, zoom)
+    return (time.perf_counter() - start) / frames * 1000.0
+
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    print(f"{'zoom':>6} {'lines ms':>10} {'cached ms':>10} {'first ms':>10} {'speedup':>8}")
+    for zoom in ZOOM_LEVELS:
+        grid_renderer = GridRenderer()
+        first = time_frames(grid_renderer.draw, screen, zoom, frames=1)
+        cached = time_frames(grid_renderer.draw, screen, zoom)
+        lines = time_frames(draw_grid_lines, screen, zoom)
+        print(f"{zoom:>6.2f} {lines:>10.3f} {cached:>10.3f} {first:>10.3f} {lines / cached:>7.1f}x")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Time to the first drawn frame when opening a large graph file fully versus
+lazily from a memory map. The full load is skipped above FULL_LOAD_LIMIT
+nodes, where it takes minutes.
+
+Run from the project directory:
+    uv run python -m benchmarks.bench_lazy_load
+"""
+import os
+import tempfile
+import time
+import pygame
+from graph_format import write_tables
+
+NODE_COUNTS = (10_000, 100_000, 1_000_000)
+SPACING = 60
+FULL_LOAD_LIMIT = 100_000
+
+
+def write_file(path, node_count):
+    # Square grid of nodes, each connected to its right neighbour
+    side = int(node_count ** 0.5) + 1
+    nodes = [(i, f"Node {i}", ((i % side) * SPACING, (i // side) * SPACING)) for i in range(node_count)]
+    edges = [(i, i + 1, "") for i in range(node_count - 1) if (i + 1) % side]
+    with open(path, "wb") as f:
+        write_tables(nodes, edges, f)
+
+
+def first_frame(path, lazy):
+    from editor import NodeEditor
+    editor = NodeEditor(headless=True)
+    start = time.perf_counter()
+    if lazy:
+        editor.graph_persistence.open_graph_lazy(path)
+    else:
+        editor.load_graph(path)
+    editor.draw([])
+    elapsed = (time.perf_counter() - start) * 1000.0
+    nodes = len(editor.nodes)
+    editor.graph_persistence.close_lazy()
+    return elapsed, nodes
+
+
+def main():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    print(f"{'nodes':>9} {'open':>5} {'first frame ms':>15} {'in scene':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for node_count in NODE_COUNTS:
+            path = os.path.join(directory, "graph.ngraph")
+            write_file(path, node_count)
+            for name, lazy in (("full", False), ("lazy", True)):
+                if not lazy and node_count > FULL_LOAD_LIMIT:
+                    print(f"{node_count:>9} {name:>5} {'skipped':>15}")
+                    continue
+                elapsed, nodes = first_frame(path, lazy)
+                print(f"{node_count:>9} {name:>5} {elapsed:>15.1f} {nodes:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Time to build the editor scene from a loaded graph: the previous
+node-by-node remapping versus the bulk import, for 100k nodes.
+
+Run from the project directory:
+    uv run python -m benchmarks.bench_load_remap
+"""
+import os
+import time
+import networkx as nx
+import pygame
+from connection import Connection
+from node import Node
+
+NODE_COUNT = 100_000
+
+
+def make_graph(node_count, unusable_share=0.0):
+    # Every 1/unusable_share-th node gets a string id the editor cannot use
+    step = int(1 / unusable_share) if unusable_share else 0
+    ids = [f"n{i}" if step and i % step == 0 else i + 1 for i in range(node_count)]
+    graph = nx.DiGraph()
+    graph.add_nodes_from((node_id, {"name": f"Node {i}", "pos": (i * 1.5, i * 0.5)}) for i, node_id in enumerate(ids))
+    graph.add_edges_from((ids[i], ids[i + 1], {"label": "" if i % 5 else f"e{i}"}) for i in range(node_count - 1))
+    return graph
+
+
+def build_scene_previous(graph):
+    # The remapping load_graph used before the bulk import, kept for comparison
+    nodes = []
+    connections = []
+    id_to_node = {}
+    used_ids = set()
+    for orig_id, data in graph.nodes(data=True):
+        x, y = data.get('pos', (0, 0))
+        node_id = orig_id
+        while node_id in used_ids:
+            node_id += 1
+        used_ids.add(node_id)
+        node = Node(x, y, node_id)
+        node.node_name = data.get('name', node.node_name)
+        id_to_node[orig_id] = node
+        nodes.append(node)
+        if node_id != orig_id:
+            graph.remove_node(orig_id)
+            graph.add_node(node_id, **data)
+    old_to_new_id = {orig_id: node.id for orig_id, node in id_to_node.items()}
+    edges = list(graph.edges(data=True))
+    graph.clear_edges()
+    for u, v, data in edges:
+        graph.add_edge(old_to_new_id.get(u, u), old_to_new_id.get(v, v), **data)
+    for u, v, data in list(graph.edges(data=True)):
+        if u in id_to_node and v in id_to_node:
+            connections.append(Connection(id_to_node[u], id_to_node[v], label=data.get('label', "")))
+    return graph, nodes, connections
+
+
+def timed(func, make_input, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        argument = make_input()
+        start = time.perf_counter()
+        func(argument)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def main():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    from editor import NodeEditor
+    persistence = NodeEditor(headless=True).graph_persistence
+    print(f"{'ids':>16} {'previous ms':>12} {'bulk ms':>9}")
+    previous = timed(build_scene_previous, lambda: make_graph(NODE_COUNT))
+    bulk = timed(lambda graph: persistence._create_scene(*persistence._build_scene(graph)),
+                 lambda: make_graph(NODE_COUNT))
+    print(f"{'all usable':>16} {previous:>12.1f} {bulk:>9.1f}")
+    # The previous code cannot create nodes with string ids at all
+    bulk = timed(lambda graph: persistence._create_scene(*persistence._build_scene(graph)),
+                 lambda: make_graph(NODE_COUNT, 0.1))
+    print(f"{'10% remapped':>16} {'-':>12} {bulk:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
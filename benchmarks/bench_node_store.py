@@ -0,0 +1,60 @@
+"""
+Memory per node and the time of the vectorized node paths.
+
+Run from the project directory:
+    uv run python -m benchmarks.bench_node_store
+"""
+import os
+import time
+import tracemalloc
+import pygame
+from node import Node
+
+NODE_COUNT = 100_000
+
+
+def memory_per_node(node_count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [Node(i * 1.5, i * 0.5, i + 1) for i in range(node_count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the nodes is not part of their cost
+    return (after - before) / node_count - 8, nodes
+
+
+def timed(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def main():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    from editor import NodeEditor
+    from selection import NodeSelection
+    per_node, nodes = memory_per_node(NODE_COUNT)
+    print(f"{'memory per node':<28} {per_node:>9.0f} bytes")
+    editor = NodeEditor(headless=True)
+    selection = NodeSelection()
+
+    def select_all():
+        selection.begin((-10**9, -10**9))
+        selection.update((10**9, 10**9))
+        selection.finish(nodes, 0, 0, 1.0)
+
+    def read_positions():
+        for node in nodes:
+            node.x, node.y
+    editor.zoom = 0.1
+    print(f"{'rubber band, 100k nodes':<28} {timed(select_all):>9.1f} ms")
+    print(f"{'node rects, 100k nodes':<28} {timed(lambda: editor.renderer._draw_node_rects(nodes, True)):>9.1f} ms")
+    print(f"{'read x, y of 100k nodes':<28} {timed(read_positions):>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Save and load time of the binary graph format versus pickle.
+
+"binary" saves a networkx graph, which includes copying its attributes
+out with snapshot_tables. "tables" only writes tables taken beforehand,
+which is what the editor's save job does: its snapshot comes from the
+node store, not from networkx.
+
+Run from the project directory:
+    uv run python -m benchmarks.bench_persistence
+"""
+import os
+import pickle
+import tempfile
+import time
+import networkx as nx
+from graph_format import read_graph, snapshot_tables, write_graph, write_tables
+from graph_persistence import read_legacy_graph
+
+NODE_COUNTS = (10_000, 100_000)
+
+
+def make_graph(node_count):
+    graph = nx.DiGraph()
+    graph.add_nodes_from((i, {"name": f"Node {i}", "pos": (i * 1.5, i * 0.5)}) for i in range(node_count))
+    graph.add_edges_from((i, i + 1, {"label": "" if i % 5 else f"e{i}"}) for i in range(node_count - 1))
+    return graph
+
+
+def timed(func, repeat=3):
+    # Best of a few runs, a single run is dominated by noise
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def main():
+    print(f"{'nodes':>8} {'format':>7} {'save ms':>9} {'load ms':>9} {'size KiB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for node_count in NODE_COUNTS:
+            graph = make_graph(node_count)
+            binary_path = os.path.join(directory, "graph.ngraph")
+            pickle_path = os.path.join(directory, "graph.gpickle")
+
+            def save_binary():
+                with open(binary_path, "wb") as f:
+                    write_graph(graph, f)
+
+            tables = snapshot_tables(graph)
+
+            def save_tables():
+                with open(binary_path, "wb") as f:
+                    write_tables(*tables, f)
+
+            def load_binary():
+                with open(binary_path, "rb") as f:
+                    read_graph(f)
+
+            def save_pickle():
+                with open(pickle_path, "wb") as f:
+                    pickle.dump(graph, f)
+
+            def load_pickle():
+                with open(pickle_path, "rb") as f:
+                    read_legacy_graph(f)
+
+            for name, save, load, path in (("binary", save_binary, load_binary, binary_path),
+                                           ("tables", save_tables, load_binary, binary_path),
+                                           ("pickle", save_pickle, load_pickle, pickle_path)):
+                save_ms = timed(save)
+                load_ms = timed(load)
+                size = os.path.getsize(path) / 1024
+                print(f"{node_count:>8} {name:>7} {save_ms:>9.1f} {load_ms:>9.1f} {size:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Headless benchmarks of the editor hot paths on synthetic graphs.
+
+Times rendering, hit-testing, undo, save/load, rubber-band selection and
+node dragging, prints a table and optionally writes the results as JSON
+so runs of different releases can be compared.
+
+Run from the project directory:
+    uv run python -m benchmarks.bench_suite --nodes 1000 --edges 2000 --json results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+from benchmarks.synthetic import populate
+from constants import MAX_ZOOM
+from editor import NodeEditor
+from undo import MoveNodeCommand
+
+SCHEMA_VERSION = 1
+
+
+def measure(func, repeat, warmup=1):
+    """Call func repeat times and return the per-call times in milliseconds."""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return times
+
+
+def summarize(times):
+    ordered = sorted(times)
+    return {
+        "runs": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "median_ms": statistics.median(ordered),
+        "min_ms": ordered[0],
+        "max_ms": ordered[-1],
+        "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+    }
+
+
+def make_editor(node_count, edge_count, seed):
+    editor = NodeEditor()
+    editor.zoom = 1.0
+    editor.panning_state.offset_x = 0
+    editor.panning_state.offset_y = 0
+    nodes = populate(editor, node_count, edge_count, seed=seed)
+    return editor, nodes
+
+
+def bench_draw(editor, zoom):
+    def run():
+        editor.zoom = zoom
+        editor.renderer.draw([])
+    return run
+
+
+def bench_hit_test(editor, nodes, rng, queries=100):
+    # Half the points hit a node, the other half land between nodes
+    points = []
+    for _ in range(queries // 2):
+        node = rng.choice(nodes)
+        points.append((node.x + node.width / 2, node.y + node.height / 2))
+        points.append((node.x - 20, node.y + node.height / 2))
+
+    def run():
+        for x, y in points:
+            if editor._find_node_at(x, y) is None:
+                editor._find_connection_at(x, y)
+    return run
+
+
+def bench_undo_commands(editor, nodes, rng):
+    node = rng.choice(nodes)
+    old_pos = (node.x, node.y)
+    new_pos = (node.x + 10, node.y + 10)
+
+    def run():
+        editor.apply_command(MoveNodeCommand(node, old_pos, new_pos))
+        editor.undo()
+        editor.redo()
+        editor.undo()
+    return run
+
+
+def bench_undo_snapshot(editor):
+    # Legacy path: the whole graph per entry, built from the model like the editor does
+    def run():
+        editor.undo_stack.push(editor.nx_graph, copy_graph=False)
+        editor.undo_stack.pop()
+    return run
+
+
+def bench_rubber_band(editor):
+    screen_w, screen_h = editor.screen.get_size()
+    selection = editor.selection
+
+    def run():
+        selection.begin((editor.toolbar.width, 0))
+        for step in range(1, 11):
+            # Every step also updates the live preview
+            selection.update((editor.toolbar.width + screen_w * step / 10, screen_h * step / 10),
+                             editor.panning_state.offset_x, editor.panning_state.offset_y, editor.zoom)
+        selection.finish(editor.nodes, editor.panning_state.offset_x, editor.panning_state.offset_y, editor.zoom)
+    return run
+
+
+def bench_drag(editor, nodes, steps=50):
+    node = min(nodes, key=lambda n: (n.y, n.x))
+    start = (int(node.x + node.width / 2), int(node.y + node.height / 2))
+
+    def run():
+        editor.dispatch_event(pygame.event.Event(
+            pygame.MOUSEBUTTONDOWN, pos=start, button=pygame.BUTTON_LEFT))
+        pos = start
+        for step in range(1, steps + 1):
+            new_pos = (start[0] + step, start[1] + step // 2)
+            editor.dispatch_event(pygame.event.Event(
+                pygame.MOUSEMOTION, pos=new_pos, rel=(new_pos[0] - pos[0], new_pos[1] - pos[1]), buttons=(1, 0, 0)))
+            pos = new_pos
+        editor.dispatch_event(pygame.event.Event(
+            pygame.MOUSEBUTTONUP, pos=pos, button=pygame.BUTTON_LEFT))
+        # Put the node back so every run drags the same distance
+        editor.undo()
+    return run
+
+
+def bench_group_drag(editor, nodes, steps=50):
+    # The whole graph selected and dragged by one of its nodes
+    drag = bench_drag(editor, nodes, steps)
+
+    def run():
+        editor.selection.select_nodes(nodes)
+        drag()
+        editor.selection.clear_selection(nodes)
+    return run
+
+
+def bench_save(editor, path):
+    def run():
+        editor.graph_persistence.save_graph(path)
+    return run
+
+
+def bench_load(editor, path):
+    def run():
+        editor.graph_persistence.load_graph(path)
+    return run
+
+
+def run_suite(node_count, edge_count, repeat, seed=0):
+    """Run every benchmark once and return the results as a JSON-ready dict."""
+    pygame.init()
+    rng = random.Random(seed)
+    editor, nodes = make_editor(node_count, edge_count, seed)
+    cases = [
+        ("draw_full_zoom", bench_draw(editor, 1.0)),
+        ("draw_zoomed_out", bench_draw(editor, 0.15)),
+        # As far in as the editor zooms, most nodes offscreen behind the border markers
+        ("draw_zoomed_in", bench_draw(editor, MAX_ZOOM)),
+        ("hit_test_100", bench_hit_test(editor, nodes, rng)),
+        ("undo_command", bench_undo_commands(editor, nodes, rng)),
+        ("undo_snapshot", bench_undo_snapshot(editor)),
+        ("rubber_band_select", bench_rubber_band(editor)),
+        ("drag_50_moves", bench_drag(editor, nodes)),
+        ("group_drag_50_moves", bench_group_drag(editor, nodes)),
+    ]
+    results = {}
+    for name, func in cases:
+        editor.zoom = 1.0
+        results[name] = summarize(measure(func, repeat))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.ngraph")
+        results["save_graph"] = summarize(measure(bench_save(editor, path), repeat))
+        # Loading replaces the scene, so it runs last
+        results["load_graph"] = summarize(measure(bench_load(editor, path), repeat))
+    return {
+        "schema": SCHEMA_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "nodes": len(nodes),
+        "edges": len(editor.connections),
+        "repeat": repeat,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--edges", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="write the results to PATH ('-' for stdout)")
+    parser.add_argument("--baseline", metavar="PATH", help="compare the medians with an earlier --json file")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.nodes, args.edges, args.repeat, args.seed)
+
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+        return
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print(f"{report['nodes']} nodes, {report['edges']} edges, {report['repeat']} runs")
+    print(f"{'benchmark':<20} {'median ms':>10} {'p95 ms':>10} {'min ms':>10} {'vs base':>8}")
+    for name, result in report["results"].items():
+        line = f"{name:<20} {result['median_ms']:>10.3f} {result['p95_ms']:>10.3f} {result['min_ms']:>10.3f}"
+        if name in baseline:
+            # Above 1.00x is slower than the baseline
+            line += f" {result['median_ms'] / baseline[name]['median_ms']:>7.2f}x"
+        print(line)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Synthetic graphs for benchmarks."""
+import math
+import random
+from connection import Connection
+from constants import TOOLBAR_WIDTH
+from node import Node
+
+
+def populate(editor, node_count, edge_count, seed=0, spacing=180):
+    """
+    Fill editor with node_count nodes laid out on a square grid right of the
+    toolbar and edge_count connections between nearby nodes.
+
+    Nodes and connections go through the editor's scene primitives, so the
+    graph, the lists and the spatial index stay in sync. Returns the nodes.
+    """
+    rng = random.Random(seed)
+    columns = max(1, math.ceil(math.sqrt(node_count)))
+    nodes = []
+    for i in range(node_count):
+        row, column = divmod(i, columns)
+        node = Node(TOOLBAR_WIDTH + 40 + column * spacing, 40 + row * spacing, editor.next_node_id)
+        editor._insert_node(node)
+        nodes.append(node)
+    if node_count < 2:
+        return nodes
+    pairs = set()
+    attempts = 0
+    while len(pairs) < edge_count and attempts < 20 * edge_count:
+        attempts += 1
+        start = rng.randrange(node_count)
+        # Mostly short edges to a neighbour on the grid, like a hand-made graph
+        end = start + rng.choice((1, columns, columns + 1, -1, -columns))
+        if 0 <= end < node_count and end != start and (start, end) not in pairs:
+            pairs.add((start, end))
+            label = f"e{len(pairs)}" if rng.random() < 0.2 else ""
+            editor._insert_connection(Connection(nodes[start], nodes[end], label=label))
+    return nodes
@@ -1,4 +1,5 @@
 from constants import WHITE, GREEN
+from font_cache import get_font, label_cache
 import math
 import pygame
 
@@ -28,25 +29,9 @@ class Connection:
         label_box_halfheight = 0
         label_center = None
 
-        # --- Optimization: Only create font ONCE per draw call, not per label ---
-        # Use a static font cache for each font size
-        if not hasattr(self, "_font_cache"):
-            self._font_cache = {}
-
         if self.label:
-            min_font_size = 10
-            max_font_size = 28
-            font_size = int(18 * max(0.7, min(1.0, zoom)))
-            font_size = max(min_font_size, min(max_font_size, font_size))
-            # Use cached font object
-            if font_size not in self._font_cache:
-                self._font_cache[font_size] = pygame.font.Font(None, font_size)
-            font = self._font_cache[font_size]
-            label_surf = font.render(self.label, True, color)
-            max_pad = 12
-            pad_scale = max(0.5, min(1.0, zoom))
-            label_padding_x = int(max_pad * pad_scale)
-            label_padding_y = int(3 * pad_scale)
+            font_size, label_padding_x, label_padding_y = self._label_metrics(zoom)
+            label_surf = label_cache.get(self.label, font_size, color)
             rect_width = label_surf.get_width() + 2 * label_padding_x
             rect_height = label_surf.get_height() + 2 * label_padding_y
 
@@ -102,6 +87,35 @@ class Connection:
         else:
             pygame.draw.line(screen, color, start_pos, end_pos, thickness)
 
+    def _label_metrics(self, zoom):
+        # Font size and box padding of the label at this zoom
+        min_font_size = 10
+        max_font_size = 28
+        font_size = int(18 * max(0.7, min(1.0, zoom)))
+        font_size = max(min_font_size, min(max_font_size, font_size))
+        max_pad = 12
+        pad_scale = max(0.5, min(1.0, zoom))
+        return font_size, int(max_pad * pad_scale), int(3 * pad_scale)
+
+    def screen_bounds(self, offset_x=0, offset_y=0, zoom=1.0):
+        """Screen rect covering the line and the label box as drawn by draw()."""
+        start_x, start_y = self.start_node.get_output_pos()
+        end_x, end_y = self.end_node.get_input_pos()
+        x1 = int((start_x - offset_x) * zoom)
+        y1 = int((start_y - offset_y) * zoom)
+        x2 = int((end_x - offset_x) * zoom)
+        y2 = int((end_y - offset_y) * zoom)
+        thickness = max(1, int(2 * zoom))
+        bounds = pygame.Rect(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1)
+        bounds.inflate_ip(2 * thickness + 2, 2 * thickness + 2)
+        if self.label:
+            font_size, padding_x, padding_y = self._label_metrics(zoom)
+            text_w, text_h = get_font(font_size).size(self.label)
+            label_rect = pygame.Rect(0, 0, text_w + 2 * padding_x + 2, text_h + 2 * padding_y + 2)
+            label_rect.center = ((x1 + x2) // 2, (y1 + y2) // 2)
+            bounds.union_ip(label_rect)
+        return bounds
+
     def is_clicked(self, world_x, world_y, zoom=1.0, tolerance=10):
         x1, y1 = self.start_node.get_right_center()
         x2, y2 = self.end_node.get_left_center()
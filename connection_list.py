@@ -1,30 +1,100 @@
 class ConnectionList:
-    def __init__(self):
-        self._connections = []
+    """
+    The connections of the scene in insertion order.
+
+    The order lives in a dict (connection -> insertion sequence), which
+    iterates in insertion order and removes in O(1). Per-node outgoing and
+    incoming indexes and a (start, end) lookup make deleting a node's
+    connections, duplicate checks and "connections touching this node"
+    cost O(degree) instead of a pass over all connections.
+    """
+    def __init__(self, spatial_index=None):
+        self._order = {}  # connection -> insertion sequence
+        self._next_order = 0
+        self._outgoing = {}  # node -> {connection: None} starting there
+        self._incoming = {}  # node -> {connection: None} ending there
+        self._between = {}  # (start node, end node) -> [connections]
+        self.spatial_index = spatial_index
 
     def __iter__(self):
-        return iter(self._connections)
+        return iter(self._order)
 
     def __len__(self):
-        return len(self._connections)
+        return len(self._order)
+
+    def __contains__(self, connection):
+        return connection in self._order
 
     def append(self, connection):
-        self._connections.append(connection)
+        self._order[connection] = self._next_order
+        self._next_order += 1
+        self._outgoing.setdefault(connection.start_node, {})[connection] = None
+        self._incoming.setdefault(connection.end_node, {})[connection] = None
+        self._between.setdefault((connection.start_node, connection.end_node), []).append(connection)
+        if self.spatial_index is not None:
+            self.spatial_index.insert_connection(connection)
 
     def remove(self, connection):
-        self._connections.remove(connection)
+        del self._order[connection]
+        self._unindex(self._outgoing, connection.start_node, connection)
+        self._unindex(self._incoming, connection.end_node, connection)
+        ends = (connection.start_node, connection.end_node)
+        between = self._between[ends]
+        between.remove(connection)
+        if not between:
+            del self._between[ends]
+        if self.spatial_index is not None:
+            self.spatial_index.remove_connection(connection)
+
+    @staticmethod
+    def _unindex(index, node, connection):
+        connections = index[node]
+        del connections[connection]
+        if not connections:
+            del index[node]
 
     def clear(self):
-        self._connections.clear()
+        self._order.clear()
+        self._outgoing.clear()
+        self._incoming.clear()
+        self._between.clear()
+        if self.spatial_index is not None:
+            self.spatial_index.clear_connections()
 
     def all(self):
-        return self._connections
+        return list(self._order)
 
     def filter(self, predicate):
-        return [c for c in self._connections if predicate(c)]
+        return [c for c in self._order if predicate(c)]
+
+    def first(self, candidates):
+        """Return the candidate that comes first in list order, or None."""
+        return min(candidates, key=self._order.__getitem__, default=None)
+
+    def in_list_order(self, candidates):
+        return sorted(candidates, key=self._order.__getitem__)
+
+    def outgoing(self, node):
+        return list(self._outgoing.get(node, ()))
+
+    def incoming(self, node):
+        return list(self._incoming.get(node, ()))
+
+    def connections_of(self, node):
+        """Connections starting or ending at node, in list order."""
+        touching = set(self._outgoing.get(node, ()))
+        touching.update(self._incoming.get(node, ()))
+        return self.in_list_order(touching)
+
+    def between(self, start_node, end_node):
+        """The first connection from start_node to end_node, or None."""
+        connections = self._between.get((start_node, end_node))
+        return connections[0] if connections else None
+
+    def connected(self, node_a, node_b):
+        """True if a connection joins the two nodes in either direction."""
+        return (node_a, node_b) in self._between or (node_b, node_a) in self._between
 
     def remove_connections_for_node(self, node):
-        self._connections = [
-            c for c in self._connections
-            if c.start_node != node and c.end_node != node
-        ]
+        for c in self.connections_of(node):
+            self.remove(c)
@@ -23,6 +23,8 @@ NODE_WIDTH = 80
 NODE_HEIGHT = 80
 CONNECTION_RADIUS = 6
 BLUEPRINT_GRID_SIZE = 20
+MIN_ZOOM = 0.1 # Zoom range of the mouse wheel
+MAX_ZOOM = 2.0
 TOOLBAR_BUTTON_FONT_SIZE = 24
 
 # TOOLBAR
@@ -39,3 +41,19 @@ TOOLBAR_BG_COLOR = (30, 40, 90) # Background color of the toolbar
 
 # GRAPH
 EDGE_CLICK_TOLERANCE = 10
+SPATIAL_INDEX_CELL_SIZE = 200 # World units per cell of the hit-testing grid
+TEXT_SURFACE_CACHE_SIZE = 4096 # Rendered label surfaces kept for reuse
+NODE_SURFACE_CACHE_BUDGET = 64 * 1024 * 1024 # Bytes of rendered node surfaces kept for reuse
+NODE_ZOOM_BUCKET_STEP = 0.01 # Relative zoom step between node surface buckets
+CULL_MARGIN = 100 # Screen pixels around the viewport that still count as visible (connection labels)
+DAMAGE_NODE_LIMIT = 64 # Changing more nodes at once repaints the whole screen instead of each node
+DAMAGE_MERGE_DISTANCE = 16 # Damaged rects closer than this many screen pixels are repainted as one region
+DAMAGE_MAX_REGIONS = 16 # Frames with more separate damaged regions repaint their union
+OFFSCREEN_BUCKET_SIZE = 32 # Screen pixels along the window border sharing one offscreen node marker
+
+# FILES
+GRAPH_FILE = "graph.ngraph" # Default save file, chunked binary format (see graph_format.py)
+LEGACY_GRAPH_FILE = "graph.gpickle" # Pickled graphs of older versions, still loaded
+GRAPH_FILE_CHUNK_SIZE = 65536 # Rows per node or edge chunk in graph files
+GRAPH_FILE_TILE_SIZE = 2048 # World units per tile of the spatial index stored in graph files
+JOURNAL_DIR = "autosave" # Edit journal and checkpoints for crash recovery (see journal.py)
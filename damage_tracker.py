@@ -0,0 +1,61 @@
+import pygame
+from constants import DAMAGE_MAX_REGIONS, DAMAGE_MERGE_DISTANCE
+
+
+class DamageTracker:
+    """
+    Collects the screen regions that changed since the last frame.
+
+    Handlers report what they touched; the editor repaints only those
+    regions, or the whole screen after pan, zoom or resize. Rects that
+    overlap or lie within merge_distance pixels of each other are merged,
+    so a frame repaints a few separate regions instead of their union.
+    """
+    def __init__(self, merge_distance=DAMAGE_MERGE_DISTANCE, max_regions=DAMAGE_MAX_REGIONS):
+        self.full = True  # The first frame always paints everything
+        self.rects = []
+        self.merge_distance = merge_distance
+        self.max_regions = max_regions  # More regions than this are repainted as their union
+
+    def add(self, rect):
+        if self.full or rect.width <= 0 or rect.height <= 0:
+            return
+        self.rects.append(pygame.Rect(rect))
+
+    def add_full(self):
+        self.full = True
+        self.rects.clear()
+
+    def is_clean(self):
+        return not self.full and not self.rects
+
+    def take(self, screen_rect):
+        """
+        Return the regions to repaint and reset the tracker.
+
+        Returns None when the whole screen must be repainted, otherwise a
+        list of non-overlapping rects clipped to the screen, empty when
+        nothing changed.
+        """
+        if self.full:
+            self.full = False
+            self.rects.clear()
+            return None
+        regions = []
+        for rect in self.rects:
+            rect = rect.clip(screen_rect)
+            if not rect.width or not rect.height:
+                continue
+            # Merge with every region it touches; a merged rect can reach further ones
+            reach = rect.inflate(2 * self.merge_distance, 2 * self.merge_distance)
+            touching = reach.collidelistall(regions)
+            while touching:
+                for i in reversed(touching):
+                    rect.union_ip(regions.pop(i))
+                reach = rect.inflate(2 * self.merge_distance, 2 * self.merge_distance)
+                touching = reach.collidelistall(regions)
+            regions.append(rect)
+        self.rects.clear()
+        if len(regions) > self.max_regions:
+            return [regions[0].unionall(regions[1:])]
+        return regions
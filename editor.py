@@ -1,77 +1,145 @@
 import pygame
 import sys
-import copy
-import networkx as nx
-from constants import (WHITE,
-                        WINDOW_WIDTH, WINDOW_HEIGHT, EDGE_CLICK_TOLERANCE)
+from constants import (WHITE, DAMAGE_NODE_LIMIT,
+                        WINDOW_WIDTH, WINDOW_HEIGHT, EDGE_CLICK_TOLERANCE, GRAPH_FILE, MIN_ZOOM, MAX_ZOOM)
 
 from connection import Connection
-from connection_list import ConnectionList
-from undo import UndoStack
+from graph_model import GraphModel
+from spatial_index import SpatialIndex
+from undo import (UndoStack, UndoCommand, MoveNodesCommand, RenameNodeCommand,
+                  AddConnectionCommand, RemoveConnectionCommand, RemoveNodeCommand,
+                  RelabelConnectionCommand)
 from toolbar import Toolbar
 from selection import NodeSelection
-from settings import PANNING_FOLLOWS_MOUSE
+from settings import PANNING_FOLLOWS_MOUSE, RETAINED_RENDERING, MAX_FPS
 from textinput import TextInputRenderer, TextInputEngine
-from typing import List
 from node import Node
 from fps_counter import FPSCounter
+from frame_profiler import FrameProfiler
 from renderer import NodeEditorRenderer  # <-- new import
 from canvas_panning import CanvasPanning
 from connection_drag_state import ConnectionDragState
+from node_drag_state import NodeDragState
+from node_store import node_store
 from graph_persistence import GraphPersistence  # new import
+from damage_tracker import DamageTracker
 
 class NodeEditor:
-    def __init__(self, toolbar=None, undo_depth=20):
-        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.RESIZABLE)
-        pygame.display.set_caption("Node Graph Editor")
+    def __init__(self, toolbar=None, undo_depth=20, retained_rendering=RETAINED_RENDERING, headless=False,
+                 size=(WINDOW_WIDTH, WINDOW_HEIGHT)):
+        # Headless editors render into an off-screen surface and never touch the display
+        self.headless = headless
+        if headless:
+            self.screen = pygame.Surface(size)
+        else:
+            self.screen = pygame.display.set_mode(size, pygame.RESIZABLE)
+            pygame.display.set_caption("Node Graph Editor")
         self.clock = pygame.time.Clock()
         self.fps_offset = (8, 8)  # 8px from left and bottom
         self.fps_counter = FPSCounter(pos=self.fps_offset)  # removed corner argument
-        self.nx_graph = nx.DiGraph()
-        self.nodes: List[Node] = []
-        self.connections = ConnectionList()
+        self.profiler = FrameProfiler()  # F3 shows the phase timings, F4 records a trace
+        self.spatial_index = SpatialIndex()  # grid for node and connection hit-testing
+        self.model = GraphModel(self.spatial_index)  # the only copy of the graph
+        self.nodes = self.model.nodes
+        self.connections = self.model.connections
         self.undo_stack = UndoStack(max_depth=undo_depth)
-        self.selection = NodeSelection() # multiple selection of nodes
+        self.selection = NodeSelection(self.spatial_index) # multiple selection of nodes
         self.connection_drag = ConnectionDragState()
         self.next_node_id = 1
         self.zoom: float = 1.0  # 1.0 = 100%, min 0.1 (1:10), max e.g. 2.0
         self.toolbar = toolbar if toolbar else Toolbar()
         self.text_input_active = False
         self.visualizer = TextInputRenderer(font_color=WHITE,cursor_color=WHITE, engine=TextInputEngine())
-        self._node_drag_in_progress = False  # Track if a node drag is in progress
+        self.node_drag = NodeDragState()  # Selected nodes moved by the current left-button drag
         self.renderer = NodeEditorRenderer(self)  # Pass self or required state
         self.panning_state = CanvasPanning()
         self.marked_connection = None  # Track the marked connection
         self.graph_persistence = GraphPersistence(self)
+        # Retained rendering repaints only damaged regions; False redraws every frame
+        self.retained_rendering = retained_rendering
+        self.damage = DamageTracker()
+        self.recorder = None  # EventRecorder that saves every frame's events, see replay.py
+        self.journal = None  # EditJournal that logs every edit for crash recovery, see journal.py
+        self.coalesced_motion_events = 0  # MOUSEMOTION events merged into the one before, see coalesce_motion
+        # Modifier keys as of the last key event, so a recorded event stream replays the same clicks
+        self.key_mods = pygame.KMOD_NONE
         # Push initial empty graph state to undo stack
-        self.undo_stack.push(copy.deepcopy(self.nx_graph))
+        self.undo_stack.push(self.nx_graph, copy_graph=False)
+
+    @property
+    def nx_graph(self):
+        """The scene as a new networkx DiGraph, built on every access; changing it does not change the scene."""
+        return self.model.to_networkx()
 
     def run(self):
         while True:
-            events = pygame.event.get()
-            filtered_events = []
-            for event in events:
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if self.text_input_active:
-                    if event.type == pygame.KEYDOWN and event.key in (pygame.K_TAB, pygame.K_ESCAPE, pygame.K_RETURN):
-                        self.handle_key_down(event)
-                        continue
-                    if event.type == pygame.KEYUP and event.key in (pygame.K_TAB, pygame.K_ESCAPE, pygame.K_RETURN):
-                        continue
-                    filtered_events.append(event)
-                else:
-                    self.dispatch_event(event)
-                    filtered_events = events
+            if (self.retained_rendering and self.damage.is_clean() and not self.text_input_active
+                    and not self.graph_persistence.busy()):
+                # Nothing to repaint: sleep until the next event instead of spinning
+                events = [pygame.event.wait()]
+                events.extend(pygame.event.get())
+            else:
+                events = pygame.event.get()
+            if self.recorder is not None:
+                self.recorder.record_frame(events)
+            self.profiler.begin_frame()
+            filtered_events = self.handle_events(self.coalesce_motion(events))
+            self.profiler.mark("events")
 
-            self.draw(filtered_events)
+            self.poll_background_io()
             self.fps_counter.update(self.clock.get_fps())
-            self.fps_counter.draw(self.screen)
-            pygame.display.flip()
-            self.clock.tick()
+            self.draw(filtered_events)
+            self.profiler.end_frame()
+            if self.retained_rendering:
+                self.clock.tick(MAX_FPS)
+            else:
+                self.clock.tick()
+
+    def coalesce_motion(self, events):
+        """
+        Merge every run of consecutive MOUSEMOTION events into one with the
+        latest position and buttons and the summed rel, so handling a
+        frame's input does not cost more with a higher mouse polling rate.
+        Other events keep their place between the runs.
+        """
+        coalesced = []
+        for event in events:
+            if event.type == pygame.MOUSEMOTION and coalesced and coalesced[-1].type == pygame.MOUSEMOTION:
+                previous = coalesced[-1]
+                rel_x, rel_y = previous.dict.get("rel", (0, 0))
+                dx, dy = event.dict.get("rel", (0, 0))
+                coalesced[-1] = pygame.event.Event(pygame.MOUSEMOTION, event.dict, rel=(rel_x + dx, rel_y + dy))
+                self.coalesced_motion_events += 1
+            else:
+                coalesced.append(event)
+        return coalesced
+
+    def handle_events(self, events):
+        """Dispatch one frame's events, return the events the text overlay gets to see."""
+        filtered_events = []
+        for event in events:
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if self.text_input_active:
+                self._track_modifiers(event)
+                if event.type == pygame.KEYDOWN and event.key in (pygame.K_TAB, pygame.K_ESCAPE, pygame.K_RETURN):
+                    self.handle_key_down(event)
+                    continue
+                if event.type == pygame.KEYUP and event.key in (pygame.K_TAB, pygame.K_ESCAPE, pygame.K_RETURN):
+                    continue
+                filtered_events.append(event)
+            else:
+                self.dispatch_event(event)
+                filtered_events = events
+        return filtered_events
+
+    def _track_modifiers(self, event):
+        if event.type in (pygame.KEYDOWN, pygame.KEYUP):
+            self.key_mods = getattr(event, "mod", self.key_mods)
 
     def dispatch_event(self, event):
+        self._track_modifiers(event)
         dispatch_table = {
             pygame.QUIT: self._handle_quit,
             pygame.VIDEORESIZE: self._handle_resize,
@@ -91,59 +159,73 @@ class NodeEditor:
         sys.exit()
 
     def _handle_resize(self, event):
-        self.screen = pygame.display.set_mode(event.size, pygame.RESIZABLE)
+        if self.headless:
+            self.screen = pygame.Surface(event.size)
+        else:
+            self.screen = pygame.display.set_mode(event.size, pygame.RESIZABLE)
         # Update FPS counter position to always stick to bottom-left
         self.fps_counter.pos = self.fps_offset
+        self.damage.add_full()
 
     def _handle_dropfile(self, event):
         file_path = event.file  # type: ignore
-        pygame.display.set_caption(f"Node Graph Editor - {file_path}")
+        if not self.headless:
+            pygame.display.set_caption(f"Node Graph Editor - {file_path}")
 
     def handle_key_down(self, event):
         # Save: Ctrl+S, Load: Ctrl+O
         mod = getattr(event, "mod", 0)
         if event.type == pygame.KEYDOWN and mod & pygame.KMOD_CTRL:
             if event.key == pygame.K_s:
-                self.save_graph()
+                self.graph_persistence.save_graph_async()
                 return
             elif event.key == pygame.K_o:
-                self.load_graph()
+                self.graph_persistence.load_graph_async()
                 return
+            elif event.key == pygame.K_z and not mod & pygame.KMOD_SHIFT:
+                self.undo()
+                return
+            elif event.key in (pygame.K_y, pygame.K_z):
+                self.redo()
+                return
+        if event.key == pygame.K_F3:
+            self.profiler.toggle_overlay()
+            self.damage.add_full()
+            return
+        if event.key == pygame.K_F4:
+            self.toggle_trace()
+            return
+        if event.key in (pygame.K_TAB, pygame.K_ESCAPE, pygame.K_RETURN):
+            # The text overlay covers the whole screen
+            self.damage.add_full()
         if event.key == pygame.K_TAB and not self.text_input_active:
             self.text_input_active = True
         elif event.key == pygame.K_ESCAPE:
             self.text_input_active = False
             self.visualizer.clear_text()
         elif event.key == pygame.K_RETURN and self.text_input_active:
-            # Push undo before renaming node or connection
-            self._sync_node_names_to_graph()
-            self.undo_stack.push(copy.deepcopy(self.nx_graph))
+            new_value = self.visualizer.value
             # If a connection is marked, set its label
             if self.marked_connection:
-                self.marked_connection.label = self.visualizer.value
-                # Update label in nx_graph edge
-                u = self.marked_connection.start_node.id
-                v = self.marked_connection.end_node.id
-                if self.nx_graph.has_edge(u, v):
-                    self.nx_graph[u][v]['label'] = self.visualizer.value
+                conn = self.marked_connection
+                if conn.label != new_value:
+                    self.apply_command(RelabelConnectionCommand(conn, conn.label, new_value))
             else:
-                # Find the marked node (selected node)
-                marked_node = None
-                for node in self.nodes:
-                    if node.selected:
-                        marked_node = node
-                        break
-                if marked_node:
-                    marked_node.node_name = self.visualizer.value
-                    # Also update the node name in the graph data
-                    if marked_node.id in self.nx_graph.nodes:
-                        self.nx_graph.nodes[marked_node.id]['name'] = self.visualizer.value
-                    # Invalidate node cache so the new name is drawn immediately
-                    if hasattr(marked_node, "invalidate_cache"):
-                        marked_node.invalidate_cache()
+                # The marked node is the first selected one
+                marked_node = next(iter(self.selection.selected_nodes), None)
+                if marked_node and marked_node.node_name != new_value:
+                    self.apply_command(RenameNodeCommand(marked_node, marked_node.node_name, new_value))
             self.text_input_active = False
             self.visualizer.clear_text()
 
+    def toggle_trace(self, filename="frame_trace.json"):
+        """Start recording frame phases, or stop and write them as a Chrome trace file."""
+        if self.profiler.tracing:
+            self.profiler.stop_trace(filename)
+            print(f"Frame trace written to {filename}")
+        else:
+            self.profiler.start_trace()
+
     def handle_mouse_down(self, event):
         btn = self.toolbar.get_clicked_button(event.pos)
         if btn:
@@ -155,61 +237,64 @@ class NodeEditor:
         self._update_connection_marking(clicked_node, world_x, world_y)
 
         if event.button == pygame.BUTTON_LEFT:
-            self._handle_left_mouse_down(clicked_node, world_x, world_y)
+            additive = bool(self.key_mods & pygame.KMOD_SHIFT)
+            self._handle_left_mouse_down(clicked_node, world_x, world_y, additive)
+            if clicked_node is None:
+                # Dragging on the empty canvas selects the nodes inside a rectangle
+                self.selection.begin(event.pos, additive)
         elif event.button == pygame.BUTTON_MIDDLE:
             self._handle_middle_mouse_down(world_x, world_y)
         elif event.button == pygame.BUTTON_RIGHT:
             self._handle_right_mouse_down(clicked_node, world_x, world_y, event)
 
     def _find_node_at(self, world_x, world_y):
-        # First, check if a node is under the cursor
-        clicked_node = None
-        for node in reversed(self.nodes):
-            if node.contains_point(world_x, world_y):
-                clicked_node = node
-                break
-        return clicked_node
+        # Topmost node under the cursor, candidates come from the spatial index
+        hits = [node for node in self.spatial_index.nodes_at(world_x, world_y)
+                if node.contains_point(world_x, world_y)]
+        return self.nodes.topmost(hits)
+
+    def _find_connection_at(self, world_x, world_y):
+        # First connection (in list order) within click tolerance of the point
+        candidates = self.spatial_index.connections_near(world_x, world_y, EDGE_CLICK_TOLERANCE / self.zoom)
+        hits = [conn for conn in candidates
+                if conn.is_clicked(world_x, world_y, zoom=self.zoom, tolerance=EDGE_CLICK_TOLERANCE)]
+        return self.connections.first(hits)
 
     def _update_connection_marking(self, clicked_node, world_x, world_y):
         # Only check for connection marking if no node is under the cursor
+        marked = None
         if clicked_node is None:
-            marked = None
-            for conn in self.connections:
-                if conn.is_clicked(world_x, world_y, zoom=self.zoom, tolerance=EDGE_CLICK_TOLERANCE):
-                    marked = conn
-                    break
-            if marked:
-                # Mark this connection, unmark others
-                for conn in self.connections:
-                    conn.marked = (conn is marked)
-                self.marked_connection = marked
-            else:
-                # Unmark all connections if click is not on any connection
-                for conn in self.connections:
-                    conn.marked = False
-                self.marked_connection = None
-        else:
-            # Unmark all connections if a node is clicked
-            for conn in self.connections:
-                conn.marked = False
-            self.marked_connection = None
+            marked = self._find_connection_at(world_x, world_y)
+        if marked is self.marked_connection:
+            return
+        # Only the previously marked connection can still carry the mark
+        if self.marked_connection is not None:
+            self.marked_connection.marked = False
+            self._damage_connection(self.marked_connection)
+        if marked:
+            marked.marked = True
+            self._damage_connection(marked)
+        self.marked_connection = marked
 
-    def _handle_left_mouse_down(self, clicked_node, world_x, world_y):
+    def _handle_left_mouse_down(self, clicked_node, world_x, world_y, additive=False):
         # Use the clicked_node found above
         if clicked_node is not None:
-            clicked_node.dragging = True
-            clicked_node.drag_offset = (world_x - clicked_node.x, world_y - clicked_node.y)
-            # Delegate selection logic:
-            self.selection.select_node(clicked_node, self.nodes)
+            # Delegate selection logic: shift toggles the node, a click on a
+            # selected node keeps the selection so it can be dragged as a group
+            self._damage_selection()
+            if additive:
+                self.selection.toggle_node(clicked_node)
+            elif not clicked_node.selected:
+                self.selection.select_node(clicked_node, self.nodes)
+            self._damage_selection()
             # --- Selected node should be always on top ---
-            self.nodes.remove(clicked_node)
-            self.nodes.append(clicked_node)
-            # --- Push undo only once per drag start ---
-            if not self._node_drag_in_progress:
-                self._sync_node_names_to_graph()
-                self.undo_stack.push(copy.deepcopy(self.nx_graph))
-                self._node_drag_in_progress = True
-        else:
+            self.nodes.bring_to_front(clicked_node)
+            # --- The whole selection follows the mouse, the move is recorded on mouse up ---
+            if clicked_node.selected and not self.node_drag.is_active():
+                self.spatial_index.float_nodes(self.selection.selected_nodes)
+                self.node_drag.begin(self.selection.selected_nodes, (world_x, world_y))
+        elif not additive:
+            self._damage_selection()
             self.selection.clear_selection(self.nodes)
 
     def _handle_middle_mouse_down(self, world_x, world_y):
@@ -220,39 +305,23 @@ class NodeEditor:
         self.try_delete_connection(world_x, world_y)
 
     def _handle_right_mouse_down(self, clicked_node, world_x, world_y, event):
-        # Check if a node is under the cursor
-        clicked_node = None
-        for node in reversed(self.nodes):
-            if node.contains_point(world_x, world_y):
-                clicked_node = node
-                break
-        selected_nodes = [n for n in self.nodes if n.selected]
+        selected_nodes = self.selection.selected_nodes
         # If a node is selected and another node is right-clicked, connect them
         if selected_nodes and clicked_node is not None and selected_nodes[0] != clicked_node:
             selected_node = selected_nodes[0]
-            already_connected = any(
-                (c.start_node == selected_node and c.end_node == clicked_node) or
-                (c.start_node == clicked_node and c.end_node == selected_node)
-                for c in self.connections
-            )
-            if not already_connected:
-                self._sync_node_names_to_graph()
-                self.undo_stack.push(copy.deepcopy(self.nx_graph))  # Push before adding edge
+            if not self.connections.connected(selected_node, clicked_node):
                 # Add connection with empty label
-                conn = Connection(selected_node, clicked_node)
-                self.connections.append(conn)
-                self.nx_graph.add_edge(selected_node.id, clicked_node.id)
-                # Optionally: store label in nx_graph (empty string)
-                self.nx_graph[selected_node.id][clicked_node.id]['label'] = ""
+                self.apply_command(AddConnectionCommand(Connection(selected_node, clicked_node)))
         # Canvas panning only if no node was hit
         elif clicked_node is None:
             self.panning_state.start_panning(event.pos)
 
     def handle_mouse_up(self, event):
         if event.button == pygame.BUTTON_LEFT:
-            for node in self.nodes:
-                node.dragging = False
-            self._node_drag_in_progress = False  # Reset drag flag
+            if self.node_drag.is_active():
+                self._finish_node_drag()
+            if self.selection.is_active():
+                self._finish_rubber_band()
         elif event.button == pygame.BUTTON_RIGHT:
             self.panning_state.stop_panning()
 
@@ -260,52 +329,104 @@ class NodeEditor:
         x, y = event.pos
         #Update hover state for toolbar buttons
         for btn in self.toolbar.buttons:
-            btn.hovered = btn.rect.collidepoint(x, y)
+            hovered = btn.rect.collidepoint(x, y)
+            if hovered != btn.hovered:
+                btn.hovered = hovered
+                self.damage.add(btn.rect.inflate(2, 2))
         world_x = (x + self.panning_state.offset_x * self.zoom) / self.zoom
         world_y = (y + self.panning_state.offset_y * self.zoom) / self.zoom
-        for node in self.nodes:
-            if node.dragging:
-                node.x = world_x - node.drag_offset[0]
-                node.y = world_y - node.drag_offset[1]
-                if node.id in self.nx_graph.nodes:
-                    self.nx_graph.nodes[node.id]['pos'] = (node.x, node.y)
+        if self.node_drag.is_active():
+            self._damage_nodes(self.node_drag.nodes)
+            self.node_drag.move(world_x, world_y)
+            self._damage_nodes(self.node_drag.nodes)
+        if self.selection.is_active():
+            self.damage.add(self.selection.screen_rect().inflate(2, 2))
+            changed = self.selection.update((x, y), self.panning_state.offset_x, self.panning_state.offset_y,
+                                            self.zoom)
+            self.damage.add(self.selection.screen_rect().inflate(2, 2))
+            # Nodes that entered or left the rectangle change their highlight
+            self._damage_nodes(changed)
         if self.panning_state.panning:
             self.panning_state.update_panning(
                 (x, y), self.zoom, PANNING_FOLLOWS_MOUSE
             )
+            self.damage.add_full()
         # Handle connection dragging
         if self.connection_drag.is_active():
             self.connection_drag.update_end((x, y))
 
     def handle_mouse_wheel(self, event):
-        # Get mouse position
-        mouse_x, mouse_y = pygame.mouse.get_pos()
+        # Get mouse position, replayed events carry the position they were recorded at
+        mouse_x, mouse_y = getattr(event, "pos", None) or pygame.mouse.get_pos()
         # Convert to world coordinates before zoom
         world_x_before = (mouse_x + self.panning_state.offset_x * self.zoom) / self.zoom
         world_y_before = (mouse_y + self.panning_state.offset_y * self.zoom) / self.zoom
 
         if event.y > 0:
-            self.zoom = min(self.zoom * 1.1, 2.0)
+            self.zoom = min(self.zoom * 1.1, MAX_ZOOM)
         elif event.y < 0:
-            self.zoom = max(self.zoom / 1.1, 0.1)
+            self.zoom = max(self.zoom / 1.1, MIN_ZOOM)
 
         # After zoom, adjust offset so the world point under the mouse stays the same
         self.panning_state.offset_x = (world_x_before * self.zoom - mouse_x) / self.zoom
         self.panning_state.offset_y = (world_y_before * self.zoom - mouse_y) / self.zoom
+        self.damage.add_full()
 
     def draw(self, events):
-        self.renderer.draw(events)  # Delegate to renderer
+        if not self.retained_rendering:
+            self.renderer.draw(events)  # Delegate to renderer
+            return
+        if self.text_input_active:
+            # The overlay and the blinking cursor are repainted every frame
+            self.damage.add_full()
+        if self.graph_persistence.busy():
+            self.damage.add(self.renderer.progress_rect())
+        self.damage.add(self.fps_counter.dirty_rect(self.screen))
+        self.damage.add(self.profiler.dirty_rect(self.screen))
+        regions = self.damage.take(self.screen.get_rect())
+        if regions is None:
+            self.renderer.draw(events)
+        elif regions:
+            self.renderer.draw(events, clips=regions)
+
+    # --- Damage tracking for retained rendering ---
+
+    def _damage_node(self, node):
+        """Mark the screen area of a node and its connections for repainting."""
+        if not self.retained_rendering:
+            return
+        rect = node.screen_rect(self.panning_state.offset_x, self.panning_state.offset_y, self.zoom)
+        viewport = pygame.Rect(self.toolbar.width, 0,
+                               self.screen.get_width() - self.toolbar.width, self.screen.get_height())
+        if not viewport.contains(rect):
+            # Offscreen indicators along the window border may change as well
+            self.damage.add_full()
+            return
+        self.damage.add(rect)
+        for conn in self.spatial_index.connections_of(node):
+            self._damage_connection(conn)
+
+    def _damage_nodes(self, nodes):
+        if len(nodes) > DAMAGE_NODE_LIMIT:
+            self.damage.add_full()
+            return
+        for node in nodes:
+            self._damage_node(node)
+
+    def _damage_connection(self, conn):
+        if not self.retained_rendering:
+            return
+        self.damage.add(conn.screen_bounds(self.panning_state.offset_x, self.panning_state.offset_y, self.zoom))
+
+    def _damage_selection(self):
+        self._damage_nodes(self.selection.selected_nodes)
 
     def try_delete_connection(self, world_x, world_y):
-        for conn in list(self.connections):  # Use list() to allow removal during iteration
-            if conn.is_clicked(world_x, world_y, zoom=self.zoom, tolerance=EDGE_CLICK_TOLERANCE):
-                self._sync_node_names_to_graph()
-                self.undo_stack.push(copy.deepcopy(self.nx_graph))
-                self.connections.remove(conn)
-                if self.nx_graph.has_edge(conn.start_node.id, conn.end_node.id):
-                    self.nx_graph.remove_edge(conn.start_node.id, conn.end_node.id)
-                return True
-        return False
+        conn = self._find_connection_at(world_x, world_y)
+        if conn is None:
+            return False
+        self.apply_command(RemoveConnectionCommand(conn))
+        return True
 
     def try_delete_node(self, world_x: float, world_y: float) -> bool:
         """
@@ -313,24 +434,91 @@ class NodeEditor:
         Removes all connections to/from the node and updates the graph.
         Returns True if a node was deleted, False otherwise.
         """
-        for node in reversed(self.nodes):
-            if node.contains_point(world_x, world_y):
-                # Remove all connections to/from this node
-                self.connections.remove_connections_for_node(node)
-                self._sync_node_names_to_graph()
-                self.undo_stack.push(copy.deepcopy(self.nx_graph))
-                self.nodes.remove(node)
-                if node.id in self.nx_graph.nodes:
-                    self.nx_graph.remove_node(node.id)
-                node.selected = False  # Deselect the node if it was selected
-                return True
-        return False
-
-    def _sync_node_names_to_graph(self):
-        # Ensure all node names are up-to-date in nx_graph before pushing to undo stack
-        for node in self.nodes:
-            if node.id in self.nx_graph.nodes:
-                self.nx_graph.nodes[node.id]['name'] = node.node_name
+        node = self._find_node_at(world_x, world_y)
+        if node is None:
+            return False
+        touching = self.connections.connections_of(node)
+        self.apply_command(RemoveNodeCommand(node, touching, self.nodes.index(node)))
+        return True
+
+    def apply_command(self, command: UndoCommand):
+        """Apply an edit and record it on the undo stack."""
+        command.apply(self)
+        self.undo_stack.push(command)
+
+    # --- Scene primitives used by undo commands; they change the model, damage what changed ---
+    # and log every change to the journal
+
+    def _journal(self, *entry):
+        if self.journal is not None:
+            self.journal.record(*entry)
+
+    def _journal_reset(self):
+        # The scene was replaced as a whole, the journal starts over from a checkpoint of it
+        if self.journal is not None:
+            self.journal.compact(self, reset=True)
+
+    def _insert_node(self, node, index=None):
+        if index is None:
+            self.nodes.append(node)
+        else:
+            self.nodes.insert(index, node)
+        self.next_node_id = max(self.next_node_id, node.id + 1)
+        self._damage_node(node)
+        self._journal("add_node", node.id, node.node_name, node.x, node.y)
+
+    def _discard_node(self, node):
+        for conn in self.connections.connections_of(node):
+            self._discard_connection(conn)
+        self._damage_node(node)
+        self.nodes.remove(node)
+        node.dragging = False
+        self.selection.deselect(node)  # Deselect the node if it was selected
+        self._journal("remove_node", node.id)
+
+    def _set_node_position(self, node, x, y):
+        self._damage_node(node)
+        node.x = x
+        node.y = y
+        self.spatial_index.update_node(node)
+        self._damage_node(node)
+        self._journal("move", node.id, x, y)
+
+    def _set_node_positions(self, nodes, xs, ys):
+        # Bulk move, xs and ys are arrays in the order of nodes
+        self._damage_nodes(nodes)
+        # Floating re-buckets every connection once, not once per moved end
+        self.spatial_index.float_nodes(nodes)
+        node_store.scatter(node_store.rows_of(nodes), xs=xs, ys=ys)
+        self.spatial_index.land_nodes()
+        self._damage_nodes(nodes)
+        self._journal("move_nodes", [node.id for node in nodes], xs.tolist(), ys.tolist())
+
+    def _set_node_name(self, node, name):
+        node.node_name = name
+        # Invalidate node cache so the new name is drawn immediately
+        node.invalidate_cache()
+        self._damage_node(node)
+        self._journal("rename", node.id, name)
+
+    def _insert_connection(self, conn):
+        self.connections.append(conn)
+        self._damage_connection(conn)
+        self._journal("add_edge", conn.start_node.id, conn.end_node.id, conn.label)
+
+    def _discard_connection(self, conn):
+        self._damage_connection(conn)
+        self.connections.remove(conn)
+        conn.marked = False
+        if self.marked_connection is conn:
+            self.marked_connection = None
+        self._journal("remove_edge", conn.start_node.id, conn.end_node.id)
+
+    def _set_connection_label(self, conn, label):
+        self._damage_connection(conn)
+        conn.label = label
+        self._damage_connection(conn)
+        self._journal("relabel", conn.start_node.id, conn.end_node.id, label)
 
     def screen_to_world(self, pos):
         x, y = pos
@@ -338,40 +526,145 @@ class NodeEditor:
         world_y = (y + self.panning_state.offset_y * self.zoom) / self.zoom
         return world_x, world_y
 
-    def save_graph(self, filename="graph.gpickle"):
+    def poll_background_io(self):
+        """Finish a background save or load; a loaded scene is swapped in here, on the main thread."""
+        if self.graph_persistence.poll():
+            # Clear the progress indicator
+            self.damage.add(self.renderer.progress_rect())
+        if self.graph_persistence.lazy_loader is not None:
+            self.graph_persistence.lazy_loader.update()
+        if self.journal is not None:
+            self.journal.poll(self)
+
+    def save_graph(self, filename=GRAPH_FILE):
         self.graph_persistence.save_graph(filename)
 
-    def load_graph(self, filename="graph.gpickle"):
+    def load_graph(self, filename=None):
         self.graph_persistence.load_graph(filename)
 
     def undo(self):
-        prev_graph = self.undo_stack.pop()
-        if prev_graph is not None:
-            self.nx_graph = prev_graph
-            # --- Synchronize self.nodes with nx_graph ---
-            # Build new node list from nx_graph
-            new_nodes = []
-            id_to_node = {}
-            for node_id, data in self.nx_graph.nodes(data=True):
+        item = self.undo_stack.pop()
+        if item is None:
+            return
+        self._cancel_drag()
+        if isinstance(item, UndoCommand):
+            item.revert(self)
+            self.undo_stack.push_redo(item)
+        else:
+            # Snapshot entry: remember the current state so it can be redone
+            self.undo_stack.push_redo(self.nx_graph, copy_graph=False)
+            self._restore_graph(item)
+
+    def redo(self):
+        item = self.undo_stack.pop_redo()
+        if item is None:
+            return
+        self._cancel_drag()
+        if isinstance(item, UndoCommand):
+            item.apply(self)
+            self.undo_stack.push(item, clear_redo=False)
+        else:
+            self.undo_stack.push(self.nx_graph, clear_redo=False, copy_graph=False)
+            self._restore_graph(item)
+
+    def _finish_node_drag(self):
+        nodes, old_xs, old_ys = self.node_drag.end()
+        self.spatial_index.land_nodes()
+        # Nodes deleted during the drag are no longer part of the move
+        kept = [i for i, node in enumerate(nodes) if node in self.nodes]
+        nodes = [nodes[i] for i in kept]
+        old_xs = old_xs[kept]
+        old_ys = old_ys[kept]
+        new_xs, new_ys = node_store.gather(node_store.rows_of(nodes), "xs", "ys")
+        if (new_xs != old_xs).any() or (new_ys != old_ys).any():
+            # The nodes already sit at their new positions, so only record the move
+            self.undo_stack.push(MoveNodesCommand(nodes, (old_xs, old_ys), (new_xs, new_ys)))
+            self._journal("move_nodes", [node.id for node in nodes], new_xs.tolist(), new_ys.tolist())
+
+    def _finish_rubber_band(self):
+        self.damage.add(self.selection.screen_rect().inflate(2, 2))
+        self.selection.finish(self.nodes, self.panning_state.offset_x, self.panning_state.offset_y, self.zoom)
+        self._damage_selection()
+        self.selection.select_nodes(self.selection.nodes, self.selection.additive)
+        self._damage_selection()
+
+    def _cancel_drag(self):
+        # A drag interrupted by undo or a new scene puts the nodes back
+        if self.node_drag.is_active():
+            nodes, old_xs, old_ys = self.node_drag.end()
+            node_store.scatter(node_store.rows_of(nodes), xs=old_xs, ys=old_ys)
+            self.spatial_index.land_nodes()
+            self.damage.add_full()
+        self.selection.clear()
+
+    def _restore_graph(self, graph):
+        """
+        Make the scene match a snapshot graph.
+
+        Existing Node and Connection objects are kept and patched in place, so
+        only nodes that were actually added, removed or renamed lose their
+        render caches.
+        """
+        self.damage.add_full()
+        graph_nodes = graph.nodes
+        # --- Patch, keep or drop the nodes already in the scene ---
+        id_to_node = {}
+        kept_nodes = []
+        for node in self.nodes:
+            data = graph_nodes.get(node.id)
+            if data is None or node.id in id_to_node:
+                continue
+            x, y = data.get('pos', (0, 0))
+            if node.x != x or node.y != y:
+                node.x = x
+                node.y = y
+            name = data.get('name', node.node_name)
+            if node.node_name != name:
+                node.node_name = name
+                node.invalidate_cache()
+            node.dragging = False
+            kept_nodes.append(node)
+            id_to_node[node.id] = node
+        # --- Create nodes that only exist in the snapshot ---
+        if len(id_to_node) != len(graph_nodes):
+            for node_id, data in graph.nodes(data=True):
+                if node_id in id_to_node:
+                    continue
                 x, y = data.get('pos', (0, 0))
                 node = Node(x, y, node_id)
                 node.node_name = data.get('name', node.node_name)
-                if hasattr(node, "invalidate_cache"):
-                    node.invalidate_cache()
-                new_nodes.append(node)
+                kept_nodes.append(node)
                 id_to_node[node_id] = node
-            self.nodes = new_nodes
-            # --- Restore connections from nx_graph ---
-            self.connections.clear()
-            for u, v, data in self.nx_graph.edges(data=True):
-                if u in id_to_node and v in id_to_node:
-                    label = data.get('label', "")
-                    conn = Connection(id_to_node[u], id_to_node[v], label=label)
-                    self.connections.append(conn)
-            # Update next_node_id
-            self.next_node_id = max([n.id for n in self.nodes], default=0) + 1
-            # Reset selection and drag state
-            self.selection.clear_selection(self.nodes)
-            self.marked_connection = None
-            self._node_drag_in_progress = False
-            self._node_drag_in_progress = False
+        self.nodes.clear()
+        self.nodes.extend(kept_nodes)
+        # --- Same for connections, keyed by their (start, end) ids ---
+        kept_connections = []
+        seen_edges = set()
+        for conn in self.connections:
+            u = conn.start_node.id
+            v = conn.end_node.id
+            if (u, v) in seen_edges or not graph.has_edge(u, v):
+                continue
+            if conn.start_node is not id_to_node[u] or conn.end_node is not id_to_node[v]:
+                continue
+            label = graph[u][v].get('label', "")
+            if conn.label != label:
+                conn.label = label
+            conn.marked = False
+            kept_connections.append(conn)
+            seen_edges.add((u, v))
+        if len(seen_edges) != graph.number_of_edges():
+            for u, v, data in graph.edges(data=True):
+                if (u, v) in seen_edges or u not in id_to_node or v not in id_to_node:
+                    continue
+                label = data.get('label', "")
+                kept_connections.append(Connection(id_to_node[u], id_to_node[v], label=label))
+        self.connections.clear()
+        for conn in kept_connections:
+            self.connections.append(conn)
+        # Update next_node_id
+        self.next_node_id = max(id_to_node, default=0) + 1
+        # Reset selection and drag state
+        self.selection.clear_selection(self.nodes)
+        self.marked_connection = None
+        self._journal_reset()
@@ -0,0 +1,52 @@
+import pygame
+from collections import OrderedDict
+from constants import TEXT_SURFACE_CACHE_SIZE
+
+_fonts = {}  # font size -> shared pygame.font.Font
+
+
+def get_font(size):
+    """Return the shared default font of the given size."""
+    font = _fonts.get(size)
+    if font is None:
+        font = pygame.font.Font(None, size)
+        _fonts[size] = font
+    return font
+
+
+class TextSurfaceCache:
+    """
+    Rendered text surfaces keyed by (text, font size, color).
+
+    Static labels are rendered once and then only blitted. The least
+    recently used surface is dropped when the cache is full.
+    """
+    def __init__(self, max_entries=TEXT_SURFACE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, size, color):
+        key = (text, size, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = get_font(size).render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+
+# Shared by every connection label
+label_cache = TextSurfaceCache()
@@ -52,6 +52,25 @@ class FPSCounter:
                 self._displayed_text = new_text
                 self._needs_redraw = True # Setze Flag, dass Text-Surface neu erstellt werden muss
 
+    def dirty_rect(self, screen: pygame.Surface) -> pygame.Rect:
+        """
+        Renders pending text and returns the screen area covered by the old and
+        the new text, or an empty rect if the text did not change.
+        """
+        if not (self._needs_redraw and self._displayed_text):
+            return pygame.Rect(0, 0, 0, 0)
+        old_rect = self._screen_rect(screen)
+        self._rendered_surf = self.font.render(self._displayed_text, True, self.color)
+        self._needs_redraw = False
+        return old_rect.union(self._screen_rect(screen))
+
+    def _screen_rect(self, screen: pygame.Surface) -> pygame.Rect:
+        x_offset, y_offset = self.pos
+        surf_rect = self._rendered_surf.get_rect()
+        # Always stick to bottom-left: x from left, y from bottom
+        surf_rect.topleft = (x_offset, screen.get_height() - surf_rect.height - y_offset)
+        return surf_rect
+
     def draw(self, screen: pygame.Surface):
         """
         Draws the FPS counter on the given screen surface.
@@ -61,9 +80,4 @@ class FPSCounter:
             self._needs_redraw = False
 
         if self._rendered_surf:
-            x_offset, y_offset = self.pos
-            surf_rect = self._rendered_surf.get_rect()
-            screen_rect = screen.get_rect()
-            # Always stick to bottom-left: x from left, y from bottom
-            draw_pos = (x_offset, screen_rect.height - surf_rect.height - y_offset)
-            screen.blit(self._rendered_surf, draw_pos)
+            screen.blit(self._rendered_surf, self._screen_rect(screen))
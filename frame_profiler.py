@@ -0,0 +1,170 @@
+import json
+import time
+from collections import deque
+import pygame
+from font_cache import get_font
+
+# Frame phases in the order they run
+PHASES = ("events", "grid", "connections", "nodes", "toolbar", "indicators", "text", "fps", "flip")
+
+
+class FrameProfiler:
+    """
+    Times the phases of each frame.
+
+    The frame loop calls begin_frame(), then mark(phase) right after each
+    phase finished, then end_frame(). A mark costs one perf_counter() call;
+    the time since the previous mark is booked on the phase. While neither
+    the overlay nor a trace is active, marks return immediately.
+    """
+    def __init__(self, history=240, update_interval=0.5):
+        self.history = history
+        self.update_interval = update_interval
+        self.samples = {phase: deque(maxlen=history) for phase in PHASES}  # phase -> ms per frame
+        self.frame_samples = deque(maxlen=history)
+        self.overlay_visible = False
+        self.tracing = False
+        self.trace_events = []
+        self.pos = (8, 8)  # Offset from the top right corner
+        self._frame_start = None
+        self._last_mark = 0.0
+        self._current = {}
+        self._trace_origin = time.perf_counter()
+        self._last_update = 0.0
+        self._surface = None
+        self._needs_redraw = False
+
+    @property
+    def active(self):
+        return self.overlay_visible or self.tracing
+
+    def begin_frame(self):
+        if not self.active:
+            self._frame_start = None
+            return
+        self._frame_start = self._last_mark = time.perf_counter()
+        self._current = {}
+
+    def mark(self, phase):
+        if self._frame_start is None:
+            return
+        now = time.perf_counter()
+        # Phases can run more than once per frame, e.g. events dispatched one by one
+        self._current[phase] = self._current.get(phase, 0.0) + (now - self._last_mark)
+        if self.tracing:
+            self.trace_events.append((phase, self._last_mark, now))
+        self._last_mark = now
+
+    def skip(self):
+        """Do not book the time since the last mark on any phase."""
+        if self._frame_start is not None:
+            self._last_mark = time.perf_counter()
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        end = time.perf_counter()
+        for phase in PHASES:
+            self.samples[phase].append(self._current.get(phase, 0.0) * 1000.0)
+        self.frame_samples.append((end - self._frame_start) * 1000.0)
+        if self.tracing:
+            self.trace_events.append(("frame", self._frame_start, end))
+        self._frame_start = None
+        if self.overlay_visible and end - self._last_update >= self.update_interval:
+            self._last_update = end
+            self._needs_redraw = True
+
+    # --- Statistics ---
+
+    @staticmethod
+    def percentile(samples, fraction):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        """phase -> (p50, p95, max) in ms over the rolling window, plus 'frame' for the whole frame."""
+        result = {}
+        for phase, samples in list(self.samples.items()) + [("frame", self.frame_samples)]:
+            result[phase] = (self.percentile(samples, 0.5), self.percentile(samples, 0.95), max(samples, default=0.0))
+        return result
+
+    # --- Overlay ---
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self._needs_redraw = self.overlay_visible
+        for samples in self.samples.values():
+            samples.clear()
+        self.frame_samples.clear()
+
+    def dirty_rect(self, screen):
+        """
+        Renders pending overlay text and returns the screen area covered by the
+        old and the new overlay, or an empty rect if it did not change.
+        """
+        if not (self.overlay_visible and self._needs_redraw):
+            return pygame.Rect(0, 0, 0, 0)
+        old_rect = self._screen_rect(screen)
+        self._surface = self._render()
+        self._needs_redraw = False
+        return old_rect.union(self._screen_rect(screen))
+
+    def draw(self, screen):
+        if not self.overlay_visible:
+            return
+        if self._surface is None or self._needs_redraw:
+            self._surface = self._render()
+            self._needs_redraw = False
+        screen.blit(self._surface, self._screen_rect(screen))
+
+    def _screen_rect(self, screen):
+        if self._surface is None:
+            return pygame.Rect(0, 0, 0, 0)
+        rect = self._surface.get_rect()
+        rect.topright = (screen.get_width() - self.pos[0], self.pos[1])
+        return rect
+
+    def _render(self):
+        font = get_font(16)
+        lines = [f"{'phase':<12}{'p50':>8}{'p95':>8}{'max':>8}  ms"]
+        for phase, (p50, p95, peak) in self.summary().items():
+            lines.append(f"{phase:<12}{p50:>8.2f}{p95:>8.2f}{peak:>8.2f}")
+        if self.tracing:
+            lines.append(f"tracing, {len(self.trace_events)} events")
+        line_height = font.get_linesize()
+        width = max(font.size(line)[0] for line in lines) + 12
+        surface = pygame.Surface((width, line_height * len(lines) + 8))
+        surface.fill((24, 24, 24))
+        pygame.draw.rect(surface, (90, 90, 90), surface.get_rect(), 1)
+        for i, line in enumerate(lines):
+            surface.blit(font.render(line, True, (220, 220, 220)), (6, 4 + i * line_height))
+        return surface
+
+    # --- Trace export ---
+
+    def start_trace(self):
+        self.trace_events = []
+        self._trace_origin = time.perf_counter()
+        self.tracing = True
+
+    def stop_trace(self, path="frame_trace.json"):
+        """Stop tracing and write the recorded phases as Chrome trace JSON (chrome://tracing, Perfetto)."""
+        self.tracing = False
+        self.write_trace(path)
+        self.trace_events = []
+
+    def write_trace(self, path):
+        origin = self._trace_origin
+        events = [{
+            "name": name,
+            "cat": "frame" if name == "frame" else "phase",
+            "ph": "X",
+            "ts": (start - origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": 1,
+            "tid": 1,
+        } for name, start, end in self.trace_events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
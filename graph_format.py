@@ -0,0 +1,337 @@
+"""
+Chunked binary graph file format.
+
+Layout (all numbers little endian):
+
+    header   magic b"NGEG", version u16, reserved u16
+    chunk*   tag 4 bytes, row count u32, payload length u64, payload
+             padded with zero bytes to a multiple of 8
+    end      tag b"END " with no rows and an empty payload
+
+Chunks are columnar tables of at most chunk_size rows, so files are written
+and read one chunk at a time:
+
+    b"NODE"  ids i8[n], x f8[n], y f8[n], name offsets u4[n + 1], UTF-8 names
+    b"EDGE"  source ids i8[n], target ids i8[n], label offsets u4[n + 1], UTF-8 labels
+
+After the tables come index chunks used to read single rows from a
+memory-mapped file (see lazy_graph.py), all row numbers i4:
+
+    b"TILE"  tile size f8, tile keys i8[t], row offsets i8[t + 1], node rows
+    b"IDIX"  node ids in ascending order i8[n], their rows
+    b"ADJX"  edge row offsets i8[n + 1], edge rows starting or ending at each node
+
+Readers skip chunk tags they do not know, so later versions can add
+sections without breaking older readers. Only the node name and position
+and the edge label are stored, the attributes the editor uses.
+"""
+import gc
+import struct
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import chain
+import networkx as nx
+import numpy as np
+from constants import GRAPH_FILE_CHUNK_SIZE, GRAPH_FILE_TILE_SIZE
+
+MAGIC = b"NGEG"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHH")
+_CHUNK = struct.Struct("<4sIQ")
+NODE_TAG = b"NODE"
+EDGE_TAG = b"EDGE"
+END_TAG = b"END "
+TILE_TAG = b"TILE"
+ID_INDEX_TAG = b"IDIX"
+ADJACENCY_TAG = b"ADJX"
+
+NodeChunk = namedtuple("NodeChunk", "ids xs ys names")
+EdgeChunk = namedtuple("EdgeChunk", "sources targets labels")
+
+
+def is_graph_file(path):
+    """True if the file starts with the magic bytes of this format."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+_gc_lock = threading.Lock()
+_gc_pauses = 0  # gc_paused blocks running, on any thread
+_gc_was_enabled = False
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic GC while the block runs. Bulk reads and writes allocate
+    hundreds of thousands of dicts and tuples that all stay alive, so
+    collection passes over them only cost time.
+
+    The GC switch is process wide and jobs on several threads pause it at
+    once, so the pauses are counted: the GC is enabled again when the last
+    block ends, and only if it was enabled before the first one started.
+    """
+    global _gc_pauses, _gc_was_enabled
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+# --- Writing ---
+
+def _pack_strings(strings):
+    offsets = np.zeros(len(strings) + 1, dtype="<u4")
+    text = "".join(strings)
+    if text.isascii():
+        # Character lengths are byte lengths: encode everything at once
+        np.cumsum(np.fromiter(map(len, strings), dtype=np.int64, count=len(strings)), out=offsets[1:])
+        return offsets.tobytes() + text.encode("ascii")
+    encoded = [s.encode("utf-8") for s in strings]
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return offsets.tobytes() + b"".join(encoded)
+
+
+def _write_chunk(f, tag, count, columns):
+    payload_length = sum(len(column) for column in columns)
+    # Pad so every payload starts 8-byte aligned; NumPy copies unaligned views
+    padding = -payload_length % 8
+    f.write(_CHUNK.pack(tag, count, payload_length + padding))
+    for column in columns:
+        f.write(column)
+    f.write(bytes(padding))
+
+
+def snapshot_tables(graph):
+    """
+    Copy what a graph file stores out of graph: (nodes, edges) lists of
+    (id, name, (x, y)) and (source, target, label) tuples. The tuples share
+    nothing mutable with the graph, so they can be written on another thread.
+    """
+    with gc_paused():
+        nodes = [(node_id, data.get("name", ""), data.get("pos", (0, 0))) for node_id, data in graph.nodes(data=True)]
+        # adjacency() is much cheaper to walk than the edge data view
+        edges = [(u, v, data.get("label", "")) for u, neighbours in graph.adjacency()
+                 for v, data in neighbours.items()]
+    return nodes, edges
+
+
+def graph_from_tables(nodes, edges):
+    """A new DiGraph from node and edge tables as returned by snapshot_tables."""
+    graph = nx.DiGraph()
+    with gc_paused():
+        # Filled directly like in _read_chunks, add_nodes_from/add_edges_from check every item
+        node_data = graph._node
+        successors = graph._succ
+        predecessors = graph._pred
+        for node_id, name, pos in nodes:
+            node_data[node_id] = {"name": name, "pos": pos}
+            successors[node_id] = {}
+            predecessors[node_id] = {}
+        for u, v, label in edges:
+            if u in successors and v in successors:
+                data = {"label": label}
+                successors[u][v] = data
+                predecessors[v][u] = data
+            else:
+                graph.add_edge(u, v, label=label)
+    return graph
+
+
+def write_graph(graph, f, chunk_size=GRAPH_FILE_CHUNK_SIZE):
+    """Write graph to the binary file object f, chunk by chunk."""
+    write_tables(*snapshot_tables(graph), f, chunk_size)
+
+
+def write_tables(nodes, edges, f, chunk_size=GRAPH_FILE_CHUNK_SIZE, progress=None,
+                 tile_size=GRAPH_FILE_TILE_SIZE):
+    """
+    Write node and edge tables as returned by snapshot_tables to the binary
+    file object f, see write_columns.
+    """
+    with gc_paused():
+        # zip(*rows) splits the tuples in C, far cheaper than a generator per column
+        ids, names, positions = zip(*nodes) if nodes else ((), (), ())
+        sources, targets, labels = zip(*edges) if edges else ((), (), ())
+        xy = np.fromiter(chain.from_iterable(positions), dtype="<f8", count=2 * len(nodes)).reshape(-1, 2)
+        write_columns(np.fromiter(ids, dtype="<i8", count=len(ids)), xy[:, 0], xy[:, 1], names,
+                      np.fromiter(sources, dtype="<i8", count=len(sources)),
+                      np.fromiter(targets, dtype="<i8", count=len(targets)), labels,
+                      f, chunk_size, progress, tile_size)
+
+
+def write_columns(ids, xs, ys, names, sources, targets, labels, f, chunk_size=GRAPH_FILE_CHUNK_SIZE,
+                  progress=None, tile_size=GRAPH_FILE_TILE_SIZE):
+    """
+    Write the node columns (ids, xs, ys as NumPy arrays, names a sequence of
+    str) and edge columns (sources, targets, labels) to the binary file
+    object f, followed by the index chunks. progress(fraction) is called
+    after every chunk.
+    """
+    ids = np.asarray(ids, dtype="<i8")
+    xs = np.ascontiguousarray(xs, dtype="<f8")
+    ys = np.ascontiguousarray(ys, dtype="<f8")
+    sources = np.asarray(sources, dtype="<i8")
+    targets = np.asarray(targets, dtype="<i8")
+    total = max(1, len(ids) + len(sources))
+    written = 0
+    f.write(_HEADER.pack(MAGIC, VERSION, 0))
+    for start in range(0, len(ids), chunk_size):
+        end = start + chunk_size
+        _write_chunk(f, NODE_TAG, len(ids[start:end]), (
+            ids[start:end].tobytes(),
+            xs[start:end].tobytes(),
+            ys[start:end].tobytes(),
+            _pack_strings(names[start:end]),
+        ))
+        written += len(ids[start:end])
+        if progress is not None:
+            progress(written / total)
+    for start in range(0, len(sources), chunk_size):
+        end = start + chunk_size
+        _write_chunk(f, EDGE_TAG, len(sources[start:end]), (
+            sources[start:end].tobytes(), targets[start:end].tobytes(), _pack_strings(labels[start:end])))
+        written += len(sources[start:end])
+        if progress is not None:
+            progress(written / total)
+    _write_index(f, ids, xs, ys, sources, targets, tile_size)
+    _write_chunk(f, END_TAG, 0, ())
+
+
+def tile_keys(tx, ty):
+    """Sortable int64 key of the tile (tx, ty); works on scalars and arrays."""
+    return (np.int64(tx) << 32) + (np.int64(ty) + (1 << 31))
+
+
+def _write_index(f, ids, xs, ys, sources, targets, tile_size):
+    # Index chunks let lazy readers (lazy_graph.py) find rows without reading the tables
+    # TILE: node rows grouped by the tile_size square they start in
+    tx = np.floor(xs / tile_size).astype(np.int64)
+    ty = np.floor(ys / tile_size).astype(np.int64)
+    keys, inverse = np.unique(tile_keys(tx, ty), return_inverse=True)
+    rows = np.argsort(inverse, kind="stable").astype("<i4")
+    offsets = np.zeros(len(keys) + 1, dtype="<i8")
+    np.cumsum(np.bincount(inverse, minlength=len(keys)), out=offsets[1:])
+    _write_chunk(f, TILE_TAG, len(keys), (
+        struct.pack("<d", tile_size), keys.astype("<i8").tobytes(), offsets.tobytes(), rows.tobytes()))
+    # IDIX: ids in ascending order and the row of each
+    order = np.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    _write_chunk(f, ID_INDEX_TAG, len(ids), (sorted_ids.tobytes(), order.astype("<i4").tobytes()))
+    # ADJX: per node row the edge rows starting or ending there (CSR layout)
+    endpoint_rows = np.concatenate((_rows_of(sources, sorted_ids, order), _rows_of(targets, sorted_ids, order)))
+    edge_rows = np.concatenate((np.arange(len(sources)), np.arange(len(targets))))
+    known = endpoint_rows >= 0
+    endpoint_rows = endpoint_rows[known]
+    edge_rows = edge_rows[known]
+    by_row = np.argsort(endpoint_rows, kind="stable")
+    offsets = np.zeros(len(ids) + 1, dtype="<i8")
+    np.cumsum(np.bincount(endpoint_rows, minlength=len(ids)), out=offsets[1:])
+    _write_chunk(f, ADJACENCY_TAG, len(ids), (offsets.tobytes(), edge_rows[by_row].astype("<i4").tobytes()))
+
+
+def _rows_of(node_ids, sorted_ids, order):
+    # Row of every id in node_ids, -1 where the id has no row
+    if not len(sorted_ids):
+        return np.full(len(node_ids), -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_ids, node_ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == node_ids, order[positions], -1)
+
+
+# --- Reading ---
+
+def _unpack_strings(payload, start, count):
+    offsets = np.frombuffer(payload, dtype="<u4", count=count + 1, offset=start)
+    blob = payload[start + 4 * (count + 1):]
+    if blob.isascii():
+        # Byte offsets are character offsets: decode once and slice the str
+        text = blob.decode("ascii")
+        bounds = offsets.tolist()
+        return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+    bounds = offsets.tolist()
+    return [blob[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+
+def _read_exact(f, length):
+    data = f.read(length)
+    if len(data) != length:
+        raise ValueError("Graph file is truncated")
+    return data
+
+
+def read_header(f):
+    magic, version, _ = _HEADER.unpack(_read_exact(f, _HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("Not a graph file")
+    if version > VERSION:
+        raise ValueError(f"Graph file version {version} is newer than supported version {VERSION}")
+    return version
+
+
+def iter_chunks(f):
+    """Yield NodeChunk and EdgeChunk tuples from the binary file object f, one chunk at a time."""
+    read_header(f)
+    while True:
+        tag, count, length = _CHUNK.unpack(_read_exact(f, _CHUNK.size))
+        if tag == END_TAG:
+            return
+        payload = _read_exact(f, length)
+        if tag == NODE_TAG:
+            ids = np.frombuffer(payload, dtype="<i8", count=count)
+            xs = np.frombuffer(payload, dtype="<f8", count=count, offset=8 * count)
+            ys = np.frombuffer(payload, dtype="<f8", count=count, offset=16 * count)
+            yield NodeChunk(ids, xs, ys, _unpack_strings(payload, 24 * count, count))
+        elif tag == EDGE_TAG:
+            sources = np.frombuffer(payload, dtype="<i8", count=count)
+            targets = np.frombuffer(payload, dtype="<i8", count=count, offset=8 * count)
+            yield EdgeChunk(sources, targets, _unpack_strings(payload, 16 * count, count))
+
+
+def read_graph(f, progress=None):
+    """
+    Read a whole graph from the binary file object f into a new DiGraph.
+    progress(fraction) is called after every chunk with the share of the file read.
+    """
+    with gc_paused():
+        return _read_chunks(f, progress)
+
+
+def _read_chunks(f, progress):
+    if progress is not None:
+        start = f.tell()
+        size = max(1, f.seek(0, 2) - start)
+        f.seek(start)
+    graph = nx.DiGraph()
+    # Fill the node and adjacency dicts directly; add_nodes_from/add_edges_from
+    # check every item and would dominate the load time
+    node_data = graph._node
+    successors = graph._succ
+    predecessors = graph._pred
+    for chunk in iter_chunks(f):
+        if isinstance(chunk, NodeChunk):
+            ids = chunk.ids.tolist()
+            node_data.update(zip(ids, [{"name": name, "pos": (x, y)} for name, x, y
+                                       in zip(chunk.names, chunk.xs.tolist(), chunk.ys.tolist())]))
+            successors.update(zip(ids, [{} for _ in ids]))
+            predecessors.update(zip(ids, [{} for _ in ids]))
+        else:
+            for u, v, label in zip(chunk.sources.tolist(), chunk.targets.tolist(), chunk.labels):
+                if u in successors and v in successors:
+                    data = {"label": label}
+                    successors[u][v] = data
+                    predecessors[v][u] = data
+                else:
+                    graph.add_edge(u, v, label=label)  # Edge to a node without a row
+        if progress is not None:
+            progress((f.tell() - start) / size)
+    return graph
@@ -0,0 +1,66 @@
+from connection_list import ConnectionList
+from graph_format import gc_paused, graph_from_tables
+from node import Node
+from node_list import NodeList
+from node_store import node_store
+
+
+def tables_from_columns(columns):
+    """(nodes, edges) as in graph_format.snapshot_tables from GraphModel.columns(); runs on any thread."""
+    ids, xs, ys, rows, store_names, sources, targets, labels = columns
+    with gc_paused():
+        ids = ids.tolist()
+        names = [Node._id_to_name(node_id) if store_names[row] is None else store_names[row]
+                 for row, node_id in zip(rows.tolist(), ids)]
+        nodes = list(zip(ids, names, zip(xs.tolist(), ys.tolist())))
+        edges = list(zip(sources.tolist(), targets.tolist(), labels))
+    return nodes, edges
+
+
+class GraphModel:
+    """
+    The nodes and connections of the scene, the only copy of the graph.
+
+    Edits change the Node and Connection objects and nothing else. Where a
+    networkx graph is wanted (snapshot undo, printing, tests),
+    to_networkx() builds one from them; tables() gives the rows graph
+    files store without going through networkx.
+    """
+    def __init__(self, spatial_index=None):
+        self.nodes = NodeList(spatial_index)
+        self.connections = ConnectionList(spatial_index)
+
+    def to_networkx(self):
+        """A new DiGraph with the node names and positions and the connection labels."""
+        return graph_from_tables(*self.tables())
+
+    def tables(self):
+        """(nodes, edges) as in graph_format.snapshot_tables, read from the node store columns."""
+        return tables_from_columns(self.columns())
+
+    def columns(self):
+        """
+        Copies of the store columns graph files need, for tables_from_columns.
+        Only NumPy copies and one pass over the connections, so a snapshot
+        is cheap on the main thread; the tuples are built by whoever writes.
+        """
+        with gc_paused():
+            rows = node_store.rows_of(self.nodes)
+            ids, xs, ys = node_store.gather(rows, "ids", "xs", "ys")
+            connections = self.connections.all()
+            sources, = node_store.gather(node_store.rows_of([conn.start_node for conn in connections]), "ids")
+            targets, = node_store.gather(node_store.rows_of([conn.end_node for conn in connections]), "ids")
+            labels = [conn.label for conn in connections]
+            # Names are indexed by row; renames after the snapshot go to the live list
+            names = list(node_store.names)
+        return ids, xs, ys, rows, names, sources, targets, labels
+
+    def replace(self, nodes, connections):
+        self.clear()
+        self.nodes.extend(nodes)
+        for conn in connections:
+            self.connections.append(conn)
+
+    def clear(self):
+        self.nodes.clear()
+        self.connections.clear()
@@ -1,63 +1,298 @@
+import numbers
 import os
 import pickle
 from connection import Connection
+from constants import GRAPH_FILE, LEGACY_GRAPH_FILE
+from background_job import BackgroundJob
+from graph_format import gc_paused, is_graph_file, read_graph, write_tables
+from graph_model import tables_from_columns
+from lazy_graph import LazyGraphLoader, MappedGraph
 from node import Node
+from settings import LAZY_LOAD_MIN_NODES
+
+
+class _GraphUnpickler(pickle.Unpickler):
+    """Unpickler for legacy .gpickle files that only resolves networkx graph classes."""
+    _ALLOWED_BUILTINS = {"dict", "list", "tuple", "set", "frozenset", "object", "int", "float", "str", "bool"}
+    # Pickle protocols 0 and 1 store the Python 2 names of these modules
+    _PY2_MODULES = {"__builtin__": "builtins", "copy_reg": "copyreg"}
+
+    def find_class(self, module, name):
+        module = self._PY2_MODULES.get(module, module)
+        if module.startswith("networkx.classes."):
+            return super().find_class(module, name)
+        if module == "builtins" and name in self._ALLOWED_BUILTINS:
+            return super().find_class(module, name)
+        if module == "copyreg" and name == "_reconstructor":
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a graph file")
+
+
+def read_legacy_graph(f):
+    return _GraphUnpickler(f).load()
+
+
+def remap_node_ids(graph):
+    """
+    New ids for the nodes of graph whose id the editor cannot use, i.e. that
+    is not a positive integer (older files may hold floats, strings or NumPy
+    integers). Returns {old id: new id}; new ids continue after the highest
+    usable id, in node order. Linear in the number of nodes.
+    """
+    remap = {}
+    highest = 0
+    for node_id in graph:
+        if type(node_id) is int and node_id > 0:
+            highest = max(highest, node_id)
+        elif isinstance(node_id, numbers.Integral) and not isinstance(node_id, bool) and node_id > 0:
+            # Equal to an int, so it cannot collide with one
+            remap[node_id] = int(node_id)
+            highest = max(highest, int(node_id))
+        else:
+            remap[node_id] = None
+    for node_id, new_id in remap.items():
+        if new_id is None:
+            highest += 1
+            remap[node_id] = highest
+    return remap
+
+
+class TablesSource:
+    """
+    Builds the node and edge tables of a scene snapshot when called, on any
+    thread. release() runs once afterwards, or through discard() for a
+    source that is dropped without being called.
+    """
+    def __init__(self, build, release=None):
+        self._build = build
+        self._release = release
+
+    def __call__(self):
+        try:
+            return self._build()
+        finally:
+            self.discard()
+
+    def discard(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
 
 class GraphPersistence:
+    """
+    Saves and loads the editor's graph.
+
+    save_graph/load_graph block until done. The *_async variants do the file
+    work on a BackgroundJob and leave it to poll(), called once per frame on
+    the main thread, to swap a loaded scene in.
+
+    Large files are opened lazily instead (open_graph_lazy): a LazyGraphLoader
+    keeps the scene filled around the viewport, and saving merges the edits
+    with the rows of the mapped file.
+    """
+    # Share of a load's progress taken by reading the file, the rest is building the scene
+    READ_SHARE = 0.6
+
     def __init__(self, editor):
         self.editor = editor
+        self.job = None  # Running BackgroundJob, if any
+        self._on_job_done = None
+        self.lazy_loader = None  # LazyGraphLoader of a lazily opened file
+
+    def busy(self):
+        return self.job is not None
+
+    def save_graph(self, filename=GRAPH_FILE):
+        tables = self.tables_source()
+        self._finish_save(self._write_tables(*tables(), filename))
+
+    def save_graph_async(self, filename=GRAPH_FILE):
+        if self.busy():
+            print(f"Cannot save while busy: {self.job.label}")
+            return
+        # Snapshot on the main thread, the edits that follow do not end up in the file
+        tables = self.tables_source()
+        self._on_job_done = self._finish_save
+        self.job = BackgroundJob(f"Saving {os.path.basename(filename)}",
+                                 lambda job: (self._write_tables(*tables(), filename, job.report),))
+
+    def tables_source(self):
+        """Take a snapshot of the scene; returns a TablesSource building the tables from it."""
+        if self.lazy_loader is None:
+            columns = self.editor.model.columns()
+            return TablesSource(lambda: tables_from_columns(columns))
+        loader = self.lazy_loader
+        snapshot = loader.snapshot()
+        # The mapping stays open for the source even if the file is closed meanwhile
+        loader.mapped.acquire()
+        return TablesSource(lambda: loader.merged_tables(snapshot), loader.mapped.release)
+
+    def _finish_save(self, pending):
+        if pending is None:
+            return
+        # The target is the lazily mapped file on a platform that cannot replace
+        # mapped files: close it, replace it and open the saved file instead
+        temp_name, filename = pending
+        if self.lazy_loader is None:
+            os.replace(temp_name, filename)  # Closed while saving
+            return
+        mapped = self.lazy_loader.mapped
+        self.close_lazy()
+        # A checkpoint job may still read the mapping, and a mapped file cannot be replaced here
+        mapped.closed.wait()
+        os.replace(temp_name, filename)
+        self.open_graph_lazy(filename)
+
+    def load_graph(self, filename=None):
+        filename = self._resolve_load_name(filename)
+        if filename is None:
+            return
+        self._install_columns(*self._build_scene(self._read_graph(filename)))
+
+    def load_graph_async(self, filename=None):
+        if self.busy():
+            print(f"Cannot load while busy: {self.job.label}")
+            return
+        filename = self._resolve_load_name(filename)
+        if filename is None:
+            return
+        if self._open_lazy_if_large(filename):
+            return
+
+        def work(job):
+            graph = self._read_graph(filename, lambda fraction: job.report(fraction * self.READ_SHARE))
+            return self._build_scene(graph, job.report)
+        self._on_job_done = self._install_columns
+        self.job = BackgroundJob(f"Loading {os.path.basename(filename)}", work)
+
+    def open_graph_lazy(self, filename):
+        """Show a graph file without loading it; nodes are loaded as they come into view."""
+        self._open_lazy(MappedGraph(filename))
+
+    def _open_lazy_if_large(self, filename):
+        if not is_graph_file(filename):
+            return False
+        try:
+            mapped = MappedGraph(filename)
+        except ValueError:
+            return False  # No index, an older file
+        if mapped.node_count < LAZY_LOAD_MIN_NODES:
+            mapped.close()
+            return False
+        self._open_lazy(mapped)
+        return True
 
-    def save_graph(self, filename="graph.gpickle"):
-        with open(filename, "wb") as f:
-            pickle.dump(self.editor.nx_graph, f)
+    def _open_lazy(self, mapped):
+        self._install_scene([], [], checkpoint=False)
+        self.lazy_loader = LazyGraphLoader(self.editor, mapped)
+        # New nodes must not take the id of a row that is not loaded yet
+        self.editor.next_node_id = mapped.max_id + 1
+        self.lazy_loader.update()
+        self.editor._journal_reset()
 
-    def load_graph(self, filename="graph.gpickle"):
+    def close_lazy(self):
+        if self.lazy_loader is not None:
+            self.lazy_loader.close()
+            self.lazy_loader = None
+
+    def poll(self):
+        """Finish a completed background job; returns True if one finished this call."""
+        job = self.job
+        if job is None or not job.finished():
+            return False
+        on_done = self._on_job_done
+        self.job = None
+        self._on_job_done = None
+        try:
+            result = job.result()
+        except Exception as error:  # Whatever the work ran into, the editor goes on
+            print(f"{job.label} failed: {error!r}")
+            return True
+        if on_done is not None:
+            on_done(*result)
+        return True
+
+    def _write_tables(self, nodes, edges, filename, progress=None):
+        # Write next to the target and swap it in, so a failed save keeps the old file
+        temp_name = filename + ".tmp"
+        with open(temp_name, "wb") as f:
+            write_tables(nodes, edges, f, progress=progress)
+        loader = self.lazy_loader
+        if os.name == "nt" and loader is not None and os.path.samefile(loader.mapped.path, filename):
+            return temp_name, filename
+        os.replace(temp_name, filename)
+        return None
+
+    @staticmethod
+    def _resolve_load_name(filename):
+        if filename is None:
+            filename = GRAPH_FILE if os.path.exists(GRAPH_FILE) else LEGACY_GRAPH_FILE
         if not os.path.exists(filename):
             print(f"File {filename} does not exist.")
-            return
+            return None
+        return filename
+
+    @staticmethod
+    def _read_graph(filename, progress=None):
         with open(filename, "rb") as f:
-            self.editor.nx_graph = pickle.load(f)
-        # Rebuild self.nodes and self.connections from nx_graph
-        self.editor.nodes.clear()
-        self.editor.connections.clear()
-        id_to_node = {}
-        used_ids = set()
-        # Recreate nodes, resolve id collisions
-        for orig_id, data in self.editor.nx_graph.nodes(data=True):
-            x, y = data.get('pos', (0, 0))
-            node_id = orig_id
-            while node_id in used_ids:
-                node_id += 1
-            used_ids.add(node_id)
-            node = Node(x, y, node_id)
-            node.node_name = data.get('name', node.node_name)
-            id_to_node[orig_id] = node  # map original id to new node
-            self.editor.nodes.append(node)
-            # Ensure nx_graph node id matches node.id
-            if node_id != orig_id:
-                self.editor.nx_graph.remove_node(orig_id)
-                self.editor.nx_graph.add_node(node_id, **data)
-        # After remapping nodes:
-        old_to_new_id = {orig_id: node.id for orig_id, node in id_to_node.items()}
-
-        # Collect all edges and their data
-        edges = list(self.editor.nx_graph.edges(data=True))
-        self.editor.nx_graph.clear_edges()  # Remove all edges
-
-        # Re-add edges with remapped node IDs
-        for u, v, data in edges:
-            new_u = old_to_new_id.get(u, u)
-            new_v = old_to_new_id.get(v, v)
-            self.editor.nx_graph.add_edge(new_u, new_v, **data)
-        # Recreate connections
-        for u, v, data in list(self.editor.nx_graph.edges(data=True)):
-            if u in id_to_node and v in id_to_node:
-                label = data.get('label', "")
-                conn = Connection(id_to_node[u], id_to_node[v], label=label)
-                self.editor.connections.append(conn)
+            if is_graph_file(filename):
+                return read_graph(f, progress)
+            return read_legacy_graph(f)
+
+    def _build_scene(self, graph, progress=None):
+        """
+        The scene of a loaded graph as plain columns: node ids, xs, ys and
+        names (None for the default name), and (source id, target id, label)
+        edges, all with the new ids. Touches nothing of the editor and
+        creates no Node, whose store row only the main thread may allocate,
+        so it can run on a worker thread; _install_columns does the rest.
+        """
+        with gc_paused():
+            remap = remap_node_ids(graph)
+            if progress is not None:
+                progress(self.READ_SHARE + (1 - self.READ_SHARE) / 2)
+            node_ids = list(graph)
+            ids = [remap.get(node_id, node_id) for node_id in node_ids] if remap else node_ids
+            data = [graph._node[node_id] for node_id in node_ids]
+            xs, ys = zip(*[d.get('pos', (0, 0)) for d in data]) if data else ((), ())
+            names = [d.get('name') for d in data]
+            edges = [(remap.get(u, u), remap.get(v, v), d.get('label', ""))
+                     for u, neighbours in graph.adjacency() for v, d in neighbours.items()]
+        if progress is not None:
+            progress(1.0)
+        return ids, xs, ys, names, edges
+
+    @staticmethod
+    def _create_scene(ids, xs, ys, names, edges):
+        """The Node and Connection objects for the columns of _build_scene; main thread only."""
+        with gc_paused():
+            nodes = Node.create_many(ids, xs, ys, names)
+            id_to_node = dict(zip(ids, nodes))
+            connections = [Connection(id_to_node[u], id_to_node[v], label=label) for u, v, label in edges]
+        return nodes, connections
+
+    def set_graph(self, graph):
+        """Replace the editor's scene with the nodes and connections of graph."""
+        self._install_columns(*self._build_scene(graph))
+
+    def _install_columns(self, ids, xs, ys, names, edges):
+        self._install_scene(*self._create_scene(ids, xs, ys, names, edges))
+
+    def _install_scene(self, nodes, connections, checkpoint=True):
+        """Replace the editor's scene in one step on the main thread."""
+        self.close_lazy()
+        editor = self.editor
+        # A drag of the old nodes ends before they are replaced
+        editor._cancel_drag()
+        editor.model.replace(nodes, connections)
         # Set next_node_id to one higher than the highest used id
-        self.editor.next_node_id = max([n.id for n in self.editor.nodes], default=0) + 1
-        # Reset selection and drag state
-        self.editor.selection.clear_selection(self.editor.nodes)
-        self.editor.marked_connection = None
-        self.editor._node_drag_in_progress = False
+        editor.next_node_id = max([n.id for n in editor.nodes], default=0) + 1
+        # Reset selection
+        editor.selection.clear_selection(editor.nodes)
+        editor.marked_connection = None
+        # Recorded commands refer to the replaced nodes, so the history starts over
+        editor.undo_stack.clear()
+        editor.damage.add_full()
+        if checkpoint:
+            editor._journal_reset()
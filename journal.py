@@ -0,0 +1,247 @@
+"""
+Append-only journal of model edits for crash recovery.
+
+The journal directory holds numbered generations:
+
+    checkpoint-<g>.ngraph   the whole graph when generation g started (graph_format)
+    journal-<g>.jsonl       a header line, then one JSON line per edit since then
+
+Every edit appends one short line to the current segment, so its cost does
+not depend on the graph size. Every compact_every edits, and whenever the
+scene is replaced as a whole (load, clear all, snapshot undo), a new
+generation starts: the main thread only copies the scene's columns (see
+GraphModel.columns), a BackgroundJob builds the tables from them and
+writes the checkpoint; once it is on disk, older files are deleted.
+
+Recovery starts from the newest complete checkpoint and replays the
+segments from there on. A segment whose header says "reset" only applies
+on top of its own checkpoint, so replay stops at one whose checkpoint was
+never written.
+"""
+import json
+import os
+import re
+from contextlib import contextmanager
+import networkx as nx
+from background_job import BackgroundJob
+from constants import JOURNAL_DIR
+from graph_format import read_graph, write_tables
+from settings import JOURNAL_COMPACT_EVERY
+
+JOURNAL_VERSION = 1
+_FILE_NAME = re.compile(r"^(checkpoint|journal)-(\d+)\.(ngraph|jsonl)$")
+
+
+def apply_entry(graph, entry):
+    """Apply one journal entry to an nx.DiGraph."""
+    op, *args = entry
+    if op == "add_node":
+        node_id, name, x, y = args
+        graph.add_node(node_id, name=name, pos=(x, y))
+    elif op == "remove_node":
+        if args[0] in graph:
+            graph.remove_node(args[0])
+    elif op == "move":
+        node_id, x, y = args
+        if node_id in graph:
+            graph.nodes[node_id]["pos"] = (x, y)
+    elif op == "move_nodes":
+        for node_id, x, y in zip(*args):
+            if node_id in graph:
+                graph.nodes[node_id]["pos"] = (x, y)
+    elif op == "rename":
+        node_id, name = args
+        if node_id in graph:
+            graph.nodes[node_id]["name"] = name
+    elif op == "add_edge":
+        u, v, label = args
+        graph.add_edge(u, v, label=label)
+    elif op == "remove_edge":
+        if graph.has_edge(*args):
+            graph.remove_edge(*args)
+    elif op == "relabel":
+        u, v, label = args
+        if graph.has_edge(u, v):
+            graph[u][v]["label"] = label
+    else:
+        raise ValueError(f"Unknown journal entry {op!r}")
+
+
+class EditJournal:
+    """
+    Logs the editor's edits to directory; see the module docstring.
+
+    start() restores what a previous session left behind and attaches the
+    journal to the editor, which then calls record() from its scene
+    primitives and poll() once per frame.
+    """
+    def __init__(self, directory=JOURNAL_DIR, compact_every=JOURNAL_COMPACT_EVERY):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.generation = 0
+        self.entries = 0  # Entries in the current segment
+        self.job = None  # BackgroundJob writing a checkpoint
+        self._queued = None  # (generation, tables) waiting for the running job
+        self._file = None
+        self._suspended = 0
+        self._unused = []  # Files recover() could not replay
+
+    def checkpoint_path(self, generation):
+        return os.path.join(self.directory, f"checkpoint-{generation}.ngraph")
+
+    def segment_path(self, generation):
+        return os.path.join(self.directory, f"journal-{generation}.jsonl")
+
+    def _generations(self):
+        # (checkpoint generations, segment generations) present in the directory
+        checkpoints = []
+        segments = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                match = _FILE_NAME.match(name)
+                if match:
+                    (checkpoints if match.group(1) == "checkpoint" else segments).append(int(match.group(2)))
+        return sorted(checkpoints), sorted(segments)
+
+    # --- Recording ---
+
+    def record(self, *entry):
+        if self._file is None or self._suspended:
+            return
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        # Flushed per edit, so a crash of the editor loses nothing
+        self._file.flush()
+        self.entries += 1
+
+    @contextmanager
+    def suspended(self):
+        """Changes to the scene that are not edits, e.g. lazy loading, are not recorded."""
+        self._suspended += 1
+        try:
+            yield
+        finally:
+            self._suspended -= 1
+
+    def start(self, editor):
+        """
+        Restore the scene a previous session left behind, then log editor's
+        edits. Returns True if something was restored.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        graph = self.recover()
+        if graph is not None:
+            editor.graph_persistence.set_graph(graph)
+        # What could not be replayed never will be; the scene continues the rest
+        for path in self._unused:
+            os.remove(path)
+        self._unused = []
+        editor.journal = self
+        self._begin_generation(editor, reset=False)
+        return graph is not None
+
+    def compact(self, editor, reset=False):
+        """
+        Start a new generation: snapshot the scene here and write it as a
+        checkpoint in the background. reset means the scene was replaced as a
+        whole, so the previous segments do not lead up to it.
+        """
+        if self._file is not None:
+            self._begin_generation(editor, reset)
+
+    def _begin_generation(self, editor, reset):
+        tables = editor.graph_persistence.tables_source()
+        self.generation += 1
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.segment_path(self.generation), "w")
+        self._file.write(json.dumps({"version": JOURNAL_VERSION, "reset": reset}) + "\n")
+        self._file.flush()
+        self.entries = 0
+        if self.job is None:
+            self._write_checkpoint(self.generation, tables)
+        else:
+            # A newer snapshot replaces one that is still waiting
+            if self._queued is not None:
+                self._queued[1].discard()
+            self._queued = (self.generation, tables)
+
+    def _write_checkpoint(self, generation, tables):
+        path = self.checkpoint_path(generation)
+
+        def work(job):
+            nodes, edges = tables()
+            with open(path + ".tmp", "wb") as f:
+                write_tables(nodes, edges, f, progress=job.report)
+            os.replace(path + ".tmp", path)
+            return generation
+        self.job = BackgroundJob(f"Checkpoint {generation}", work)
+
+    def poll(self, editor):
+        if self.job is not None and self.job.finished():
+            job = self.job
+            self.job = None
+            try:
+                self._remove_before(job.result())
+            except Exception as error:  # A failed checkpoint must not end the session it protects
+                print(f"{job.label} failed: {error!r}")
+            if self._queued is not None:
+                self._write_checkpoint(*self._queued)
+                self._queued = None
+        if self.entries >= self.compact_every and self.job is None:
+            self.compact(editor)
+
+    def _remove_before(self, generation):
+        checkpoints, segments = self._generations()
+        for old in checkpoints:
+            if old < generation:
+                os.remove(self.checkpoint_path(old))
+        for old in segments:
+            if old < generation:
+                os.remove(self.segment_path(old))
+
+    def close(self):
+        if self._queued is not None:
+            self._queued[1].discard()
+            self._queued = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --- Recovery ---
+
+    def recover(self):
+        """
+        The graph the files of a previous session add up to, or None if there
+        are none. Later generations continue the numbering.
+        """
+        checkpoints, segments = self._generations()
+        self._unused = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                        if name.endswith(".tmp")] if os.path.isdir(self.directory) else []
+        if not checkpoints and not segments:
+            return None
+        self.generation = max(checkpoints + segments)
+        base = checkpoints[-1] if checkpoints else 0
+        if checkpoints:
+            with open(self.checkpoint_path(base), "rb") as f:
+                graph = read_graph(f)
+        else:
+            graph = nx.DiGraph()
+        for i, generation in enumerate(segments):
+            if generation < base:
+                continue
+            with open(self.segment_path(generation)) as f:
+                lines = f.read().split("\n")
+            try:
+                header = json.loads(lines[0])
+            except json.JSONDecodeError:
+                header = None  # Crashed while the header was written
+            if header is None or generation > base and header.get("reset"):
+                self._unused.extend(self.segment_path(unused) for unused in segments[i:])
+                break
+            for line in lines[1:]:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Empty or cut off last line
+                apply_entry(graph, entry)
+        return graph
@@ -0,0 +1,377 @@
+import mmap
+import struct
+import threading
+from bisect import bisect_right
+from contextlib import nullcontext
+import numpy as np
+from connection import Connection
+from graph_format import (_CHUNK, ADJACENCY_TAG, EDGE_TAG, END_TAG, ID_INDEX_TAG, NODE_TAG, TILE_TAG,
+                          read_header, tile_keys)
+from node import Node
+from settings import LAZY_LOAD_MAX_NODES
+
+
+class MappedGraph:
+    """
+    Random access to the rows of a memory-mapped graph file.
+
+    Opening only walks the chunk headers and wraps the index chunks in
+    NumPy views of the mapping, so it costs the same for any file size.
+    Rows are numbered in file order, nodes and edges separately.
+
+    A reader on another thread acquire()s the mapping first and release()s
+    it when done. close() with readers left only marks the mapping closed
+    and the last release() closes it, so a save or checkpoint job can
+    finish after the file was closed in the editor. closed is set once the
+    mapping is really gone.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.closed = threading.Event()
+        self._lock = threading.Lock()
+        self._readers = 0
+        self._closing = False
+        self._map = None
+        self._file = open(path, "rb")
+        try:
+            read_header(self._file)
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._scan()
+        except Exception:
+            self.close()
+            raise
+
+    def _scan(self):
+        buffer = self._map
+        self._node_chunks = []  # (first row, ids, xs, ys, name offsets, names start)
+        self._edge_chunks = []  # (first row, sources, targets, label offsets, labels start)
+        node_rows = edge_rows = 0
+        index = {}
+        position = self._file.tell()
+        while True:
+            if position + _CHUNK.size > len(buffer):
+                raise ValueError("Graph file is truncated")
+            tag, count, length = _CHUNK.unpack_from(buffer, position)
+            payload = position + _CHUNK.size
+            if payload + length > len(buffer):
+                raise ValueError("Graph file is truncated")
+            if tag == END_TAG:
+                break
+            if tag == NODE_TAG:
+                self._node_chunks.append((
+                    node_rows,
+                    np.frombuffer(buffer, "<i8", count, payload),
+                    np.frombuffer(buffer, "<f8", count, payload + 8 * count),
+                    np.frombuffer(buffer, "<f8", count, payload + 16 * count),
+                    np.frombuffer(buffer, "<u4", count + 1, payload + 24 * count),
+                    payload + 24 * count + 4 * (count + 1),
+                ))
+                node_rows += count
+            elif tag == EDGE_TAG:
+                self._edge_chunks.append((
+                    edge_rows,
+                    np.frombuffer(buffer, "<i8", count, payload),
+                    np.frombuffer(buffer, "<i8", count, payload + 8 * count),
+                    np.frombuffer(buffer, "<u4", count + 1, payload + 16 * count),
+                    payload + 16 * count + 4 * (count + 1),
+                ))
+                edge_rows += count
+            elif tag in (TILE_TAG, ID_INDEX_TAG, ADJACENCY_TAG):
+                index[tag] = (count, payload)
+            position = payload + length
+        if len(index) != 3:
+            raise ValueError(f"{self.path} has no index for lazy loading, save it again to add one")
+        self.node_count = node_rows
+        self.edge_count = edge_rows
+        self._node_starts = [chunk[0] for chunk in self._node_chunks]
+        self._edge_starts = [chunk[0] for chunk in self._edge_chunks]
+
+        tiles, payload = index[TILE_TAG]
+        (self.tile_size,) = struct.unpack_from("<d", buffer, payload)
+        self._tile_keys = np.frombuffer(buffer, "<i8", tiles, payload + 8)
+        self._tile_offsets = np.frombuffer(buffer, "<i8", tiles + 1, payload + 8 + 8 * tiles)
+        self._tile_rows = np.frombuffer(buffer, "<i4", node_rows, payload + 16 + 16 * tiles)
+        _, payload = index[ID_INDEX_TAG]
+        self._sorted_ids = np.frombuffer(buffer, "<i8", node_rows, payload)
+        self._id_rows = np.frombuffer(buffer, "<i4", node_rows, payload + 8 * node_rows)
+        _, payload = index[ADJACENCY_TAG]
+        self._adjacency_offsets = np.frombuffer(buffer, "<i8", node_rows + 1, payload)
+        adjacent = int(self._adjacency_offsets[-1]) if node_rows else 0
+        self._adjacency_rows = np.frombuffer(buffer, "<i4", adjacent, payload + 8 * (node_rows + 1))
+        self.max_id = int(self._sorted_ids[-1]) if node_rows else 0
+
+    def acquire(self):
+        with self._lock:
+            if self._closing:
+                raise ValueError(f"{self.path} is closed")
+            self._readers += 1
+
+    def release(self):
+        with self._lock:
+            self._readers -= 1
+            if not self._closing or self._readers:
+                return
+        self._close_now()
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+            if self._readers:
+                return
+        self._close_now()
+
+    def _close_now(self):
+        # NumPy views pin the mapping, drop them before closing it
+        self._node_chunks = self._edge_chunks = []
+        self._tile_keys = self._tile_offsets = self._tile_rows = None
+        self._sorted_ids = self._id_rows = None
+        self._adjacency_offsets = self._adjacency_rows = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+        self.closed.set()
+
+    def _string(self, offsets, start, local):
+        a = int(offsets[local])
+        b = int(offsets[local + 1])
+        return self._map[start + a:start + b].decode("utf-8")
+
+    def node_row(self, row):
+        """(id, x, y, name) of a node row."""
+        chunk = self._node_chunks[bisect_right(self._node_starts, row) - 1]
+        first, ids, xs, ys, name_offsets, names_start = chunk
+        local = row - first
+        return int(ids[local]), float(xs[local]), float(ys[local]), self._string(name_offsets, names_start, local)
+
+    def edge_row(self, row):
+        """(source id, target id, label) of an edge row."""
+        chunk = self._edge_chunks[bisect_right(self._edge_starts, row) - 1]
+        first, sources, targets, label_offsets, labels_start = chunk
+        local = row - first
+        return int(sources[local]), int(targets[local]), self._string(label_offsets, labels_start, local)
+
+    def iter_node_chunks(self):
+        """(first row, ids, xs, ys, names) per node chunk, names decoded on the fly."""
+        for first, ids, xs, ys, name_offsets, names_start in self._node_chunks:
+            bounds = name_offsets.tolist()
+            blob = self._map[names_start:names_start + bounds[-1]]
+            yield first, ids, xs, ys, [blob[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+    def iter_edge_chunks(self):
+        for first, sources, targets, label_offsets, labels_start in self._edge_chunks:
+            bounds = label_offsets.tolist()
+            blob = self._map[labels_start:labels_start + bounds[-1]]
+            yield first, sources, targets, [blob[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+    def row_of_id(self, node_id):
+        """Node row with this id, or None."""
+        position = int(np.searchsorted(self._sorted_ids, node_id))
+        if position < self.node_count and self._sorted_ids[position] == node_id:
+            return int(self._id_rows[position])
+        return None
+
+    def tile_of(self, x, y):
+        return (int(x // self.tile_size), int(y // self.tile_size))
+
+    def tile_rows(self, tile):
+        """Node rows starting in tile (tx, ty)."""
+        key = tile_keys(*tile)
+        position = int(np.searchsorted(self._tile_keys, key))
+        if position == len(self._tile_keys) or self._tile_keys[position] != key:
+            return ()
+        return self._tile_rows[self._tile_offsets[position]:self._tile_offsets[position + 1]].tolist()
+
+    def edge_rows_of(self, row):
+        """Edge rows starting or ending at a node row."""
+        return self._adjacency_rows[self._adjacency_offsets[row]:self._adjacency_offsets[row + 1]].tolist()
+
+
+class LazyGraphLoader:
+    """
+    Keeps the editor's scene filled with the part of a MappedGraph around
+    the viewport.
+
+    Tiles within one screen of the viewport are materialized as ordinary
+    Node and Connection objects through the editor's scene primitives, so
+    hit-testing, drawing and editing work unchanged. Tiles more than two
+    screens away are evicted again, except for nodes that were edited,
+    selected or connected to something new; those stay for good. Nodes
+    that commands on the undo or redo stack work on stay as long as the
+    commands do, so undo and redo always find them in the scene. At most
+    max_nodes nodes are materialized, nearest tiles first. Connections
+    only appear once both of their nodes are materialized.
+
+    Nodes and connections that disappear from the scene without being
+    evicted were deleted by the user; they are remembered so they are
+    neither loaded again nor saved.
+    """
+    def __init__(self, editor, mapped, max_nodes=LAZY_LOAD_MAX_NODES):
+        self.editor = editor
+        self.mapped = mapped
+        self.max_nodes = max_nodes
+        self.nodes = {}  # node row -> materialized Node
+        self.rows = {}  # Node -> node row
+        self.connections = {}  # edge row -> materialized Connection
+        self.edges = {}  # Connection -> edge row
+        self.tiles = set()  # loaded tiles
+        self.deleted_rows = set()
+        self.deleted_edges = set()
+        self.pinned_rows = set()
+        self._last_view = None
+
+    def close(self):
+        self.mapped.close()
+
+    def update(self, force=False):
+        """Load and evict tiles for the current view; cheap when the view did not change."""
+        view = self.editor.renderer.visible_world_rect()
+        if view == self._last_view and not force:
+            return
+        self._last_view = view
+        self._collect_deletions()
+        x0, y0, x1, y1 = view
+        width = x1 - x0
+        height = y1 - y0
+        journal = self.editor.journal
+        # Loading and evicting are not edits, the journal's checkpoints hold the file rows
+        with journal.suspended() if journal is not None else nullcontext():
+            self._evict_outside((x0 - 2 * width, y0 - 2 * height, x1 + 2 * width, y1 + 2 * height))
+            self._load_inside((x0 - width, y0 - height, x1 + width, y1 + height), ((x0 + x1) / 2, (y0 + y1) / 2))
+
+    def _tiles_in(self, rect):
+        tx0, ty0 = self.mapped.tile_of(rect[0], rect[1])
+        tx1, ty1 = self.mapped.tile_of(rect[2], rect[3])
+        return [(tx, ty) for tx in range(tx0, tx1 + 1) for ty in range(ty0, ty1 + 1)]
+
+    def _load_inside(self, rect, center):
+        tile_size = self.mapped.tile_size
+        wanted = [tile for tile in self._tiles_in(rect) if tile not in self.tiles]
+        # Nearest tiles first, so the budget is spent on what is on screen
+        wanted.sort(key=lambda t: ((t[0] + 0.5) * tile_size - center[0]) ** 2
+                    + ((t[1] + 0.5) * tile_size - center[1]) ** 2)
+        for tile in wanted:
+            rows = self.mapped.tile_rows(tile)
+            if len(self.nodes) + len(rows) > self.max_nodes:
+                break
+            self.tiles.add(tile)
+            for row in rows:
+                if row not in self.nodes and row not in self.deleted_rows:
+                    self._materialize(row)
+
+    def _materialize(self, row):
+        editor = self.editor
+        node_id, x, y, name = self.mapped.node_row(row)
+        node = Node(x, y, node_id)
+        node.node_name = name
+        self.nodes[row] = node
+        self.rows[node] = row
+        editor._insert_node(node)
+        for edge in self.mapped.edge_rows_of(row):
+            if edge in self.connections or edge in self.deleted_edges:
+                continue
+            source_id, target_id, label = self.mapped.edge_row(edge)
+            start = self.nodes.get(self.mapped.row_of_id(source_id))
+            end = self.nodes.get(self.mapped.row_of_id(target_id))
+            if start is not None and end is not None:
+                conn = Connection(start, end, label=label)
+                self.connections[edge] = conn
+                self.edges[conn] = edge
+                editor._insert_connection(conn)
+
+    def _evict_outside(self, rect):
+        leaving = [tile for tile in self.tiles if not self._tile_overlaps(tile, rect)]
+        if not leaving:
+            return
+        in_history = self.editor.undo_stack.referenced_nodes()
+        for tile in leaving:
+            self.tiles.discard(tile)
+            for row in self.mapped.tile_rows(tile):
+                node = self.nodes.get(row)
+                if node is not None and node not in in_history and not self._must_keep(row, node):
+                    self._evict(row, node)
+
+    def _tile_overlaps(self, tile, rect):
+        size = self.mapped.tile_size
+        return (tile[0] * size <= rect[2] and (tile[0] + 1) * size >= rect[0]
+                and tile[1] * size <= rect[3] and (tile[1] + 1) * size >= rect[1])
+
+    def _must_keep(self, row, node):
+        if row in self.pinned_rows:
+            return True
+        _, x, y, name = self.mapped.node_row(row)
+        edited = (node.selected or node.dragging or (node.x, node.y) != (x, y) or node.node_name != name
+                  or any(conn not in self.edges for conn in self.editor.spatial_index.connections_of(node)))
+        if edited:
+            self.pinned_rows.add(row)
+        return edited
+
+    def _evict(self, row, node):
+        for conn in self.editor.spatial_index.connections_of(node):
+            edge = self.edges.pop(conn, None)
+            if edge is not None:
+                del self.connections[edge]
+        del self.nodes[row]
+        del self.rows[node]
+        self.editor._discard_node(node)
+
+    def _collect_deletions(self):
+        editor = self.editor
+        for row, node in list(self.nodes.items()):
+            if node not in editor.nodes:
+                self.deleted_rows.add(row)
+                self.pinned_rows.discard(row)
+                del self.nodes[row]
+                del self.rows[node]
+        for edge, conn in list(self.connections.items()):
+            if conn not in editor.connections:
+                self.deleted_edges.add(edge)
+                del self.connections[edge]
+                del self.edges[conn]
+
+    def snapshot(self):
+        """
+        What the merged graph needs from the scene, taken on the main thread:
+        overrides for materialized rows, deleted rows and edges, and the nodes
+        and connections that are not from the file.
+        """
+        self._collect_deletions()
+        node_overrides = {row: (node.id, node.node_name, (node.x, node.y)) for row, node in self.nodes.items()}
+        edge_overrides = {edge: conn.label for edge, conn in self.connections.items()}
+        extra_nodes = [(node.id, node.node_name, (node.x, node.y)) for node in self.editor.nodes
+                       if node not in self.rows]
+        extra_edges = [(conn.start_node.id, conn.end_node.id, conn.label) for conn in self.editor.connections
+                       if conn not in self.edges]
+        return (node_overrides, edge_overrides, set(self.deleted_rows), set(self.deleted_edges),
+                extra_nodes, extra_edges)
+
+    def merged_tables(self, snapshot):
+        """
+        Node and edge tables (see graph_format.snapshot_tables) of the file
+        with the edits of a snapshot applied. Reads the whole mapped file, but
+        nothing of the editor, so it can run on a worker thread.
+        """
+        node_overrides, edge_overrides, deleted_rows, deleted_edges, extra_nodes, extra_edges = snapshot
+        nodes = []
+        deleted_ids = set()
+        for first, ids, xs, ys, names in self.mapped.iter_node_chunks():
+            for local, (node_id, x, y, name) in enumerate(zip(ids.tolist(), xs.tolist(), ys.tolist(), names)):
+                row = first + local
+                if row in deleted_rows:
+                    deleted_ids.add(node_id)
+                elif row in node_overrides:
+                    nodes.append(node_overrides[row])
+                else:
+                    nodes.append((node_id, name, (x, y)))
+        nodes.extend(extra_nodes)
+        # A deleted id may have come back through undo, then it is one of the extra nodes
+        deleted_ids.difference_update(node_id for node_id, _, _ in extra_nodes)
+        edges = []
+        for first, sources, targets, labels in self.mapped.iter_edge_chunks():
+            for local, (u, v, label) in enumerate(zip(sources.tolist(), targets.tolist(), labels)):
+                row = first + local
+                if row in deleted_edges or u in deleted_ids or v in deleted_ids:
+                    continue
+                edges.append((u, v, edge_overrides.get(row, label)))
+        edges.extend(extra_edges)
+        return nodes, edges
@@ -1,24 +1,37 @@
+import argparse
 import logging
 import pygame
 from editor import NodeEditor
+from journal import EditJournal
+from replay import EventRecorder
 from toolbar import Toolbar
 from button import Button
 from actions import (AddNodeAction,
                      DeleteAllAction,
                      DumpGraphAction,
                      UndoAction,
+                     RedoAction,
                      SaveGraphAction,
                      LoadGraphAction)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Node Graph Editor")
+    parser.add_argument("--record", metavar="PATH", help="record the input events for replay.py")
+    args = parser.parse_args()
     pygame.init()
     logging.basicConfig(level=logging.INFO)
     toolbar = Toolbar()
     toolbar.add_button(Button(action=AddNodeAction(), label="Add Node"))
     toolbar.add_button(Button(action=DeleteAllAction(), label="Clear All"))
     toolbar.add_button(Button(action=UndoAction(), label="Undo"))
+    toolbar.add_button(Button(action=RedoAction(), label="Redo"))
     toolbar.add_button(Button(action=DumpGraphAction(), label="Print Graph Model"))
     toolbar.add_button(Button(action=SaveGraphAction(), label="Save"))
     toolbar.add_button(Button(action=LoadGraphAction(), label="Load"))
     editor = NodeEditor(toolbar)
+    journal = EditJournal()
+    if journal.start(editor):
+        print(f"Recovered {len(editor.nodes)} nodes from {journal.directory}")
+    if args.record:
+        editor.recorder = EventRecorder(args.record, editor)
     editor.run()
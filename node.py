@@ -2,20 +2,133 @@ import pygame
 from constants import (NODE_WIDTH, NODE_HEIGHT,
                          GRAY, INPUT_CONNECTOR_COLOR, YELLOW,
                          RED, WHITE, CONNECTION_RADIUS)
+from font_cache import get_font, label_cache
+from node_surface_cache import node_surface_cache, quantize_zoom
+from node_store import DRAGGING, HIGHLIGHTED, SELECTED, node_store
 
 class Node:
+    """
+    A node of the graph, as a view of one row of a NodeStore (node_store.py).
+
+    Position, size, name and flags live in the store's columns; the view
+    only holds the store, its row and the reference to its rendered body.
+    """
+    __slots__ = ("_store", "_row", "_cache_surface", "_cache_params")
+
     def __init__(self, x, y, id):
-        self.x = x
-        self.y = y
-        self.id = id
-        self.node_name: str = self._id_to_name(self.id)
-        self.width = NODE_WIDTH
-        self.height = NODE_HEIGHT
-        self.dragging = False
-        self.drag_offset = (0, 0)
-        self.selected: bool = False
-        self._cache_surface = None
-        self._cache_params = None  # (width, height, selected, zoom, id)
+        self._store = node_store
+        # No name stored means the default one derived from the id
+        self._row = self._store.allocate(id, x, y, NODE_WIDTH, NODE_HEIGHT, None)
+        self._cache_surface = None  # Shared surface from node_surface_cache
+        self._cache_params = None  # Its key: (zoom bucket, width, height, highlighted, name)
+
+    @classmethod
+    def create_many(cls, ids, xs, ys, names):
+        """
+        Nodes for the parallel sequences ids, xs, ys and names (None for the
+        default name), allocated with one store extend. Main thread only.
+        """
+        nodes = []
+        for row in node_store.extend(ids, xs, ys, NODE_WIDTH, NODE_HEIGHT, names):
+            node = cls.__new__(cls)
+            node._store = node_store
+            node._row = row
+            node._cache_surface = None
+            node._cache_params = None
+            nodes.append(node)
+        return nodes
+
+    def __del__(self):
+        row = getattr(self, "_row", None)
+        if row is not None:
+            self._store.release(row)
+
+    @property
+    def id(self):
+        return self._store.ids[self._row]
+
+    @id.setter
+    def id(self, value):
+        self._store.ids[self._row] = value
+
+    @property
+    def x(self):
+        return self._store.xs[self._row]
+
+    @x.setter
+    def x(self, value):
+        self._store.xs[self._row] = value
+        self._store.position_revision += 1
+
+    @property
+    def y(self):
+        return self._store.ys[self._row]
+
+    @y.setter
+    def y(self, value):
+        self._store.ys[self._row] = value
+        self._store.position_revision += 1
+
+    @property
+    def width(self):
+        return self._store.widths[self._row]
+
+    @width.setter
+    def width(self, value):
+        self._store.widths[self._row] = value
+
+    @property
+    def height(self):
+        return self._store.heights[self._row]
+
+    @height.setter
+    def height(self, value):
+        self._store.heights[self._row] = value
+
+    @property
+    def node_name(self) -> str:
+        name = self._store.names[self._row]
+        return self._id_to_name(self._store.ids[self._row]) if name is None else name
+
+    @node_name.setter
+    def node_name(self, value):
+        self._store.names[self._row] = value
+
+    @property
+    def drag_offset(self):
+        return (self._store.drag_xs[self._row], self._store.drag_ys[self._row])
+
+    @drag_offset.setter
+    def drag_offset(self, value):
+        self._store.drag_xs[self._row], self._store.drag_ys[self._row] = value
+
+    @property
+    def selected(self) -> bool:
+        return bool(self._store.flags[self._row] & SELECTED)
+
+    @selected.setter
+    def selected(self, value):
+        self._set_flag(SELECTED, value)
+
+    @property
+    def highlighted(self) -> bool:
+        """Drawn as selected: selected, or inside the rubber band."""
+        return bool(self._store.flags[self._row] & HIGHLIGHTED)
+
+    @property
+    def dragging(self) -> bool:
+        return bool(self._store.flags[self._row] & DRAGGING)
+
+    @dragging.setter
+    def dragging(self, value):
+        self._set_flag(DRAGGING, value)
+
+    def _set_flag(self, flag, value):
+        flags = self._store.flags
+        if value:
+            flags[self._row] |= flag
+        else:
+            flags[self._row] &= ~flag & 0xFF
 
     def get_right_center(self):
         return (self.x + self.width, self.y + self.height / 2)
@@ -26,17 +139,38 @@ class Node:
     def get_center(self):
         return (self.x + self.width / 2, self.y + self.height / 2)
 
+    # The methods below run per node per frame; they read the store row once
+    # instead of going through the properties
+
     def get_input_pos(self):
-        return (self.x, self.y + self.height // 2)
+        store = self._store
+        row = self._row
+        return (store.xs[row], store.ys[row] + store.heights[row] // 2)
 
     def get_output_pos(self):
-        return (self.x + self.width, self.y + self.height // 2)
+        store = self._store
+        row = self._row
+        return (store.xs[row] + store.widths[row], store.ys[row] + store.heights[row] // 2)
+
+    def screen_rect(self, offset_x=0.0, offset_y=0.0, zoom=1.0):
+        """Screen rect covering the node body and its connection points."""
+        store = self._store
+        row = self._row
+        x = int((store.xs[row] - offset_x) * zoom)
+        y = int((store.ys[row] - offset_y) * zoom)
+        margin = max(1, int(CONNECTION_RADIUS * zoom * 0.6)) + 1
+        return pygame.Rect(x - margin, y - margin,
+                           int(store.widths[row] * zoom) + 2 * margin, int(store.heights[row] * zoom) + 2 * margin)
 
     def contains_point(self, x, y):
-        return (self.x <= x <= self.x + self.width and
-                self.y <= y <= self.y + self.height)
+        store = self._store
+        row = self._row
+        left = store.xs[row]
+        top = store.ys[row]
+        return left <= x <= left + store.widths[row] and top <= y <= top + store.heights[row]
 
-    def _id_to_name(self, id_num: int) -> str:
+    @staticmethod
+    def _id_to_name(id_num: int) -> str:
     # Convert 1-based id to spreadsheet-style name similar to Excel column names.
         name = ""
         id_num -= 1  # Perform subtraction once before the loop
@@ -65,23 +199,14 @@ class Node:
             max(1, int(2 * zoom)),
             border_radius=border_radius
         )
-        # Draw node id at fixed distance from bottom
-        id_font = pygame.font.Font(None, max(12, int(14 * zoom)))
-        id_text = id_font.render(str(self.id), True, WHITE)
-        id_margin_bottom = int(8 * zoom)
-        id_y = height - id_margin_bottom - id_text.get_height() // 2
-        id_rect = id_text.get_rect(center=(width // 2, id_y))
-        node_surf.blit(id_text, id_rect)
-
+        # The node id is drawn separately by draw(), so the body can be shared
         # Calculate area for node name (from top to just above the id)
         name_area_top = 0
-        name_area_bottom = id_rect.top - int(4 * zoom)
+        name_area_bottom = self._id_rect(width, height, zoom).top - int(4 * zoom)
         name_area_height = name_area_bottom - name_area_top
 
         # Prepare node name lines (up to 3)
-        if self.node_name is None:
-            self.node_name = "--"
-        name_font = pygame.font.Font(None, max(16, int(22 * zoom)))
+        name_font = get_font(max(16, int(22 * zoom)))
         max_text_width = int(width * 0.9)
         name_lines = self._wrap_text(self.node_name, name_font, max_text_width, max_lines=3)
         total_name_height = len(name_lines) * name_font.get_height()
@@ -94,6 +219,19 @@ class Node:
             node_surf.blit(name_text, name_rect)
         return node_surf
 
+    @staticmethod
+    def _id_font_size(zoom):
+        return max(12, int(14 * zoom))
+
+    def _id_rect(self, width, height, zoom):
+        # Node id at fixed distance from bottom
+        id_height = get_font(self._id_font_size(zoom)).get_height()
+        id_margin_bottom = int(8 * zoom)
+        id_y = height - id_margin_bottom - id_height // 2
+        id_rect = pygame.Rect(0, 0, 0, id_height)
+        id_rect.center = (width // 2, id_y)
+        return id_rect
+
     def _wrap_text(self, text, font, max_width, max_lines=2):
         # Try to break text into up to max_lines lines, breaking on spaces if possible
         words = text.split(' ')
@@ -123,14 +261,22 @@ class Node:
     def draw(self, screen, offset_x=0.0, offset_y=0.0, zoom=1.0):
         x = int((self.x - offset_x) * zoom)
         y = int((self.y - offset_y) * zoom)
-        width = int(self.width * zoom)
-        height = int(self.height * zoom)
-        border_radius = int(16 * zoom)
-        cache_params = (width, height, self.selected, zoom, self.id)
+        # Render at a quantized zoom so every wheel step does not re-render all nodes
+        body_zoom = quantize_zoom(zoom)
+        width = int(self.width * body_zoom)
+        height = int(self.height * body_zoom)
+        highlighted = self.highlighted
+        cache_params = (body_zoom, width, height, highlighted, self.node_name)
         if self._cache_surface is None or self._cache_params != cache_params:
-            self._cache_surface = self._render_surface(width, height, border_radius, self.selected, zoom)
+            border_radius = int(16 * body_zoom)
+            self._cache_surface = node_surface_cache.get(
+                cache_params,
+                lambda: self._render_surface(width, height, border_radius, highlighted, body_zoom))
             self._cache_params = cache_params
         screen.blit(self._cache_surface, (x, y))
+        id_text = label_cache.get(str(self.id), self._id_font_size(body_zoom), WHITE)
+        id_rect = self._id_rect(width, height, body_zoom)
+        screen.blit(id_text, id_text.get_rect(center=(x + id_rect.centerx, y + id_rect.centery)))
 
         # Draw connection points (die ändern sich je nach Zoom/Position, daher nicht cachen)
         input_pos = self.get_input_pos()
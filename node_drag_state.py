@@ -0,0 +1,43 @@
+import numpy as np
+from node_store import DRAGGING, node_store
+
+
+class NodeDragState:
+    """
+    Nodes moved together by a left-button drag.
+
+    begin() remembers the store rows and start positions of the nodes;
+    move() writes the new positions of all of them with one vectorized
+    store update. The spatial index, the journal and the undo stack are
+    only told when the drag ends, see NodeEditor._finish_node_drag.
+    """
+    def __init__(self):
+        self.nodes = []
+        self._rows = None
+        self._start_xs = None
+        self._start_ys = None
+        self._grab = (0.0, 0.0)
+
+    def begin(self, nodes, grab_pos):
+        self.nodes = list(nodes)
+        self._rows = node_store.rows_of(self.nodes)
+        self._start_xs, self._start_ys = node_store.gather(self._rows, "xs", "ys")
+        self._grab = grab_pos
+        flags, = node_store.gather(self._rows, "flags")
+        node_store.scatter(self._rows, flags=flags | DRAGGING)
+
+    def move(self, world_x, world_y):
+        node_store.scatter(self._rows, xs=self._start_xs + (world_x - self._grab[0]),
+                           ys=self._start_ys + (world_y - self._grab[1]))
+
+    def end(self):
+        """Stop dragging; returns the nodes and their start xs and ys."""
+        flags, = node_store.gather(self._rows, "flags")
+        node_store.scatter(self._rows, flags=flags & ~np.uint8(DRAGGING))
+        result = (self.nodes, self._start_xs, self._start_ys)
+        self.nodes = []
+        self._rows = self._start_xs = self._start_ys = None
+        return result
+
+    def is_active(self):
+        return bool(self.nodes)
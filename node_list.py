@@ -0,0 +1,102 @@
+class NodeList:
+    """
+    Nodes in drawing order, the last one is on top.
+
+    Every node gets an increasing z key so the topmost of a few candidates
+    can be picked without scanning the list. If a spatial index is given it
+    is kept in sync with the nodes added and removed. revision changes
+    whenever a node is added or removed.
+    """
+    def __init__(self, spatial_index=None):
+        self._nodes = []
+        self._z = {}  # node -> z key, increasing from bottom to top
+        self._next_z = 0.0
+        self.spatial_index = spatial_index
+        self.revision = 0
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __reversed__(self):
+        return reversed(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __getitem__(self, index):
+        return self._nodes[index]
+
+    def __contains__(self, node):
+        return node in self._z
+
+    def append(self, node):
+        self._nodes.append(node)
+        self._z[node] = self._next_z
+        self._next_z += 1
+        self.revision += 1
+        if self.spatial_index is not None:
+            self.spatial_index.insert_node(node)
+
+    def extend(self, nodes):
+        for node in nodes:
+            self.append(node)
+
+    def insert(self, index, node):
+        if index >= len(self._nodes):
+            self.append(node)
+            return
+        index = max(0, index)
+        upper = self._z[self._nodes[index]]
+        lower = self._z[self._nodes[index - 1]] if index > 0 else upper - 1
+        z = (lower + upper) / 2
+        self._nodes.insert(index, node)
+        self._z[node] = z
+        self.revision += 1
+        if not lower < z < upper:
+            self._renumber()
+        if self.spatial_index is not None:
+            self.spatial_index.insert_node(node)
+
+    def remove(self, node):
+        self._nodes.remove(node)
+        del self._z[node]
+        self.revision += 1
+        if self.spatial_index is not None:
+            self.spatial_index.remove_node(node)
+
+    def index(self, node):
+        return self._nodes.index(node)
+
+    def clear(self):
+        self._nodes.clear()
+        self._z.clear()
+        self._next_z = 0.0
+        self.revision += 1
+        if self.spatial_index is not None:
+            self.spatial_index.clear_nodes()
+
+    def all(self):
+        return self._nodes
+
+    def bring_to_front(self, node):
+        """Move a node to the top of the drawing order."""
+        self._nodes.remove(node)
+        self._nodes.append(node)
+        self._z[node] = self._next_z
+        self._next_z += 1
+
+    def z_key(self, node):
+        return self._z[node]
+
+    def topmost(self, candidates):
+        """Return the candidate drawn last, or None."""
+        return max(candidates, key=self._z.__getitem__, default=None)
+
+    def in_drawing_order(self, candidates):
+        return sorted(candidates, key=self._z.__getitem__)
+
+    def _renumber(self):
+        # Float keys ran out of room between two neighbours
+        for z, node in enumerate(self._nodes):
+            self._z[node] = float(z)
+        self._next_z = float(len(self._nodes))
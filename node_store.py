@@ -0,0 +1,106 @@
+from array import array
+import numpy as np
+
+# Bits of NodeStore.flags
+SELECTED = 1
+DRAGGING = 2
+PREVIEW = 4  # Inside the rubber band, drawn like SELECTED
+HIGHLIGHTED = SELECTED | PREVIEW
+
+
+class NodeStore:
+    """
+    Columnar storage behind Node views.
+
+    Every node owns one row: id, position, size, drag offset and flags in
+    typed arrays, its name in a string table. A Node is only a view holding
+    the store and its row, so a node costs a fraction of an object with a
+    __dict__. Rows of nodes that were garbage collected are reused.
+
+    gather() copies columns for a set of rows into NumPy arrays for
+    vectorized transforms and scatter() writes them back. Neither keeps a
+    view of the columns, since an array cannot grow while a view of it
+    exists. For the same reason rows are only allocated on the main thread,
+    the one that gathers and scatters; work on other threads hands plain
+    columns back and the main thread extend()s the store with them.
+    """
+    def __init__(self):
+        self.ids = array("q")
+        self.xs = array("d")
+        self.ys = array("d")
+        self.widths = array("d")
+        self.heights = array("d")
+        self.drag_xs = array("d")
+        self.drag_ys = array("d")
+        self.flags = array("B")
+        self.names = []  # Row -> name, None for the default name derived from the id
+        self._free = []  # Released rows
+        self.position_revision = 0  # Bumped on every write to xs or ys, for caches of node positions
+
+    def __len__(self):
+        return len(self.ids) - len(self._free)
+
+    def allocate(self, node_id, x, y, width, height, name):
+        if self._free:
+            row = self._free.pop()
+            self.ids[row] = node_id
+            self.xs[row] = x
+            self.ys[row] = y
+            self.widths[row] = width
+            self.heights[row] = height
+            self.drag_xs[row] = 0.0
+            self.drag_ys[row] = 0.0
+            self.flags[row] = 0
+            self.names[row] = name
+            return row
+        self.ids.append(node_id)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.widths.append(width)
+        self.heights.append(height)
+        self.drag_xs.append(0.0)
+        self.drag_ys.append(0.0)
+        self.flags.append(0)
+        self.names.append(name)
+        return len(self.ids) - 1
+
+    def extend(self, ids, xs, ys, width, height, names):
+        """Append one row per entry of the parallel sequences ids, xs, ys and names; returns the new rows."""
+        start = len(self.ids)
+        count = len(ids)
+        self.ids.extend(ids)
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.widths.extend(array("d", [width]) * count)
+        self.heights.extend(array("d", [height]) * count)
+        self.drag_xs.extend(array("d", [0.0]) * count)
+        self.drag_ys.extend(array("d", [0.0]) * count)
+        self.flags.extend(array("B", bytes(count)))
+        self.names.extend(names)
+        return range(start, start + count)
+
+    def release(self, row):
+        self.names[row] = None
+        self._free.append(row)
+
+    @staticmethod
+    def rows_of(nodes):
+        return np.fromiter((node._row for node in nodes), dtype=np.intp, count=len(nodes))
+
+    def gather(self, rows, *columns):
+        """Copies of the named columns (e.g. "xs", "flags") at rows, as NumPy arrays."""
+        return tuple(np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)[rows]
+                     for name in columns)
+
+    def scatter(self, rows, **columns):
+        """Write values (arrays or scalars) into the named columns at rows, e.g. scatter(rows, xs=new_xs)."""
+        for name, values in columns.items():
+            column = getattr(self, name)
+            # The view is dropped right away, so the column can grow again
+            np.frombuffer(column, dtype=column.typecode)[rows] = values
+        if "xs" in columns or "ys" in columns:
+            self.position_revision += 1
+
+
+# The store of all nodes
+node_store = NodeStore()
@@ -0,0 +1,56 @@
+import math
+from collections import OrderedDict
+from constants import NODE_SURFACE_CACHE_BUDGET, NODE_ZOOM_BUCKET_STEP
+
+_LOG_STEP = math.log1p(NODE_ZOOM_BUCKET_STEP)
+
+
+def quantize_zoom(zoom):
+    """Snap zoom to a geometric bucket so nearby zoom levels share surfaces."""
+    return round(math.exp(round(math.log(zoom) / _LOG_STEP) * _LOG_STEP), 6)
+
+
+class NodeSurfaceCache:
+    """
+    Rendered node bodies shared between nodes that look the same.
+
+    Keys describe the appearance (zoom bucket, size, selection, name), so
+    nodes with identical appearance reuse one surface and zooming back to
+    a previous level hits the cache. Least recently used surfaces are
+    dropped once the pixel memory exceeds the budget.
+    """
+    def __init__(self, budget_bytes=NODE_SURFACE_CACHE_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._surfaces = OrderedDict()  # key -> (surface, size in bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        """Return the surface for key, calling render() to create it on a miss."""
+        entry = self._surfaces.get(key)
+        if entry is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        surface = render()
+        size = surface.get_width() * surface.get_height() * surface.get_bytesize()
+        self._surfaces[key] = (surface, size)
+        self.used_bytes += size
+        # Evict, but always keep the surface just rendered
+        while self.used_bytes > self.budget_bytes and len(self._surfaces) > 1:
+            _, (_, evicted_size) = self._surfaces.popitem(last=False)
+            self.used_bytes -= evicted_size
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self.used_bytes = 0
+
+    def __len__(self):
+        return len(self._surfaces)
+
+
+# Shared by every node
+node_surface_cache = NodeSurfaceCache()
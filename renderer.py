@@ -1,60 +1,355 @@
 import pygame
 import math
+import numpy as np
+from collections import OrderedDict
 from constants import (BLUEPRINT_COLOR, BLUEPRINT_LINE_COLOR, TOOLBAR_WIDTH,
-                        BLUEPRINT_GRID_SIZE)
+                        BLUEPRINT_GRID_SIZE, BORDER_GRAY, CONNECTION_RADIUS, CULL_MARGIN,
+                        DARK_GRAY, GRAY, GREEN, LIGHT_GRAY, OFFSCREEN_BUCKET_SIZE, WHITE)
+from font_cache import label_cache
+from node_store import HIGHLIGHTED, node_store
+from settings import LOD_SIMPLE_ZOOM, LOD_MINIMAL_ZOOM
+
+PROGRESS_WIDTH = 260
+PROGRESS_HEIGHT = 32
+
+# Levels of detail, from most to least detailed
+LOD_FULL = 0
+LOD_SIMPLE = 1
+LOD_MINIMAL = 2
+
+
+def segment_intersects_rect(x1, y1, x2, y2, rect):
+    """Liang-Barsky test whether the segment (x1, y1)-(x2, y2) crosses rect = (x0, y0, x1, y1)."""
+    rx0, ry0, rx1, ry1 = rect
+    dx = x2 - x1
+    dy = y2 - y1
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x1 - rx0), (dx, rx1 - x1), (-dy, y1 - ry0), (dy, ry1 - y1)):
+        if p == 0:
+            if q < 0:
+                return False  # Parallel to this edge and outside
+            continue
+        t = q / p
+        if p < 0:
+            if t > t1:
+                return False
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return False
+            t1 = min(t1, t)
+    return True
+
+
+def draw_connection_batch(screen, connections, offset_x, offset_y, zoom, thickness):
+    """
+    Draw connections as plain lines without labels, marked ones last so they stay on top.
+
+    The end points of all connections are gathered into one array and
+    transformed to screen space in a single step, giving the same pixels
+    as Connection.draw for unlabeled connections.
+    """
+    if not connections:
+        return
+    # End points straight from the node store columns, see Node.get_output_pos/get_input_pos
+    starts = node_store.rows_of([conn.start_node for conn in connections])
+    ends = node_store.rows_of([conn.end_node for conn in connections])
+    start_x, start_y, start_w, start_h = node_store.gather(starts, "xs", "ys", "widths", "heights")
+    end_x, end_y, end_h = node_store.gather(ends, "xs", "ys", "heights")
+    world = np.column_stack((start_x + start_w, start_y + start_h // 2, end_x, end_y + end_h // 2))
+    # Truncate towards zero like the int() calls in Connection.draw
+    points = ((world - (offset_x, offset_y, offset_x, offset_y)) * zoom).astype(np.int64)
+    marked = np.fromiter((conn.marked for conn in connections), dtype=bool, count=len(connections))
+    draw_line = pygame.draw.line
+    for color, segments in ((WHITE, points[~marked]), (GREEN, points[marked])):
+        for x1, y1, x2, y2 in segments.tolist():
+            draw_line(screen, color, (x1, y1), (x2, y2), thickness)
+
 
 class GridRenderer:
+    """
+    Draws the blueprint background.
+
+    The grid is pre-rendered once per zoom level and window size into a
+    surface one grid cell larger than the screen, then blitted with the
+    panning offset wrapped to a single cell. A frame costs one fill and one
+    blit instead of one draw call per grid line.
+    """
+    def __init__(self, max_cached_surfaces=4):
+        self.max_cached_surfaces = max_cached_surfaces
+        self._surfaces = OrderedDict()  # (zoom bucket, width, height) -> grid surface
+
     def draw(self, screen, panning_state, zoom):
-        # Background
-        screen.fill(BLUEPRINT_COLOR)
+        screen_w = screen.get_width()
+        screen_h = screen.get_height()
+        # Background left of the grid area
+        screen.fill(BLUEPRINT_COLOR, (0, 0, TOOLBAR_WIDTH, screen_h))
 
         # Grid with zoom
         grid_size = BLUEPRINT_GRID_SIZE * zoom
-        screen_w = screen.get_width()
-        screen_h = screen.get_height()
         x_start = TOOLBAR_WIDTH - (panning_state.offset_x % BLUEPRINT_GRID_SIZE) * zoom
         y_start = - (panning_state.offset_y % BLUEPRINT_GRID_SIZE) * zoom
+        # Move the pattern origin back to at most one cell before the screen origin
+        origin_x = math.floor(x_start - math.ceil(x_start / grid_size) * grid_size)
+        origin_y = math.floor(y_start)
+        surface = self._grid_surface(screen, zoom, screen_w, screen_h)
+        area = pygame.Rect(TOOLBAR_WIDTH - origin_x, -origin_y, screen_w - TOOLBAR_WIDTH, screen_h)
+        screen.blit(surface, (TOOLBAR_WIDTH, 0), area)
 
-        x = x_start
-        while x < screen_w:
-            pygame.draw.line(screen, BLUEPRINT_LINE_COLOR, (x, 0), (x, screen_h))
+    def _grid_surface(self, screen, zoom, screen_w, screen_h):
+        key = (round(zoom, 4), screen_w, screen_h)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+        grid_size = BLUEPRINT_GRID_SIZE * zoom
+        margin = math.ceil(grid_size) + 1
+        width = screen_w + margin
+        height = screen_h + margin
+        # Same pixel format as the screen so blits need no conversion
+        surface = pygame.Surface((width, height), 0, screen)
+        surface.fill(BLUEPRINT_COLOR)
+        x = 0.0
+        while x < width:
+            pygame.draw.line(surface, BLUEPRINT_LINE_COLOR, (x, 0), (x, height))
             x += grid_size
-        y = y_start
-        while y < screen_h:
-            pygame.draw.line(screen, BLUEPRINT_LINE_COLOR, (TOOLBAR_WIDTH, y), (screen_w, y))
+        y = 0.0
+        while y < height:
+            pygame.draw.line(surface, BLUEPRINT_LINE_COLOR, (0, y), (width, y))
             y += grid_size
+        self._surfaces[key] = surface
+        while len(self._surfaces) > self.max_cached_surfaces:
+            self._surfaces.popitem(last=False)
+        return surface
+
+
+class OffscreenIndicators:
+    """
+    Markers on the window border pointing at nodes outside the viewport.
+
+    All offscreen nodes are projected from the viewport centre onto its
+    border in one vectorized pass and counted per stretch of bucket_size
+    pixels of each edge. A frame draws one marker, with the count, per
+    occupied stretch however many nodes are offscreen. The markers are
+    kept until the viewport, the nodes or a node position change.
+    """
+    MARKER_SIZE = 16
+    FONT_SIZE = 14
+
+    def __init__(self, bucket_size=OFFSCREEN_BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        self.markers = []  # (screen rect, node count)
+        self._key = None
+        self._rows_key = None
+        self._rows = None
+
+    def draw(self, screen, nodes, offset_x, offset_y, zoom, left):
+        key = (nodes, nodes.revision, node_store.position_revision, offset_x, offset_y, zoom, left,
+               screen.get_size())
+        if key != self._key:
+            self.markers = self._build(nodes, offset_x, offset_y, zoom, left, *screen.get_size())
+            self._key = key
+        for rect, count in self.markers:
+            pygame.draw.rect(screen, BORDER_GRAY, rect, width=1, border_radius=3)
+            if count > 1:
+                text = label_cache.get(str(count), self.FONT_SIZE, BORDER_GRAY)
+                screen.blit(text, text.get_rect(center=rect.center))
+
+    def _build(self, nodes, offset_x, offset_y, zoom, left, screen_w, screen_h):
+        if (nodes, nodes.revision) != self._rows_key:
+            self._rows = node_store.rows_of(nodes)
+            self._rows_key = (nodes, nodes.revision)
+        xs, ys = node_store.gather(self._rows, "xs", "ys")
+        xs = (xs - offset_x) * zoom
+        ys = (ys - offset_y) * zoom
+        offscreen = ~((left < xs) & (xs < screen_w) & (0 < ys) & (ys < screen_h))
+        center_x = left + (screen_w - left) // 2
+        center_y = screen_h // 2
+        dx = xs[offscreen] - center_x
+        dy = ys[offscreen] - center_y
+        # Nodes beyond the viewport diagonals point at the left or right edge
+        sideways = np.abs(dx) > np.abs(dy * ((screen_w - left) / screen_h))
+        vertical_edge_x = np.where(dx > 0, screen_w, left)
+        horizontal_edge_y = np.where(dy > 0, screen_h, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Position along the edge where the line from the centre crosses it
+            along = np.where(sideways, center_y + (vertical_edge_x - center_x) * (dy / dx),
+                             center_x + (horizontal_edge_y - center_y) * (dx / dy))
+        along = np.where(sideways, np.clip(along, 0, screen_h), np.clip(along, left, screen_w))
+        # Edges 0-3: left, right, top, bottom
+        edges = np.where(sideways, dx > 0, 2 + (dy > 0)).astype(np.int64)
+        buckets, counts = np.unique((along // self.bucket_size).astype(np.int64) * 4 + edges, return_counts=True)
+        viewport = pygame.Rect(left, 0, screen_w - left, screen_h)
+        markers = []
+        for bucket, count in zip(buckets.tolist(), counts.tolist()):
+            slot, edge = divmod(bucket, 4)
+            middle = (slot + 0.5) * self.bucket_size
+            center = ((left, middle), (screen_w, middle), (middle, 0), (middle, screen_h))[edge]
+            width = self.MARKER_SIZE
+            if count > 1:
+                width = max(width, label_cache.get(str(count), self.FONT_SIZE, BORDER_GRAY).get_width() + 6)
+            rect = pygame.Rect(0, 0, width, self.MARKER_SIZE)
+            rect.center = (int(center[0]), int(center[1]))
+            markers.append((rect.clamp(viewport), count))
+        return markers
+
 
 class NodeEditorRenderer:
     def __init__(self, editor):
         self.editor = editor
         self.grid_renderer = GridRenderer()
+        self.offscreen_indicators = OffscreenIndicators()
+        self.clip = None  # Screen rect being repainted, None for the whole screen
+        self.lod_simple_zoom = LOD_SIMPLE_ZOOM
+        self.lod_minimal_zoom = LOD_MINIMAL_ZOOM
+        # Per-frame culling counters
+        self.drawn_nodes = 0
+        self.culled_nodes = 0
+        self.drawn_connections = 0
+        self.culled_connections = 0
+
+    def draw(self, events, clips=None):
+        """
+        Draw a frame and present it.
 
-    def draw(self, events):
+        With a list of clip rects only those screen regions are repainted,
+        each in its own pass, and pushed to the display; everything else
+        keeps the pixels of the previous frame.
+        """
+        profiler = self.editor.profiler
+        profiler.skip()  # Damage bookkeeping before the frame is not a drawing phase
+        for clip in clips or (None,):
+            self._paint(events, clip)
+        if self.editor.headless:
+            return
+        if clips is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(clips)
+        profiler.mark("flip")
+
+    def _paint(self, events, clip):
+        screen = self.editor.screen
+        profiler = self.editor.profiler
+        self.clip = clip
+        screen.set_clip(clip)
         self.grid_renderer.draw(
-            self.editor.screen,
+            screen,
             self.editor.panning_state,
             self.editor.zoom
         )
+        profiler.mark("grid")
         self.draw_connections()
+        profiler.mark("connections")
         self.draw_nodes()
+        self.draw_selection_rect()
+        profiler.mark("nodes")
         self.draw_toolbar()
+        profiler.mark("toolbar")
         self.draw_offscreen_indicators()
+        profiler.mark("indicators")
         self.draw_text(events)
-        self.editor.fps_counter.draw(self.editor.screen)
-        pygame.display.flip()
+        profiler.mark("text")
+        self.editor.fps_counter.draw(screen)
+        self.draw_progress()
+        profiler.mark("fps")
+        profiler.draw(screen)
+        profiler.skip()
+        screen.set_clip(None)
+        self.clip = None
+
+    def visible_world_rect(self, margin=0.0):
+        """
+        World rectangle (x0, y0, x1, y1) shown right of the toolbar and inside
+        the current clip, grown by margin screen pixels.
+        """
+        zoom = self.editor.zoom
+        offset_x = self.editor.panning_state.offset_x
+        offset_y = self.editor.panning_state.offset_y
+        right = self.editor.screen.get_width()
+        bottom = self.editor.screen.get_height()
+        left = min(self.editor.toolbar.width, right)
+        top = 0
+        if self.clip is not None:
+            left = max(left, self.clip.left)
+            top = self.clip.top
+            right = max(left, min(right, self.clip.right))
+            bottom = self.clip.bottom
+        return (
+            offset_x + (left - margin) / zoom,
+            offset_y + (top - margin) / zoom,
+            offset_x + (right + margin) / zoom,
+            offset_y + (bottom + margin) / zoom,
+        )
+
+    def visible_nodes(self):
+        """Nodes overlapping the viewport, in drawing order."""
+        x0, y0, x1, y1 = self.visible_world_rect(CONNECTION_RADIUS * self.editor.zoom)
+        nodes = self.editor.nodes
+        candidates = self.editor.spatial_index.nodes_in_rect(x0, y0, x1, y1)
+        if 2 * len(candidates) > len(nodes):
+            # Most of the graph is on screen: keep list order instead of sorting
+            ordered = (node for node in nodes if node in candidates)
+        else:
+            ordered = nodes.in_drawing_order(candidates)
+        return [node for node in ordered
+                if node.x <= x1 and node.x + node.width >= x0 and node.y <= y1 and node.y + node.height >= y0]
+
+    def visible_connections(self):
+        """Connections whose segment crosses the viewport, in drawing order."""
+        rect = self.visible_world_rect(CULL_MARGIN)
+        connections = self.editor.connections
+        candidates = self.editor.spatial_index.connections_in_rect(*rect)
+        if 2 * len(candidates) > len(connections):
+            ordered = (conn for conn in connections if conn in candidates)
+        else:
+            ordered = connections.in_list_order(candidates)
+        visible = []
+        for conn in ordered:
+            x1, y1 = conn.start_node.get_output_pos()
+            x2, y2 = conn.end_node.get_input_pos()
+            if segment_intersects_rect(x1, y1, x2, y2, rect):
+                visible.append(conn)
+        return visible
+
+    def level_of_detail(self):
+        zoom = self.editor.zoom
+        if zoom < self.lod_minimal_zoom:
+            return LOD_MINIMAL
+        if zoom < self.lod_simple_zoom:
+            return LOD_SIMPLE
+        return LOD_FULL
 
     def draw_connections(self):
-        for connection in self.editor.connections:
+        visible = self.visible_connections()
+        self.drawn_connections = len(visible)
+        self.culled_connections = len(self.editor.connections) - len(visible)
+        zoom = self.editor.zoom
+        if self.level_of_detail() != LOD_FULL:
+            self._draw_connection_lines(visible, 1)
+            return
+        # Unlabeled connections are plain lines and go through the batch
+        labeled = [conn for conn in visible if conn.label]
+        if len(labeled) < len(visible):
+            self._draw_connection_lines([conn for conn in visible if not conn.label], max(1, int(2 * zoom)))
+        for connection in labeled:
             connection.draw(
                 self.editor.screen,
                 self.editor.panning_state.offset_x,
                 self.editor.panning_state.offset_y,
-                zoom=self.editor.zoom
+                zoom=zoom
             )
 
     def draw_nodes(self):
         # Nodes
-        for node in self.editor.nodes:
+        visible = self.visible_nodes()
+        self.drawn_nodes = len(visible)
+        self.culled_nodes = len(self.editor.nodes) - len(visible)
+        lod = self.level_of_detail()
+        if lod != LOD_FULL:
+            self._draw_node_rects(visible, outlined=(lod == LOD_SIMPLE))
+            return
+        for node in visible:
             node.draw(
                 self.editor.screen,
                 self.editor.panning_state.offset_x,
@@ -62,71 +357,75 @@ class NodeEditorRenderer:
                 zoom=self.editor.zoom
             )
 
-    def draw_toolbar(self):
-        self.editor.toolbar.draw(self.editor.screen)
-
-    def draw_offscreen_indicators(self):
-        screen_w = self.editor.screen.get_width()
-        screen_h = self.editor.screen.get_height()
-        color = (160, 160, 160)
-        margin = 0
-        r_size = 16 # size of the indicator rect
-
-        toolbar_width = self.editor.toolbar.width
-
-        def is_node_visible(screen_x, screen_y):
-            return (
-                toolbar_width + margin < screen_x < screen_w - margin and
-                margin < screen_y < screen_h - margin
-            )
-
-        def get_screen_coords(node):
-            return (
-                (node.x * self.editor.zoom) - self.editor.panning_state.offset_x * self.editor.zoom,
-                (node.y * self.editor.zoom) - self.editor.panning_state.offset_y * self.editor.zoom,
-            )
-
-        center_x = toolbar_width + (screen_w - toolbar_width) // 2
-        center_y = screen_h // 2
+    def _draw_node_rects(self, nodes, outlined):
+        # Zoomed out: nodes as plain rects, no text and no connection points
+        screen = self.editor.screen
+        zoom = self.editor.zoom
+        offset_x = self.editor.panning_state.offset_x
+        offset_y = self.editor.panning_state.offset_y
+        if not nodes:
+            return
+        # One vectorized transform for all rects instead of four property reads per node
+        xs, ys, widths, heights, flags = node_store.gather(
+            node_store.rows_of(nodes), "xs", "ys", "widths", "heights", "flags")
+        columns = (((xs - offset_x) * zoom).astype(np.int64), ((ys - offset_y) * zoom).astype(np.int64),
+                   np.maximum(1, (widths * zoom).astype(np.int64)), np.maximum(1, (heights * zoom).astype(np.int64)))
+        rects = zip(*(column.tolist() for column in columns))
+        for rect, selected in zip(rects, (flags & HIGHLIGHTED).astype(bool).tolist()):
+            if outlined:
+                screen.fill(DARK_GRAY, rect)
+                pygame.draw.rect(screen, GREEN if selected else GRAY, rect, 1)
+            else:
+                screen.fill(GREEN if selected else GRAY, rect)
 
-        for node in self.editor.nodes:
-            # Convert world coordinates to screen coordinates
-            screen_x, screen_y = get_screen_coords(node)
+    def _draw_connection_lines(self, connections, thickness):
+        draw_connection_batch(
+            self.editor.screen,
+            connections,
+            self.editor.panning_state.offset_x,
+            self.editor.panning_state.offset_y,
+            self.editor.zoom,
+            thickness
+        )
 
-            if is_node_visible(screen_x, screen_y):
-                continue
+    def draw_selection_rect(self):
+        selection = self.editor.selection
+        if selection.is_active():
+            pygame.draw.rect(self.editor.screen, LIGHT_GRAY, selection.screen_rect(), 1)
 
-            dx = screen_x - center_x
-            dy = screen_y - center_y
+    def draw_toolbar(self):
+        self.editor.toolbar.draw(self.editor.screen)
 
-            # Normalize direction to the edge of the window
-            if dx == 0 and dy == 0:
-                continue  # should not happen, but just in case
+    def draw_offscreen_indicators(self):
+        self.offscreen_indicators.draw(
+            self.editor.screen,
+            self.editor.nodes,
+            self.editor.panning_state.offset_x,
+            self.editor.panning_state.offset_y,
+            self.editor.zoom,
+            self.editor.toolbar.width
+        )
 
-            angle = math.atan2(dy, dx)
+    def progress_rect(self):
+        """Screen area of the save/load progress indicator, bottom right."""
+        screen = self.editor.screen
+        rect = pygame.Rect(0, 0, PROGRESS_WIDTH, PROGRESS_HEIGHT)
+        rect.bottomright = (screen.get_width() - 8, screen.get_height() - 8)
+        return rect
 
-            # Determine intersection with window edge
-            if abs(dx) > abs(dy * (screen_w / screen_h)):
-                # Left/Right edge
-                edge_x = screen_w - margin if dx > 0 else toolbar_width + margin
-                edge_y = center_y + (edge_x - center_x) * math.tan(angle)
-            # Top/Bottom
-            else:
-                # Top/Bottom edge
-                edge_y = screen_h - margin if dy > 0 else margin
-                edge_x = center_x + (edge_y - center_y) / math.tan(angle)
-
-            # Draw indicator rect at edge
-            rect_x = int(edge_x - r_size // 2)
-            rect_y = int(edge_y - r_size // 2)
-            rect = pygame.Rect(rect_x, rect_y, r_size, r_size)
-            pygame.draw.rect(
-                self.editor.screen,
-                color,
-                rect,
-                width=1,
-                border_radius=3
-                )
+    def draw_progress(self):
+        job = self.editor.graph_persistence.job
+        if job is None:
+            return
+        screen = self.editor.screen
+        rect = self.progress_rect()
+        screen.fill(DARK_GRAY, rect)
+        pygame.draw.rect(screen, GRAY, rect, 1)
+        text = label_cache.get(f"{job.label}  {int(job.progress * 100)}%", 14, WHITE)
+        screen.blit(text, (rect.x + 6, rect.y + 4))
+        bar = pygame.Rect(rect.x + 6, rect.bottom - 10, rect.width - 12, 4)
+        screen.fill(GRAY, bar)
+        screen.fill(GREEN, (bar.x, bar.y, int(bar.width * job.progress), bar.height))
 
     def draw_text(self, events):
         if self.editor.text_input_active:
@@ -0,0 +1,202 @@
+"""
+Record the editor's input events and replay them headless.
+
+Record a session (the starting graph is saved next to the recording):
+    uv run python main.py --record session.jsonl
+
+Replay it as fast as possible and report the timing per event and frame:
+    uv run python replay.py session.jsonl --json timings.json
+
+Add --trace trace.json to also get the per-phase breakdown of every frame
+as a Chrome trace (open it in chrome://tracing or ui.perfetto.dev).
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import pygame
+
+RECORDING_VERSION = 1
+# Event attributes worth keeping; everything else (e.g. window handles) is dropped
+_RECORDED_TYPES = (bool, int, float, str)
+
+
+def event_to_dict(event):
+    data = {"type": event.type}
+    for key, value in event.dict.items():
+        if isinstance(value, _RECORDED_TYPES):
+            data[key] = value
+        elif isinstance(value, (tuple, list)) and all(isinstance(v, _RECORDED_TYPES) for v in value):
+            data[key] = list(value)
+    if event.type == pygame.MOUSEWHEEL and "pos" not in data:
+        # The zoom anchor is read from the mouse position, which a replay does not have
+        data["pos"] = list(pygame.mouse.get_pos())
+    return data
+
+
+def dict_to_event(data):
+    attributes = {key: tuple(value) if isinstance(value, list) else value
+                  for key, value in data.items() if key != "type"}
+    return pygame.event.Event(data["type"], attributes)
+
+
+class EventRecorder:
+    """Writes every frame's events as one JSON line, after a header line with the view state."""
+    def __init__(self, path, editor):
+        self.path = path
+        self.frame = 0
+        self._last_frame = time.perf_counter()
+        graph_path = path + ".ngraph"
+        editor.save_graph(graph_path)
+        self._file = open(path, "w")
+        header = {
+            "version": RECORDING_VERSION,
+            "size": list(editor.screen.get_size()),
+            "zoom": editor.zoom,
+            "offset": [editor.panning_state.offset_x, editor.panning_state.offset_y],
+            "graph": os.path.basename(graph_path),
+        }
+        self._file.write(json.dumps(header) + "\n")
+
+    def record_frame(self, events):
+        now = time.perf_counter()
+        line = {
+            "frame": self.frame,
+            "dt_ms": (now - self._last_frame) * 1000.0,
+            "events": [event_to_dict(event) for event in events],
+        }
+        self._last_frame = now
+        self.frame += 1
+        self._file.write(json.dumps(line) + "\n")
+        # The editor exits from inside the event loop, so never keep frames buffered
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def load_recording(path):
+    """Return (header, frames) where frames is a list of event lists."""
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if header.get("version") != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording version {header.get('version')} in {path}")
+        frames = [[dict_to_event(data) for data in json.loads(line)["events"]] for line in f if line.strip()]
+    return header, frames
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+class ReplayTimings:
+    def __init__(self):
+        self.event_times = {}  # event name -> list of dispatch times in ms
+        self.frame_times = []  # dispatch plus draw per frame in ms
+        self.coalesced_motion_events = 0  # Motion events merged into the one before
+
+    def add_event(self, event_type, elapsed_ms):
+        self.event_times.setdefault(pygame.event.event_name(event_type), []).append(elapsed_ms)
+
+    def add_frame(self, elapsed_ms):
+        self.frame_times.append(elapsed_ms)
+
+    def report(self, slowest=5):
+        ordered = sorted(self.frame_times)
+        events = {}
+        for name, times in sorted(self.event_times.items()):
+            events[name] = {
+                "count": len(times),
+                "total_ms": sum(times),
+                "mean_ms": statistics.fmean(times),
+                "max_ms": max(times),
+            }
+        worst = sorted(range(len(self.frame_times)), key=self.frame_times.__getitem__, reverse=True)[:slowest]
+        return {
+            "frames": {
+                "count": len(ordered),
+                "total_ms": sum(ordered),
+                "median_ms": statistics.median(ordered) if ordered else 0.0,
+                "p95_ms": _percentile(ordered, 0.95),
+                "max_ms": ordered[-1] if ordered else 0.0,
+                "slowest": [{"frame": i, "ms": self.frame_times[i]} for i in worst],
+            },
+            "events": events,
+            "coalesced_motion_events": self.coalesced_motion_events,
+        }
+
+
+def replay(editor, frames, draw=True):
+    """
+    Feed recorded frames through the editor without waiting between them.
+
+    Each event is dispatched on its own so it can be timed; motion events are
+    coalesced and frames are drawn like in NodeEditor.run unless draw is
+    False. Stops at the first QUIT.
+    """
+    timings = ReplayTimings()
+    profiler = editor.profiler
+    coalesced_before = editor.coalesced_motion_events
+    for events in frames:
+        frame_start = time.perf_counter()
+        profiler.begin_frame()
+        filtered_events = []
+        for event in editor.coalesce_motion(events):
+            if event.type == pygame.QUIT:
+                timings.coalesced_motion_events = editor.coalesced_motion_events - coalesced_before
+                return timings
+            start = time.perf_counter()
+            filtered_events.extend(editor.handle_events([event]))
+            timings.add_event(event.type, (time.perf_counter() - start) * 1000.0)
+            profiler.mark("events")
+        if draw:
+            editor.draw(filtered_events)
+        profiler.end_frame()
+        timings.add_frame((time.perf_counter() - frame_start) * 1000.0)
+    timings.coalesced_motion_events = editor.coalesced_motion_events - coalesced_before
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded editor session headless.")
+    parser.add_argument("recording")
+    parser.add_argument("--no-draw", action="store_true", help="only dispatch events")
+    parser.add_argument("--full-redraw", action="store_true", help="repaint every frame instead of damaged regions")
+    parser.add_argument("--json", metavar="PATH", help="write the timing report to PATH")
+    parser.add_argument("--trace", metavar="PATH", help="write the frame phases as Chrome trace JSON to PATH")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    from editor import NodeEditor
+    header, frames = load_recording(args.recording)
+    editor = NodeEditor(headless=True, size=tuple(header["size"]), retained_rendering=not args.full_redraw)
+    graph_path = os.path.join(os.path.dirname(args.recording), header["graph"])
+    if os.path.exists(graph_path):
+        editor.load_graph(graph_path)
+    editor.zoom = header["zoom"]
+    editor.panning_state.offset_x, editor.panning_state.offset_y = header["offset"]
+
+    if args.trace:
+        editor.profiler.start_trace()
+    report = replay(editor, frames, draw=not args.no_draw).report()
+    if args.trace:
+        editor.profiler.stop_trace(args.trace)
+    frame_stats = report["frames"]
+    print(f"{frame_stats['count']} frames in {frame_stats['total_ms']:.1f} ms, "
+          f"median {frame_stats['median_ms']:.3f} ms, p95 {frame_stats['p95_ms']:.3f} ms, "
+          f"max {frame_stats['max_ms']:.3f} ms")
+    print(f"{'event':<20} {'count':>7} {'mean ms':>9} {'max ms':>9} {'total ms':>10}")
+    for name, stats in report["events"].items():
+        print(f"{name:<20} {stats['count']:>7} {stats['mean_ms']:>9.3f} {stats['max_ms']:>9.3f} "
+              f"{stats['total_ms']:>10.2f}")
+    print(f"coalesced motion events: {report['coalesced_motion_events']}")
+    print("slowest frames: " + ", ".join(f"#{s['frame']} {s['ms']:.2f} ms" for s in frame_stats["slowest"]))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,100 @@
+import numpy as np
+import pygame
+from node_store import PREVIEW, node_store
+
+
 class NodeSelection:
-    def __init__(self):
+    """
+    The selected nodes and the rubber band rectangle.
+
+    The selection is kept as node id -> node in selection order, so
+    selecting, deselecting and clearing cost O(selected) and never walk
+    all nodes. The rubber band is given in screen coordinates; with a
+    spatial index, the nodes inside it are found by a world rectangle
+    query, and while it is dragged they are flagged PREVIEW so they are
+    drawn highlighted.
+    """
+    def __init__(self, spatial_index=None):
+        self.spatial_index = spatial_index
         self.rect_start = None
         self.rect_end = None
         self.nodes = []
-        self.selected_nodes = []
+        self.additive = False  # The rectangle adds to the selection instead of replacing it
+        self.preview = set()  # Nodes inside the rectangle while it is dragged
+        self._selected = {}  # node id -> node
+
+    @property
+    def selected_nodes(self):
+        return list(self._selected.values())
 
-    def begin(self, start_pos):
+    @property
+    def selected_ids(self):
+        return self._selected.keys()
+
+    def begin(self, start_pos, additive=False):
         self.rect_start = start_pos
         self.rect_end = start_pos
+        self.additive = additive
         self.nodes = []
 
-    def update(self, end_pos):
+    def update(self, end_pos, canvas_offset_x=0.0, canvas_offset_y=0.0, zoom=1.0):
+        """
+        Move the rectangle's corner. Returns the nodes whose preview flag
+        changed, for the caller to repaint; none without a spatial index.
+        """
         self.rect_end = end_pos
+        if self.spatial_index is None:
+            return []
+        inside = set(self._nodes_inside(None, canvas_offset_x, canvas_offset_y, zoom))
+        entered = inside - self.preview
+        left = self.preview - inside
+        self._flag_preview(entered, True)
+        self._flag_preview(left, False)
+        self.preview = inside
+        return entered | left
 
     def finish(self, all_nodes, canvas_offset_x, canvas_offset_y, zoom):
         if self.rect_start and self.rect_end:
-            x0, y0 = self.rect_start
-            x1, y1 = self.rect_end
-            rx0, ry0 = min(x0, x1), min(y0, y1)
-            rx1, ry1 = max(x0, x1), max(y0, y1)
-            self.nodes = []
-            for node in all_nodes:
-                nx = (node.x - canvas_offset_x) * zoom
-                ny = (node.y - canvas_offset_y) * zoom
-                nw = node.width * zoom
-                nh = node.height * zoom
-                if rx0 <= nx and nx + nw <= rx1 and ry0 <= ny and ny + nh <= ry1:
-                    self.nodes.append(node)
+            self.nodes = self._nodes_inside(all_nodes, canvas_offset_x, canvas_offset_y, zoom)
+        self._clear_preview()
         self.rect_start = None
         self.rect_end = None
 
+    def _nodes_inside(self, all_nodes, canvas_offset_x, canvas_offset_y, zoom):
+        # Nodes entirely inside the rectangle, tested in world coordinates
+        x0, y0 = self.rect_start
+        x1, y1 = self.rect_end
+        wx0 = min(x0, x1) / zoom + canvas_offset_x
+        wy0 = min(y0, y1) / zoom + canvas_offset_y
+        wx1 = max(x0, x1) / zoom + canvas_offset_x
+        wy1 = max(y0, y1) / zoom + canvas_offset_y
+        if self.spatial_index is not None:
+            candidates = self.spatial_index.nodes_in_rect(wx0, wy0, wx1, wy1)
+            # Keep the drawing order of all_nodes where it has one
+            in_order = getattr(all_nodes, "in_drawing_order", None)
+            nodes = in_order(candidates) if in_order is not None else list(candidates)
+        else:
+            nodes = list(all_nodes)
+        if not nodes:
+            return []
+        xs, ys, widths, heights = node_store.gather(node_store.rows_of(nodes), "xs", "ys", "widths", "heights")
+        inside = (wx0 <= xs) & (xs + widths <= wx1) & (wy0 <= ys) & (ys + heights <= wy1)
+        return [nodes[i] for i in np.flatnonzero(inside).tolist()]
+
+    def _clear_preview(self):
+        self._flag_preview(self.preview, False)
+        self.preview = set()
+
+    @staticmethod
+    def _flag_preview(nodes, value):
+        if not nodes:
+            return
+        rows = node_store.rows_of(nodes)
+        flags, = node_store.gather(rows, "flags")
+        node_store.scatter(rows, flags=flags | PREVIEW if value else flags & ~np.uint8(PREVIEW))
+
     def clear(self):
+        self._clear_preview()
         self.rect_start = None
         self.rect_end = None
         self.nodes = []
@@ -38,14 +102,37 @@ class NodeSelection:
     def is_active(self):
         return self.rect_start is not None and self.rect_end is not None
 
+    def screen_rect(self):
+        x0, y0 = self.rect_start
+        x1, y1 = self.rect_end
+        return pygame.Rect(min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0))
+
     def select_node(self, node, all_nodes):
         # Deselect all others, select only this node
-        for n in all_nodes:
-            n.selected = False
+        self.clear_selection(all_nodes)
         node.selected = True
-        self.selected_nodes = [node]
+        self._selected[node.id] = node
 
     def clear_selection(self, all_nodes):
-        for n in all_nodes:
+        for n in self._selected.values():
             n.selected = False
-        self.selected_nodes = []
+        self._selected = {}
+
+    def select_nodes(self, nodes, additive=False):
+        if not additive:
+            self.clear_selection(nodes)
+        for n in nodes:
+            n.selected = True
+            self._selected[n.id] = n
+
+    def deselect(self, node):
+        node.selected = False
+        self._selected.pop(node.id, None)
+
+    def toggle_node(self, node):
+        # Shift-click: add the node to the selection or take it out
+        if node.id in self._selected:
+            self.deselect(node)
+        else:
+            node.selected = True
+            self._selected[node.id] = node
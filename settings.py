@@ -1,6 +1,27 @@
 # If true the canvas will follow the mouse cursor when panning
 PANNING_FOLLOWS_MOUSE = True
 
+# If true only the screen regions that changed are repainted and the editor
+# sleeps while nothing happens. False redraws the whole frame every iteration.
+RETAINED_RENDERING = True
+# Frame rate cap of the main loop in retained rendering mode
+MAX_FPS = 120
+
+# Level of detail: below LOD_SIMPLE_ZOOM nodes are plain rects without text or
+# connection points and connections are lines without labels; below
+# LOD_MINIMAL_ZOOM nodes are filled rects only.
+LOD_SIMPLE_ZOOM = 0.4
+LOD_MINIMAL_ZOOM = 0.2
+
+# Graph files with at least LAZY_LOAD_MIN_NODES nodes are opened lazily: only
+# the nodes around the viewport are loaded, at most LAZY_LOAD_MAX_NODES at a time.
+LAZY_LOAD_MIN_NODES = 200_000
+LAZY_LOAD_MAX_NODES = 50_000
+
+# Every edit is appended to a journal for crash recovery; after this many
+# edits the journal is compacted into a checkpoint of the whole graph.
+JOURNAL_COMPACT_EVERY = 1000
+
 # Additional settings can be added later, e.g.:
 # DEFAULT_NODE_COLOR = (64, 64, 64)
 # ENABLE_GRID_SNAP = False
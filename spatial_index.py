@@ -0,0 +1,219 @@
+from collections import defaultdict
+from constants import SPATIAL_INDEX_CELL_SIZE
+
+
+class SpatialIndex:
+    """
+    Uniform grid over world coordinates used for hit-testing.
+
+    Nodes are bucketed by their bounding box, connections by the grid cells
+    their segment passes through. Queries return candidates only; callers
+    still run the exact test (contains_point / is_clicked) on them.
+
+    Nodes moved as a group are floated: every query returns them and their
+    connections until land_nodes() re-buckets them at their new positions,
+    so a drag re-buckets nothing per motion event and every connection
+    only once at the end.
+    """
+    def __init__(self, cell_size=SPATIAL_INDEX_CELL_SIZE):
+        self.cell_size = cell_size
+        self._node_cells = defaultdict(set)        # (cx, cy) -> nodes overlapping the cell
+        self._node_spans = {}                      # node -> (cx0, cy0, cx1, cy1)
+        self._connection_cells = defaultdict(set)  # (cx, cy) -> connections crossing the cell
+        self._connection_keys = {}                 # connection -> tuple of cells
+        self._node_connections = defaultdict(set)  # node -> connections touching it
+        self._floating_nodes = set()
+        self._floating_connections = set()
+
+    # --- Nodes ---
+
+    def insert_node(self, node):
+        span = self._node_span(node)
+        self._node_spans[node] = span
+        for cell in self._cells_in_span(span):
+            self._node_cells[cell].add(node)
+
+    def remove_node(self, node):
+        self._floating_nodes.discard(node)
+        span = self._node_spans.pop(node, None)
+        if span is None:
+            return
+        for cell in self._cells_in_span(span):
+            self._discard(self._node_cells, cell, node)
+
+    def update_node(self, node):
+        """Re-bucket a node and the connections touching it after the node moved."""
+        self._rebucket_node(node)
+        for conn in self._node_connections.get(node, ()):
+            self.update_connection(conn)
+
+    def _rebucket_node(self, node):
+        old_span = self._node_spans.get(node)
+        if old_span is not None:
+            new_span = self._node_span(node)
+            if new_span != old_span:
+                for cell in self._cells_in_span(old_span):
+                    self._discard(self._node_cells, cell, node)
+                self.insert_node(node)
+
+    def nodes_at(self, x, y):
+        found = self._node_cells.get(self._cell_of(x, y), ())
+        if self._floating_nodes:
+            return self._floating_nodes.union(found)
+        return found
+
+    def nodes_in_rect(self, x0, y0, x1, y1):
+        return self._query_rect(self._node_cells, x0, y0, x1, y1, self._floating_nodes)
+
+    def clear_nodes(self):
+        self._node_cells.clear()
+        self._node_spans.clear()
+        self._floating_nodes.clear()
+
+    def float_nodes(self, nodes):
+        # They stay in their old cells, queries return them from everywhere
+        self._floating_nodes.update(nodes)
+        for node in nodes:
+            self._floating_connections.update(self._node_connections.get(node, ()))
+
+    def land_nodes(self):
+        nodes = self._floating_nodes
+        connections = self._floating_connections
+        self._floating_nodes = set()
+        self._floating_connections = set()
+        for node in nodes:
+            self._rebucket_node(node)
+        for conn in connections:
+            self.update_connection(conn)
+
+    # --- Connections ---
+
+    def insert_connection(self, conn):
+        cells = tuple(self._segment_cells(*self._connection_segment(conn)))
+        self._connection_keys[conn] = cells
+        for cell in cells:
+            self._connection_cells[cell].add(conn)
+        self._node_connections[conn.start_node].add(conn)
+        self._node_connections[conn.end_node].add(conn)
+        if conn.start_node in self._floating_nodes or conn.end_node in self._floating_nodes:
+            self._floating_connections.add(conn)
+
+    def remove_connection(self, conn):
+        self._floating_connections.discard(conn)
+        cells = self._connection_keys.pop(conn, None)
+        if cells is None:
+            return
+        for cell in cells:
+            self._discard(self._connection_cells, cell, conn)
+        self._discard(self._node_connections, conn.start_node, conn)
+        self._discard(self._node_connections, conn.end_node, conn)
+
+    def update_connection(self, conn):
+        old_cells = self._connection_keys.get(conn)
+        if old_cells is None:
+            return
+        new_cells = tuple(self._segment_cells(*self._connection_segment(conn)))
+        if new_cells == old_cells:
+            return
+        for cell in old_cells:
+            self._discard(self._connection_cells, cell, conn)
+        for cell in new_cells:
+            self._connection_cells[cell].add(conn)
+        self._connection_keys[conn] = new_cells
+
+    def connections_of(self, node):
+        """Connections starting or ending at node."""
+        return self._node_connections.get(node, ())
+
+    def connections_near(self, x, y, radius):
+        """Connections whose segment may pass within radius of (x, y)."""
+        return self._query_rect(self._connection_cells, x - radius, y - radius, x + radius, y + radius,
+                                self._floating_connections)
+
+    def connections_in_rect(self, x0, y0, x1, y1):
+        return self._query_rect(self._connection_cells, x0, y0, x1, y1, self._floating_connections)
+
+    def clear_connections(self):
+        self._connection_cells.clear()
+        self._connection_keys.clear()
+        self._node_connections.clear()
+        self._floating_connections.clear()
+
+    # --- Helpers ---
+
+    def _cell_of(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def _node_span(self, node):
+        cx0, cy0 = self._cell_of(node.x, node.y)
+        cx1, cy1 = self._cell_of(node.x + node.width, node.y + node.height)
+        return (cx0, cy0, cx1, cy1)
+
+    @staticmethod
+    def _cells_in_span(span):
+        cx0, cy0, cx1, cy1 = span
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                yield (cx, cy)
+
+    @staticmethod
+    def _discard(buckets, key, item):
+        bucket = buckets.get(key)
+        if bucket is not None:
+            bucket.discard(item)
+            if not bucket:
+                del buckets[key]
+
+    def _query_rect(self, buckets, x0, y0, x1, y1, floating=()):
+        cx0, cy0 = self._cell_of(min(x0, x1), min(y0, y1))
+        cx1, cy1 = self._cell_of(max(x0, x1), max(y0, y1))
+        found = set(floating)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(buckets):
+            # Rect covers more cells than are occupied: walk the occupied ones instead
+            for (cx, cy), bucket in buckets.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    found.update(bucket)
+        else:
+            for cell in self._cells_in_span((cx0, cy0, cx1, cy1)):
+                bucket = buckets.get(cell)
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    @staticmethod
+    def _connection_segment(conn):
+        # Same end points as Connection.is_clicked
+        x1, y1 = conn.start_node.get_right_center()
+        x2, y2 = conn.end_node.get_left_center()
+        return x1, y1, x2, y2
+
+    def _segment_cells(self, x1, y1, x2, y2):
+        # Grid traversal (Amanatides & Woo) of the cells the segment passes through
+        cs = self.cell_size
+        cx, cy = self._cell_of(x1, y1)
+        end_cx, end_cy = self._cell_of(x2, y2)
+        dx = x2 - x1
+        dy = y2 - y1
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        if dx != 0:
+            t_max_x = ((cx + (step_x > 0)) * cs - x1) / dx
+            t_delta_x = cs / abs(dx)
+        else:
+            t_max_x = t_delta_x = float('inf')
+        if dy != 0:
+            t_max_y = ((cy + (step_y > 0)) * cs - y1) / dy
+            t_delta_y = cs / abs(dy)
+        else:
+            t_max_y = t_delta_y = float('inf')
+        cells = [(cx, cy)]
+        while (cx, cy) != (end_cx, end_cy):
+            # Never overshoot the end cell on an axis, even with rounding errors
+            if cy == end_cy or (cx != end_cx and t_max_x < t_max_y):
+                cx += step_x
+                t_max_x += t_delta_x
+            else:
+                cy += step_y
+                t_max_y += t_delta_y
+            cells.append((cx, cy))
+        return cells
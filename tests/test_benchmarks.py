@@ -0,0 +1,29 @@
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import json
+import pygame
+from benchmarks.bench_suite import main, run_suite
+from benchmarks.synthetic import populate
+from editor import NodeEditor
+
+
+def test_populate_builds_consistent_graph():
+    pygame.init()
+    editor = NodeEditor()
+    nodes = populate(editor, 50, 80)
+    assert len(editor.nodes) == len(nodes) == 50
+    assert len(editor.connections) == editor.nx_graph.number_of_edges() == 80
+    assert editor.nx_graph.number_of_nodes() == 50
+
+
+def test_suite_reports_every_benchmark(tmp_path):
+    report = run_suite(30, 40, repeat=2)
+    assert report["nodes"] == 30 and report["edges"] == 40
+    assert {"draw_full_zoom", "hit_test_100", "undo_command", "rubber_band_select",
+            "drag_50_moves", "save_graph", "load_graph"} <= set(report["results"])
+    assert all(result["runs"] == 2 and result["min_ms"] >= 0 for result in report["results"].values())
+    # The JSON written by the command line can be read back as a baseline
+    path = tmp_path / "results.json"
+    main(["--nodes", "10", "--edges", "10", "--repeat", "1", "--json", str(path)])
+    main(["--nodes", "10", "--edges", "10", "--repeat", "1", "--baseline", str(path)])
+    assert json.loads(path.read_text())["schema"] == 1
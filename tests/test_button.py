@@ -212,7 +212,7 @@ class TestButton:
         node = editor.nodes[-1]
         assert node.node_name == "A"
         # Simulate selecting the node
-        node.selected = True
+        editor.selection.select_node(node, editor.nodes)
         # Simulate renaming via text input
         editor.text_input_active = True
         editor.visualizer.value = "CustomName"
@@ -0,0 +1,36 @@
+from connection import Connection
+from connection_list import ConnectionList
+from node import Node
+
+
+def make_list():
+    a, b, c = Node(0, 0, 1), Node(100, 0, 2), Node(200, 0, 3)
+    connections = ConnectionList()
+    ab, bc, ca, ab2 = Connection(a, b), Connection(b, c), Connection(c, a), Connection(a, b, label="again")
+    for conn in (ab, bc, ca, ab2):
+        connections.append(conn)
+    return connections, (a, b, c), (ab, bc, ca, ab2)
+
+
+def test_lookups_by_node_and_ends():
+    connections, (a, b, c), (ab, bc, ca, ab2) = make_list()
+    assert connections.outgoing(a) == [ab, ab2]
+    assert connections.incoming(a) == [ca]
+    assert connections.connections_of(a) == [ab, ca, ab2]
+    assert connections.between(a, b) is ab
+    assert connections.between(b, a) is None
+    assert connections.connected(b, a) and not connections.connected(a, Node(0, 0, 4))
+
+
+def test_removal_keeps_order_and_indexes():
+    connections, (a, b, c), (ab, bc, ca, ab2) = make_list()
+    connections.remove(ab)
+    assert list(connections) == [bc, ca, ab2]
+    assert connections.between(a, b) is ab2
+    connections.append(ab)
+    assert list(connections) == [bc, ca, ab2, ab]
+    connections.remove_connections_for_node(a)
+    assert list(connections) == [bc]
+    assert connections.connections_of(a) == []
+    assert not connections.connected(a, b)
+    assert connections.connections_of(b) == [bc]
@@ -4,6 +4,7 @@ import pickle
 import logging
 os.environ["SDL_VIDEODRIVER"] = "dummy"
 import pygame
+from conftest import lmb_down, lmb_up, mouse_move
 from editor import NodeEditor
 from node import Node
 from connection import Connection
@@ -32,14 +33,12 @@ class TestNodeEditor:
         """Test adding a node to the editor and the graph."""
         initial_count = len(editor.nodes)
         editor.nodes.append(Node(100, 100, 1))
-        editor.nx_graph.add_node(1, pos=(100, 100))
         assert len(editor.nodes) == initial_count + 1
         assert 1 in editor.nx_graph.nodes
 
     def test_delete_node(self, editor):
         node = Node(100, 100, 1)
         editor.nodes.append(node)
-        editor.nx_graph.add_node(1, pos=(100, 100))
         editor.try_delete_node(100, 100)
         assert node not in editor.nodes
         assert 1 not in editor.nx_graph.nodes
@@ -48,10 +47,7 @@ class TestNodeEditor:
         n1 = Node(0, 0, 1)
         n2 = Node(100, 100, 2)
         editor.nodes.extend([n1, n2])
-        editor.nx_graph.add_node(1, pos=(0, 0))
-        editor.nx_graph.add_node(2, pos=(100, 100))
         editor.connections.append(Connection(n1, n2))
-        editor.nx_graph.add_edge(1, 2)
         assert editor.nx_graph.has_edge(1, 2) is True
         assert len(editor.connections) == 1
 
@@ -109,7 +105,6 @@ class TestNodeEditor:
         # Given a node is present and selected
         node = Node(100, 100, 1)
         editor.nodes.append(node)
-        editor.nx_graph.add_node(1, pos=(100, 100), name=node.node_name)
         # Simulate user selects the node (as in UI)
         editor.selection.select_node(node, editor.nodes)
         # And the text input is activated
@@ -136,7 +131,6 @@ class TestNodeEditor:
         for nid in initial_ids:
             node = Node(nid * 10, nid * 10, nid)
             editor.nodes.append(node)
-            editor.nx_graph.add_node(nid, pos=(nid * 10, nid * 10), name=chr(64 + nid))  # names: 'A', 'B', 'C'
         editor.next_node_id = max(initial_ids) + 1
 
         logging.info(f"[TEST] Initial node set: ids={initial_ids}, node_names={[chr(64 + i) for i in initial_ids]}")
@@ -182,7 +176,6 @@ class TestNodeEditor:
         # Add a new node and check that its id does not collide
         new_node = Node(999, 999, editor.next_node_id)
         editor.nodes.append(new_node)
-        editor.nx_graph.add_node(editor.next_node_id, pos=(999, 999), name="NEW")
         ids_after = [n.id for n in editor.nodes]
         logging.info(f"[ASSERT] After add: ids_after={ids_after}, new_node.id={new_node.id}, previous_ids={ids}")
         assert len(ids_after) == len(set(ids_after)), (
@@ -208,7 +201,6 @@ class TestNodeEditor:
         for nid in initial_ids:
             node = Node(nid * 10, nid * 10, nid)
             editor.nodes.append(node)
-            editor.nx_graph.add_node(nid, pos=(nid * 10, nid * 10), name=f"Editor{nid}")
         editor.next_node_id = max(initial_ids) + 1
         logging.info(f"[TEST] Initial editor node ids: {initial_ids}")
 
@@ -282,3 +274,155 @@ class TestNodeEditor:
         logging.info(
             "[ASSERT] next_node_id is correct: %s", editor.next_node_id
         )
+
+    def test_undo_redo_delete_node_restores_connections(self, editor):
+        """Deleting a node is undone with its connections and can be redone."""
+        n1 = Node(0, 0, 1)
+        n2 = Node(200, 0, 2)
+        editor._insert_node(n1)
+        editor._insert_node(n2)
+        editor._insert_connection(Connection(n1, n2, label="edge"))
+        stack_size = editor.undo_stack.count_items_in_stack()
+
+        assert editor.try_delete_node(210, 10) is True
+        assert editor.undo_stack.count_items_in_stack() == stack_size + 1
+        assert len(editor.connections) == 0
+        assert 2 not in editor.nx_graph.nodes
+
+        editor.undo()
+        assert n2 in editor.nodes
+        assert len(editor.connections) == 1
+        assert editor.nx_graph[1][2]['label'] == "edge"
+
+        editor.redo()
+        assert n2 not in editor.nodes
+        assert len(editor.connections) == 0
+        assert not editor.nx_graph.has_edge(1, 2)
+
+    def test_undo_does_not_snapshot_graph(self, editor):
+        """Edits record commands instead of graph copies."""
+        node = Node(0, 0, 1)
+        editor._insert_node(node)
+        editor.selection.select_node(node, editor.nodes)
+        editor.text_input_active = True
+        editor.visualizer.value = "Renamed"
+        editor.handle_key_down(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN))
+        assert not isinstance(editor.undo_stack.stack[-1], nx.DiGraph)
+
+        editor.undo()
+        assert node.node_name == "A"
+        assert editor.nx_graph.nodes[1]['name'] == "A"
+        editor.redo()
+        assert node.node_name == "Renamed"
+        assert editor.nx_graph.nodes[1]['name'] == "Renamed"
+
+    def test_new_edit_clears_redo(self, editor):
+        """Recording a new edit drops everything that could have been redone."""
+        n1 = Node(0, 0, 1)
+        n2 = Node(200, 0, 2)
+        editor._insert_node(n1)
+        editor._insert_node(n2)
+        editor.try_delete_node(10, 10)
+        editor.undo()
+        assert editor.undo_stack.can_redo()
+        editor.try_delete_node(210, 10)
+        assert not editor.undo_stack.can_redo()
+
+    def test_snapshot_undo_keeps_unchanged_nodes(self, editor):
+        """Undoing a snapshot patches the scene instead of rebuilding every node."""
+        n1 = Node(0, 0, 1)
+        n2 = Node(200, 0, 2)
+        editor._insert_node(n1)
+        editor._insert_node(n2)
+        editor._insert_connection(Connection(n1, n2, label="edge"))
+        for node in editor.nodes:
+            node.draw(editor.screen)
+        cached_surface = n1._cache_surface
+        # A caller that still snapshots the whole graph
+        editor.undo_stack.push(editor.nx_graph)
+        editor._set_node_name(n2, "Renamed")
+        editor._set_node_position(n1, 50, 50)
+        editor._discard_connection(next(iter(editor.connections)))
+        editor._insert_node(Node(400, 0, 3))
+
+        editor.undo()
+
+        assert list(editor.nodes) == [n1, n2]
+        assert (n1.x, n1.y) == (0, 0)
+        assert n1._cache_surface is cached_surface
+        assert n2.node_name == "B"
+        assert [(c.start_node, c.end_node, c.label) for c in editor.connections] == [(n1, n2, "edge")]
+        assert editor.next_node_id == 3
+
+    def test_rubber_band_selects_and_group_drag_is_one_undo_entry(self, editor):
+        nodes = [Node(200 + 100 * i, 200, i + 1) for i in range(3)]
+        outside = Node(200, 500, 4)
+        for node in nodes + [outside]:
+            editor._insert_node(node)
+        editor.dispatch_event(lmb_down((180, 180)))
+        editor.dispatch_event(mouse_move((180, 180), (500, 300), buttons=(1, 0, 0)))
+        editor.dispatch_event(lmb_up((500, 300)))
+        assert editor.selection.selected_nodes == nodes
+        assert not outside.selected
+
+        editor.dispatch_event(lmb_down((340, 240)))
+        for step in range(1, 6):
+            editor.dispatch_event(mouse_move((340, 240), (340 + 10 * step, 240 + 100 * step), buttons=(1, 0, 0)))
+        assert all(node.dragging for node in nodes)
+        editor.dispatch_event(lmb_up((390, 740)))
+        assert [(node.x, node.y) for node in nodes] == [(250, 700), (350, 700), (450, 700)]
+        assert not any(node.dragging for node in nodes)
+        assert editor._find_node_at(260, 710) is nodes[0]
+        assert editor._find_node_at(210, 210) is None
+        # One entry on top of the initial empty snapshot
+        assert len(editor.undo_stack.stack) == 2
+
+        editor.undo()
+        assert [(node.x, node.y) for node in nodes] == [(200, 200), (300, 200), (400, 200)]
+        assert editor._find_node_at(210, 210) is nodes[0]
+
+    def test_shift_click_toggles_nodes_in_the_selection(self, editor):
+        a = Node(200, 200, 1)
+        b = Node(400, 200, 2)
+        editor._insert_node(a)
+        editor._insert_node(b)
+        editor._handle_left_mouse_down(a, 210, 210)
+        editor._handle_left_mouse_down(b, 410, 210, additive=True)
+        assert editor.selection.selected_nodes == [a, b]
+        editor._handle_left_mouse_down(a, 210, 210, additive=True)
+        assert editor.selection.selected_nodes == [b] and not a.selected
+
+    def test_rubber_band_previews_nodes_while_dragged(self, editor):
+        a = Node(200, 200, 1)
+        b = Node(400, 200, 2)
+        editor._insert_node(a)
+        editor._insert_node(b)
+        editor.dispatch_event(lmb_down((180, 180)))
+        editor.dispatch_event(mouse_move((180, 180), (350, 300), buttons=(1, 0, 0)))
+        assert a.highlighted and not a.selected
+        assert not b.highlighted
+        editor.dispatch_event(mouse_move((350, 300), (550, 300), buttons=(1, 0, 0)))
+        assert a.highlighted and b.highlighted
+        editor.dispatch_event(mouse_move((550, 300), (350, 300), buttons=(1, 0, 0)))
+        assert not b.highlighted
+        editor.dispatch_event(lmb_up((350, 300)))
+        assert a.selected and not b.highlighted
+        assert set(editor.selection.selected_ids) == {1}
+        assert not editor.selection.preview
+
+    def test_shift_state_comes_from_the_key_events(self, editor):
+        a = Node(200, 200, 1)
+        b = Node(400, 200, 2)
+        editor._insert_node(a)
+        editor._insert_node(b)
+        editor.dispatch_event(lmb_down((210, 210)))
+        editor.dispatch_event(lmb_up((210, 210)))
+        editor.dispatch_event(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_LSHIFT, mod=pygame.KMOD_LSHIFT))
+        editor.dispatch_event(lmb_down((410, 210)))
+        editor.dispatch_event(lmb_up((410, 210)))
+        assert editor.selection.selected_nodes == [a, b]
+        editor.dispatch_event(pygame.event.Event(pygame.KEYUP, key=pygame.K_LSHIFT, mod=pygame.KMOD_NONE))
+        # Without shift a click on a selected node keeps the selection instead of toggling it
+        editor.dispatch_event(lmb_down((210, 210)))
+        editor.dispatch_event(lmb_up((210, 210)))
+        assert editor.selection.selected_nodes == [a, b]
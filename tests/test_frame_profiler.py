@@ -0,0 +1,72 @@
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import json
+import pygame
+import pytest
+from editor import NodeEditor
+from frame_profiler import PHASES, FrameProfiler
+from node import Node
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pygame_init():
+    pygame.init()
+    yield
+
+
+def test_inactive_profiler_records_nothing():
+    profiler = FrameProfiler()
+    profiler.begin_frame()
+    profiler.mark("grid")
+    profiler.end_frame()
+    assert not profiler.frame_samples
+    assert not profiler.samples["grid"]
+
+
+def test_percentiles_over_rolling_window():
+    profiler = FrameProfiler(history=10)
+    profiler.overlay_visible = True
+    for _ in range(25):
+        profiler.begin_frame()
+        profiler.mark("grid")
+        profiler.end_frame()
+    assert len(profiler.frame_samples) == 10
+    assert FrameProfiler.percentile(list(range(1, 101)), 0.95) == 96
+    p50, p95, peak = profiler.summary()["grid"]
+    assert 0 <= p50 <= p95 <= peak
+
+
+def test_f3_overlay_times_every_phase():
+    editor = NodeEditor(headless=True, size=(800, 600))
+    editor._insert_node(Node(300, 200, 1))
+    editor.dispatch_event(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_F3, mod=0))
+    assert editor.profiler.overlay_visible
+    for _ in range(3):
+        editor.profiler.begin_frame()
+        editor.profiler.mark("events")
+        editor.draw([])
+        editor.profiler.end_frame()
+    summary = editor.profiler.summary()
+    assert set(PHASES) | {"frame"} == set(summary)
+    assert len(editor.profiler.samples["nodes"]) == 3
+    # The overlay panel sits in the top right corner
+    assert editor.screen.get_at((800 - 9, 8))[:3] == (90, 90, 90)
+    editor.dispatch_event(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_F3, mod=0))
+    assert not editor.profiler.overlay_visible
+
+
+def test_trace_is_written_as_chrome_trace_json(tmp_path):
+    editor = NodeEditor(headless=True, size=(800, 600))
+    path = str(tmp_path / "trace.json")
+    editor.toggle_trace(path)
+    editor.profiler.begin_frame()
+    editor.draw([])
+    editor.profiler.end_frame()
+    editor.toggle_trace(path)
+    assert not editor.profiler.tracing
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    names = [event["name"] for event in events]
+    assert names[-1] == "frame"
+    assert {"grid", "connections", "nodes", "toolbar"} <= set(names)
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
@@ -0,0 +1,198 @@
+import gc
+import io
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import pickle
+import struct
+import networkx as nx
+import pygame
+import pytest
+from background_job import BackgroundJob
+from editor import NodeEditor
+from graph_format import EDGE_TAG, MAGIC, NodeChunk, gc_paused, iter_chunks, read_graph, write_graph
+import numpy as np
+from graph_persistence import read_legacy_graph, remap_node_ids
+from node import Node
+from node_store import node_store
+
+
+def make_graph():
+    graph = nx.DiGraph()
+    graph.add_node(1, name="Start", pos=(10.5, -20.0))
+    graph.add_node(7, name="Größe ✓", pos=(300.0, 40.25))
+    graph.add_node(3, name="", pos=(0.0, 0.0))
+    graph.add_edge(1, 7, label="next")
+    graph.add_edge(7, 3, label="")
+    return graph
+
+
+def roundtrip(graph, **kwargs):
+    buffer = io.BytesIO()
+    write_graph(graph, buffer, **kwargs)
+    buffer.seek(0)
+    return buffer, read_graph(buffer)
+
+
+def test_roundtrip_keeps_names_positions_and_labels():
+    graph = make_graph()
+    buffer, loaded = roundtrip(graph)
+    assert buffer.getvalue().startswith(MAGIC)
+    assert list(loaded.nodes(data=True)) == list(graph.nodes(data=True))
+    assert list(loaded.edges(data=True)) == list(graph.edges(data=True))
+
+
+def test_large_graphs_are_split_into_chunks():
+    graph = nx.DiGraph()
+    graph.add_nodes_from((i, {"name": f"N{i}", "pos": (i, -i)}) for i in range(10))
+    graph.add_edges_from((i, i + 1, {"label": str(i)}) for i in range(9))
+    buffer, loaded = roundtrip(graph, chunk_size=4)
+    buffer.seek(0)
+    node_chunks = [chunk for chunk in iter_chunks(buffer) if isinstance(chunk, NodeChunk)]
+    assert [len(chunk.ids) for chunk in node_chunks] == [4, 4, 2]
+    assert nx.utils.graphs_equal(loaded, graph)
+
+
+def test_unknown_chunks_are_skipped_and_truncation_detected():
+    buffer, _ = roundtrip(make_graph())
+    data = buffer.getvalue()
+    # Insert a chunk of an unknown kind before the edges
+    edge_start = data.index(EDGE_TAG)
+    extra = struct.pack("<4sIQ", b"XTRA", 1, 3) + b"abc"
+    loaded = read_graph(io.BytesIO(data[:edge_start] + extra + data[edge_start:]))
+    assert loaded.number_of_edges() == 2
+    with pytest.raises(ValueError):
+        read_graph(io.BytesIO(data[:-8]))
+    with pytest.raises(ValueError):
+        read_graph(io.BytesIO(b"XXXX" + data[4:]))
+
+
+def test_legacy_pickles_load_but_other_objects_are_refused():
+    graph = make_graph()
+    graph.nodes, graph.adj, graph.edges  # Cached views end up in the pickle too
+    # Protocols 0 and 1 name modules the Python 2 way (copy_reg, __builtin__)
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        loaded = read_legacy_graph(io.BytesIO(pickle.dumps(graph, protocol=protocol)))
+        assert nx.utils.graphs_equal(loaded, graph)
+    with pytest.raises(pickle.UnpicklingError):
+        read_legacy_graph(io.BytesIO(pickle.dumps(os.system)))
+    with pytest.raises(pickle.UnpicklingError):
+        read_legacy_graph(io.BytesIO(pickle.dumps(os.system, protocol=0)))
+
+
+def test_editor_saves_binary_and_loads_both_formats(tmp_path):
+    pygame.init()
+    editor = NodeEditor(headless=True)
+    editor.graph_persistence.set_graph(make_graph())
+    path = str(tmp_path / "graph.ngraph")
+    editor.save_graph(path)
+    with open(path, "rb") as f:
+        assert f.read(4) == MAGIC
+    editor.load_graph(path)
+    assert [node.node_name for node in editor.nodes] == ["Start", "Größe ✓", ""]
+    assert len(editor.connections) == 2
+    legacy = str(tmp_path / "graph.gpickle")
+    with open(legacy, "wb") as f:
+        pickle.dump(make_graph(), f)
+    editor.load_graph(legacy)
+    assert len(editor.nodes) == 3
+
+
+def test_unusable_ids_are_remapped_after_the_highest_id():
+    graph = nx.DiGraph()
+    for node_id in (4, "x", 2.5, np.int64(9), 0, True, 2):
+        graph.add_node(node_id)
+    assert remap_node_ids(graph) == {"x": 10, 2.5: 11, np.int64(9): 9, 0: 12, True: 13}
+    assert type(remap_node_ids(graph)[np.int64(9)]) is int
+    assert remap_node_ids(make_graph()) == {}
+
+
+def test_loading_remaps_ids_and_keeps_edges(tmp_path):
+    pygame.init()
+    graph = nx.DiGraph()
+    graph.add_node(3, name="three", pos=(1, 2))
+    graph.add_node("a", name="a", pos=(3, 4))
+    graph.add_node(0.5, name="half", pos=(5, 6))
+    graph.add_edge("a", 3, label="to three")
+    graph.add_edge(3, 0.5, label="to half")
+    graph.add_edge(0.5, "a", label="")
+    path = str(tmp_path / "graph.gpickle")
+    with open(path, "wb") as f:
+        pickle.dump(graph, f)
+    editor = NodeEditor(headless=True)
+    editor.load_graph(path)
+    assert [(node.id, node.node_name, (node.x, node.y)) for node in editor.nodes] == [
+        (3, "three", (1, 2)), (4, "a", (3, 4)), (5, "half", (5, 6))]
+    assert sorted(editor.nx_graph.edges(data="label")) == [(3, 5, "to half"), (4, 3, "to three"), (5, 4, "")]
+    assert sorted((c.start_node.id, c.end_node.id, c.label) for c in editor.connections) == [
+        (3, 5, "to half"), (4, 3, "to three"), (5, 4, "")]
+    assert editor.next_node_id == 6
+
+
+def test_background_save_and_load_swap_in_on_poll(tmp_path):
+    pygame.init()
+    editor = NodeEditor(headless=True)
+    editor.graph_persistence.set_graph(make_graph())
+    path = str(tmp_path / "graph.ngraph")
+    persistence = editor.graph_persistence
+    persistence.save_graph_async(path)
+    assert persistence.busy()
+    # Edits after the snapshot do not end up in the file
+    editor._insert_node(Node(0, 0, 99))
+    persistence.job.wait(5)
+    assert persistence.poll()
+    assert not persistence.busy()
+
+    rows = len(node_store.ids)
+    persistence.load_graph_async(path)
+    job = persistence.job
+    job.wait(5)
+    assert job.progress == 1.0
+    # The worker only builds columns, store rows are allocated on the main thread
+    assert len(node_store.ids) == rows
+    # The scene is only replaced on the main thread, when polled
+    assert 99 in [node.id for node in editor.nodes]
+    editor.draw([])
+    assert editor.screen.get_at(editor.renderer.progress_rect().topleft)[:3] == (128, 128, 128)
+    editor.poll_background_io()
+    assert [node.node_name for node in editor.nodes] == ["Start", "Größe ✓", ""]
+    assert 99 not in editor.nx_graph
+    assert len(editor.connections) == 2
+
+
+def test_failed_background_load_keeps_the_scene(tmp_path):
+    pygame.init()
+    editor = NodeEditor(headless=True)
+    editor.graph_persistence.set_graph(make_graph())
+    path = tmp_path / "broken.ngraph"
+    path.write_bytes(MAGIC + b"\x01\x00")
+    editor.graph_persistence.load_graph_async(str(path))
+    editor.graph_persistence.job.wait(5)
+    assert editor.graph_persistence.poll()
+    assert editor.nx_graph.number_of_nodes() == 3
+
+
+def test_any_failed_background_job_is_reported(capsys):
+    pygame.init()
+    editor = NodeEditor(headless=True)
+    persistence = editor.graph_persistence
+
+    def work(job):
+        raise BufferError("cannot resize")
+    persistence.job = BackgroundJob("Loading", work)
+    persistence.job.wait(5)
+    assert persistence.poll()
+    assert not persistence.busy()
+    assert "Loading failed" in capsys.readouterr().out
+
+
+def test_overlapping_gc_pauses_keep_gc_off_until_the_last_ends():
+    assert gc.isenabled()
+    first = gc_paused()
+    second = gc_paused()
+    first.__enter__()
+    second.__enter__()
+    # A save ending while a load still runs
+    first.__exit__(None, None, None)
+    assert not gc.isenabled()
+    second.__exit__(None, None, None)
+    assert gc.isenabled()
@@ -0,0 +1,56 @@
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import pygame
+from connection import Connection
+from editor import NodeEditor
+from graph_model import GraphModel, tables_from_columns
+from node import Node
+from undo import AddConnectionCommand, AddNodeCommand, RenameNodeCommand
+
+
+def test_networkx_view_is_built_from_the_scene():
+    model = GraphModel()
+    a = Node(1, 2, 1)
+    b = Node(3, 4, 2)
+    b.node_name = "second"
+    model.nodes.extend([a, b])
+    model.connections.append(Connection(a, b, label="ab"))
+    graph = model.to_networkx()
+    assert dict(graph.nodes(data=True)) == {1: {"name": "A", "pos": (1, 2)}, 2: {"name": "second", "pos": (3, 4)}}
+    assert list(graph.edges(data="label")) == [(1, 2, "ab")]
+    assert model.tables() == ([(1, "A", (1, 2)), (2, "second", (3, 4))], [(1, 2, "ab")])
+    # The view is a copy; changing it leaves the scene alone
+    graph.remove_node(1)
+    assert len(model.nodes) == 2
+
+
+def test_edits_and_drags_change_the_scene_only_once():
+    pygame.init()
+    editor = NodeEditor(headless=True)
+    a = Node(0, 0, 1)
+    b = Node(200, 0, 2)
+    editor.apply_command(AddNodeCommand(a))
+    editor.apply_command(AddNodeCommand(b))
+    editor.apply_command(AddConnectionCommand(Connection(a, b)))
+    editor.apply_command(RenameNodeCommand(b, b.node_name, "B2"))
+    editor._handle_left_mouse_down(a, a.x + 5, a.y + 5)
+    editor.handle_mouse_motion(pygame.event.Event(pygame.MOUSEMOTION, pos=(55, 65)))
+    # Positions written by the drag are in the view without any sync pass
+    assert editor.nx_graph.nodes[1]["pos"] == (a.x, a.y) == (50, 60)
+    assert editor.nx_graph.nodes[2]["name"] == "B2"
+    assert editor.nx_graph.has_edge(1, 2)
+    editor.undo()
+    assert editor.nx_graph.nodes[2]["name"] == "B"
+
+
+def test_columns_snapshot_is_not_changed_by_later_edits():
+    model = GraphModel()
+    a = Node(1, 2, 1)
+    b = Node(3, 4, 2)
+    model.nodes.extend([a, b])
+    model.connections.append(Connection(a, b, label="ab"))
+    columns = model.columns()
+    a.x = 100
+    a.node_name = "renamed"
+    model.connections.all()[0].label = "changed"
+    assert tables_from_columns(columns) == ([(1, "A", (1, 2)), (2, "B", (3, 4))], [(1, 2, "ab")])
@@ -0,0 +1,117 @@
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import pygame
+import pytest
+from actions import DeleteAllAction
+from background_job import BackgroundJob
+from connection import Connection
+from editor import NodeEditor
+from journal import EditJournal
+from node import Node
+from undo import AddConnectionCommand, AddNodeCommand, RenameNodeCommand
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pygame_init():
+    pygame.init()
+    yield
+
+
+def journaled_editor(directory, compact_every=1000):
+    editor = NodeEditor(headless=True)
+    EditJournal(str(directory), compact_every=compact_every).start(editor)
+    return editor
+
+
+def finish_checkpoints(editor):
+    while editor.journal.job is not None:
+        editor.journal.job.wait()
+        editor.poll_background_io()
+
+
+def state(graph):
+    return (sorted((node_id, data["name"], tuple(data["pos"])) for node_id, data in graph.nodes(data=True)),
+            sorted(graph.edges(data="label")))
+
+
+def edit(editor):
+    a = Node(10, 20, editor.next_node_id)
+    editor.apply_command(AddNodeCommand(a))
+    b = Node(300, 40, editor.next_node_id)
+    editor.apply_command(AddNodeCommand(b))
+    editor.apply_command(AddConnectionCommand(Connection(a, b, label="ab")))
+    editor.apply_command(RenameNodeCommand(b, b.node_name, "second"))
+    editor.undo()
+    editor.redo()
+    # A drag only records its end
+    editor._handle_left_mouse_down(a, a.x, a.y)
+    a.x, a.y = 55, 66
+    editor.handle_mouse_up(pygame.event.Event(pygame.MOUSEBUTTONUP, button=pygame.BUTTON_LEFT, pos=(0, 0)))
+
+
+def test_edits_are_recovered_after_a_crash(tmp_path):
+    editor = journaled_editor(tmp_path)
+    edit(editor)
+    expected = state(editor.nx_graph)
+    # No close, no save: a crashed editor only leaves the journal behind
+    recovered = journaled_editor(tmp_path)
+    assert state(recovered.nx_graph) == expected
+    assert [c.label for c in recovered.connections] == ["ab"]
+    assert recovered.next_node_id == editor.next_node_id
+
+
+def test_compaction_replaces_old_generations(tmp_path):
+    editor = journaled_editor(tmp_path, compact_every=3)
+    for _ in range(4):
+        edit(editor)
+        editor.poll_background_io()
+        finish_checkpoints(editor)
+    files = sorted(os.listdir(tmp_path))
+    generation = editor.journal.generation
+    assert files == [f"checkpoint-{generation}.ngraph", f"journal-{generation}.jsonl"]
+    expected = state(editor.nx_graph)
+    edit(editor)  # Only in the journal
+    expected_after = state(editor.nx_graph)
+    assert expected_after != expected
+    assert state(journaled_editor(tmp_path).nx_graph) == expected_after
+
+
+def test_reset_segment_without_its_checkpoint_is_not_replayed(tmp_path):
+    editor = journaled_editor(tmp_path)
+    edit(editor)
+    finish_checkpoints(editor)
+    before_clear = state(editor.nx_graph)
+    # Clear all starts a new generation; pretend its checkpoint never made it to disk
+    DeleteAllAction().execute(editor)
+    editor.journal.job.wait()
+    editor.journal.job = None
+    os.remove(editor.journal.checkpoint_path(editor.journal.generation))
+    editor.apply_command(AddNodeCommand(Node(0, 0, 1)))
+    assert state(journaled_editor(tmp_path).nx_graph) == before_clear
+
+
+def test_cut_off_last_line_is_ignored(tmp_path):
+    editor = journaled_editor(tmp_path)
+    edit(editor)
+    expected = state(editor.nx_graph)
+    with open(editor.journal.segment_path(editor.journal.generation), "a") as f:
+        f.write('["move",1,')
+    assert state(journaled_editor(tmp_path).nx_graph) == expected
+
+
+def test_failed_checkpoint_is_reported_and_the_queued_one_still_runs(tmp_path, capsys):
+    editor = journaled_editor(tmp_path)
+    finish_checkpoints(editor)
+    journal = editor.journal
+
+    def work(job):
+        raise KeyError("row")
+    journal.job = BackgroundJob("Checkpoint broken", work)
+    journal.job.wait()
+    edit(editor)
+    journal.compact(editor)  # Queued behind the failed job
+    generation = journal.generation
+    editor.poll_background_io()
+    assert "Checkpoint broken failed" in capsys.readouterr().out
+    finish_checkpoints(editor)
+    assert os.path.exists(journal.checkpoint_path(generation))
@@ -0,0 +1,169 @@
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import networkx as nx
+import pygame
+import pytest
+import graph_persistence
+from actions import DeleteAllAction
+from connection import Connection
+from editor import NodeEditor
+from graph_format import read_graph, write_graph
+from lazy_graph import LazyGraphLoader, MappedGraph
+from undo import AddConnectionCommand, RelabelConnectionCommand, RemoveNodeCommand
+
+SIDE = 60
+SPACING = 400
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pygame_init():
+    pygame.init()
+    yield
+
+
+@pytest.fixture
+def graph_file(tmp_path):
+    # SIDE x SIDE nodes, each connected to its right neighbour
+    graph = nx.DiGraph()
+    for i in range(SIDE * SIDE):
+        row, column = divmod(i, SIDE)
+        graph.add_node(i + 1, name=f"N{i + 1}", pos=(column * SPACING, row * SPACING))
+    for i in range(SIDE * SIDE):
+        if i % SIDE != SIDE - 1:
+            graph.add_edge(i + 1, i + 2, label=f"e{i + 1}")
+    path = str(tmp_path / "big.ngraph")
+    with open(path, "wb") as f:
+        write_graph(graph, f)
+    return path
+
+
+@pytest.fixture
+def editor():
+    editor = NodeEditor(headless=True, size=(1200, 800))
+    editor.zoom = 1.0
+    editor.panning_state.offset_x = 0
+    editor.panning_state.offset_y = 0
+    return editor
+
+
+def test_mapped_graph_reads_single_rows(graph_file):
+    mapped = MappedGraph(graph_file)
+    # Index views must be aligned, or every lookup copies the whole array
+    assert mapped._sorted_ids.flags.aligned and mapped._adjacency_offsets.flags.aligned
+    assert (mapped.node_count, mapped.edge_count, mapped.max_id) == (SIDE * SIDE, SIDE * (SIDE - 1), SIDE * SIDE)
+    row = mapped.row_of_id(62)
+    assert mapped.node_row(row) == (62, SPACING, SPACING, "N62")
+    assert mapped.row_of_id(10**9) is None
+    edges = [mapped.edge_row(edge) for edge in mapped.edge_rows_of(row)]
+    assert sorted(edges) == [(61, 62, "e61"), (62, 63, "e62")]
+    assert set(mapped.tile_rows(mapped.tile_of(0, 0))) == {
+        mapped.row_of_id(r * SIDE + c + 1) for r in range(6) for c in range(6)}
+    mapped.close()
+
+
+def test_only_nodes_around_the_viewport_are_loaded(editor, graph_file):
+    editor.graph_persistence.open_graph_lazy(graph_file)
+    loader = editor.graph_persistence.lazy_loader
+    count = len(editor.nodes)
+    assert 0 < count < SIDE * SIDE / 4
+    assert len(editor.nodes) == editor.nx_graph.number_of_nodes()
+    # Connections between loaded neighbours come along
+    assert len(editor.connections) > 0
+    assert all(c.start_node in editor.nodes and c.end_node in editor.nodes for c in editor.connections)
+    assert editor.next_node_id == SIDE * SIDE + 1
+
+    # Move one node; edited nodes stay when their tile is evicted
+    moved = next(node for node in editor.nodes if node.id == 1)
+    editor._set_node_position(moved, 50, 60)
+    editor.panning_state.offset_x = 18000
+    editor.panning_state.offset_y = 18000
+    editor.poll_background_io()
+    ids = {node.id for node in editor.nodes}
+    assert 1 in ids
+    assert 2 not in ids
+    assert any(node.x >= 18000 and node.y >= 18000 for node in editor.nodes)
+    assert len(loader.nodes) + 1 <= loader.max_nodes
+
+
+def test_node_budget_is_respected(editor, graph_file):
+    editor.zoom = 0.1
+    loader = LazyGraphLoader(editor, MappedGraph(graph_file), max_nodes=100)
+    loader.update()
+    assert 0 < len(editor.nodes) <= 100
+    loader.close()
+
+
+def test_saving_merges_edits_with_unloaded_rows(editor, graph_file, tmp_path):
+    editor.graph_persistence.open_graph_lazy(graph_file)
+    nodes = {node.id: node for node in editor.nodes}
+    editor.apply_command(RemoveNodeCommand(nodes[2], [c for c in editor.connections
+                                                      if nodes[2] in (c.start_node, c.end_node)],
+                                           editor.nodes.index(nodes[2])))
+    conn = next(c for c in editor.connections if c.start_node is nodes[3])
+    editor.apply_command(RelabelConnectionCommand(conn, conn.label, "renamed"))
+    editor._set_node_position(nodes[5], -10, -20)
+    path = str(tmp_path / "merged.ngraph")
+    editor.save_graph(path)
+    with open(path, "rb") as f:
+        merged = read_graph(f)
+    assert merged.number_of_nodes() == SIDE * SIDE - 1
+    assert 2 not in merged
+    assert merged.number_of_edges() == SIDE * (SIDE - 1) - 2
+    assert merged[3][4]["label"] == "renamed"
+    assert merged.nodes[5]["pos"] == (-10, -20)
+    # Rows that were never loaded are copied as they are
+    assert merged.nodes[SIDE * SIDE]["name"] == f"N{SIDE * SIDE}"
+
+    # Saving over the mapped file keeps working
+    editor.save_graph(graph_file)
+    with open(graph_file, "rb") as f:
+        assert read_graph(f).number_of_nodes() == SIDE * SIDE - 1
+
+
+def test_large_files_open_lazily(editor, graph_file, monkeypatch):
+    monkeypatch.setattr(graph_persistence, "LAZY_LOAD_MIN_NODES", 1000)
+    editor.graph_persistence.load_graph_async(graph_file)
+    assert not editor.graph_persistence.busy()
+    assert editor.graph_persistence.lazy_loader is not None
+    assert len(editor.nodes) < SIDE * SIDE
+    # A full load replaces the lazy scene
+    editor.load_graph(graph_file)
+    assert editor.graph_persistence.lazy_loader is None
+    assert len(editor.nodes) == SIDE * SIDE
+
+
+def test_closing_waits_for_jobs_reading_the_mapping(editor, graph_file, tmp_path):
+    persistence = editor.graph_persistence
+    persistence.open_graph_lazy(graph_file)
+    mapped = persistence.lazy_loader.mapped
+    tables = persistence.tables_source()
+    # Clear All while a save or checkpoint job still has to read the file
+    DeleteAllAction().execute(editor)
+    assert persistence.lazy_loader is None and not mapped.closed.is_set()
+    nodes, edges = tables()
+    assert len(nodes) == SIDE * SIDE
+    assert mapped.closed.is_set()
+    # A source that is dropped unused lets the mapping close as well
+    persistence.open_graph_lazy(graph_file)
+    mapped = persistence.lazy_loader.mapped
+    persistence.tables_source().discard()
+    persistence.close_lazy()
+    assert mapped.closed.is_set()
+
+
+def test_nodes_of_undo_history_are_not_evicted(editor, graph_file):
+    editor.graph_persistence.open_graph_lazy(graph_file)
+    nodes = {node.id: node for node in editor.nodes}
+    editor.apply_command(AddConnectionCommand(Connection(nodes[1], nodes[3])))
+    editor.undo()
+    editor.panning_state.offset_x = 18000
+    editor.panning_state.offset_y = 18000
+    editor.poll_background_io()
+    assert 2 not in {node.id for node in editor.nodes}
+    editor.redo()
+    assert all(c.start_node in editor.nodes and c.end_node in editor.nodes for c in editor.connections)
+    # Back at the start the kept nodes are not loaded a second time
+    editor.panning_state.offset_x = 0
+    editor.panning_state.offset_y = 0
+    editor.poll_background_io()
+    assert [node for node in editor.nodes if node.id == 3] == [nodes[3]]
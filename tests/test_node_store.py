@@ -0,0 +1,42 @@
+import gc
+from node import Node
+from node_store import SELECTED, node_store
+
+
+def test_node_views_keep_the_node_api():
+    node = Node(10, 20, 28)
+    assert (node.id, node.x, node.y, node.node_name) == (28, 10, 20, "AB")
+    node.x, node.y = 1.5, -2.5
+    node.node_name = "renamed"
+    node.drag_offset = (3, 4)
+    node.selected = True
+    node.dragging = True
+    node.dragging = False
+    assert (node.x, node.y, node.node_name, node.drag_offset) == (1.5, -2.5, "renamed", (3, 4))
+    assert node.selected and not node.dragging
+    assert node.get_output_pos() == (1.5 + node.width, -2.5 + node.height // 2)
+    assert node.contains_point(2, 0) and not node.contains_point(0, 0)
+    assert not hasattr(node, "__dict__")
+
+
+def test_rows_of_collected_nodes_are_reused():
+    node = Node(0, 0, 1)
+    node.selected = True
+    node.node_name = "old"
+    del node
+    gc.collect()
+    rows = len(node_store.ids)
+    fresh = Node(5, 6, 2)
+    assert len(node_store.ids) == rows
+    assert (fresh.x, fresh.node_name, fresh.selected) == (5, "B", False)
+
+
+def test_gather_copies_columns_of_rows():
+    nodes = [Node(i, 2 * i, i + 1) for i in range(5)]
+    nodes[3].selected = True
+    xs, ys, flags = node_store.gather(node_store.rows_of(nodes), "xs", "ys", "flags")
+    assert xs.tolist() == [0, 1, 2, 3, 4]
+    assert ys.tolist() == [0, 2, 4, 6, 8]
+    assert (flags & SELECTED).astype(bool).tolist() == [False, False, False, True, False]
+    # No view of the columns is kept, so nodes can still be created
+    Node(0, 0, 99)
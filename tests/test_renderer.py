@@ -0,0 +1,244 @@
+import os
+import pytest
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import pygame
+from connection import Connection
+from constants import DAMAGE_NODE_LIMIT
+from editor import NodeEditor
+from node import Node
+from renderer import GridRenderer, draw_connection_batch, segment_intersects_rect
+
+
+@pytest.fixture(scope="session", autouse=True)
+def pygame_init():
+    pygame.init()
+    yield
+    pygame.quit()
+
+
+@pytest.fixture
+def editor():
+    editor = NodeEditor()
+    editor.zoom = 1.0
+    editor.panning_state.offset_x = 0
+    editor.panning_state.offset_y = 0
+    return editor
+
+
+def test_segment_intersects_rect():
+    rect = (0, 0, 100, 100)
+    assert segment_intersects_rect(-50, 50, 150, 50, rect)
+    assert segment_intersects_rect(10, 10, 20, 20, rect)
+    assert not segment_intersects_rect(-50, -10, 150, -10, rect)
+    assert not segment_intersects_rect(150, 0, 250, 100, rect)
+    assert not segment_intersects_rect(-100, 50, 50, -100, rect)
+
+
+def test_offscreen_nodes_and_connections_are_culled(editor):
+    visible = Node(400, 300, 1)
+    far_left = Node(-5000, 300, 2)
+    far_right = Node(9000, 300, 3)
+    for node in (visible, far_left, far_right):
+        editor._insert_node(node)
+    # Crosses the whole viewport although both ends are offscreen
+    editor._insert_connection(Connection(far_left, far_right))
+    # Entirely left of the viewport
+    editor._insert_connection(Connection(far_left, Node(-4000, -4000, 4)))
+    editor.renderer.draw_connections()
+    editor.renderer.draw_nodes()
+    assert editor.renderer.drawn_nodes == 1
+    assert editor.renderer.culled_nodes == 2
+    assert editor.renderer.drawn_connections == 1
+    assert editor.renderer.culled_connections == 1
+
+
+def test_culling_follows_panning_and_zoom(editor):
+    node = Node(3000, 3000, 1)
+    editor._insert_node(node)
+    editor.renderer.draw_nodes()
+    assert editor.renderer.drawn_nodes == 0
+    editor.zoom = 0.1
+    editor.renderer.draw_nodes()
+    assert editor.renderer.drawn_nodes == 1
+    editor.zoom = 1.0
+    editor.panning_state.offset_x = 2800
+    editor.panning_state.offset_y = 2800
+    editor.renderer.draw_nodes()
+    assert editor.renderer.visible_nodes() == [node]
+
+
+def test_node_move_damages_only_its_region(editor):
+    node = Node(400, 300, 1)
+    editor._insert_node(node)
+    editor.draw([])  # First frame repaints everything
+    assert editor.damage.is_clean()
+
+    editor._set_node_position(node, 500, 300)
+    regions = editor.damage.take(editor.screen.get_rect())
+    assert len(regions) == 1
+    region = regions[0]
+    assert region.contains(node.screen_rect())
+    assert region.collidepoint(401, 301)
+    assert region.width < editor.screen.get_width() // 2
+
+
+def test_distant_damage_is_repainted_as_separate_regions(editor):
+    editor.draw([])
+    top_right = pygame.Rect(1000, 10, 40, 20)
+    bottom_left = pygame.Rect(10, 700, 200, 30)
+    editor.damage.add(top_right)
+    editor.damage.add(bottom_left)
+    editor.damage.add(pygame.Rect(1045, 15, 10, 10))  # Close to the first one
+    regions = editor.damage.take(editor.screen.get_rect())
+    assert sorted(map(tuple, regions)) == [(10, 700, 200, 30), (1000, 10, 55, 20)]
+
+
+def test_large_selection_change_damages_whole_screen(editor):
+    nodes = [Node(200 + 8 * i, 300, i) for i in range(DAMAGE_NODE_LIMIT + 1)]
+    for node in nodes:
+        editor._insert_node(node)
+    editor.selection.select_nodes(nodes, False)
+    editor.draw([])
+    editor._damage_selection()
+    assert editor.damage.take(editor.screen.get_rect()) is None
+
+
+def test_pan_and_zoom_damage_whole_screen(editor):
+    editor.draw([])
+    editor.dispatch_event(pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=1))
+    assert editor.damage.take(editor.screen.get_rect()) is None
+
+
+def test_clipped_frame_culls_to_damaged_region(editor):
+    inside = Node(400, 300, 1)
+    outside = Node(900, 600, 2)
+    editor._insert_node(inside)
+    editor._insert_node(outside)
+    editor.renderer.draw([], clips=[inside.screen_rect()])
+    assert editor.renderer.drawn_nodes == 1
+
+
+
+def test_grid_surface_is_reused_until_zoom_changes(editor):
+    grid_renderer = GridRenderer()
+    grid_renderer.draw(editor.screen, editor.panning_state, 1.0)
+    surface = next(iter(grid_renderer._surfaces.values()))
+    editor.panning_state.offset_x = 137.5
+    grid_renderer.draw(editor.screen, editor.panning_state, 1.0)
+    assert len(grid_renderer._surfaces) == 1
+    assert next(iter(grid_renderer._surfaces.values())) is surface
+    grid_renderer.draw(editor.screen, editor.panning_state, 1.1)
+    assert len(grid_renderer._surfaces) == 2
+
+
+def test_label_surfaces_are_shared_between_connections(editor):
+    from font_cache import TextSurfaceCache, label_cache
+    n1 = Node(200, 200, 1)
+    n2 = Node(500, 200, 2)
+    n3 = Node(500, 500, 3)
+    label_cache.clear()
+    misses = label_cache.misses
+    for _ in range(3):
+        Connection(n1, n2, label="shared").draw(editor.screen)
+        Connection(n1, n3, label="shared").draw(editor.screen)
+    assert label_cache.misses == misses + 1
+
+    small_cache = TextSurfaceCache(max_entries=2)
+    for text in ("a", "b", "c"):
+        small_cache.get(text, 18, (255, 255, 255))
+    assert len(small_cache) == 2
+    small_cache.get("b", 18, (255, 255, 255))
+    assert small_cache.misses == 3
+
+
+def test_node_surfaces_are_shared_and_zoom_bucketed(editor):
+    from node_surface_cache import NodeSurfaceCache, node_surface_cache, quantize_zoom
+    first = Node(100, 100, 1)
+    second = Node(300, 100, 2)
+    second.node_name = first.node_name
+    first.draw(editor.screen, zoom=1.0)
+    misses = node_surface_cache.misses
+    second.draw(editor.screen, zoom=1.0)
+    assert second._cache_surface is first._cache_surface
+    # Zoom levels within one bucket reuse the surface
+    assert quantize_zoom(1.001) == quantize_zoom(1.0)
+    first.draw(editor.screen, zoom=1.1)
+    first.draw(editor.screen, zoom=1.1 / 1.1 * 1.0000001)
+    assert first._cache_surface is second._cache_surface
+    assert node_surface_cache.misses == misses + 1
+
+    small_cache = NodeSurfaceCache(budget_bytes=100 * 100 * 4)
+    for size in (60, 70, 80):
+        small_cache.get(size, lambda: pygame.Surface((size, size), pygame.SRCALPHA))
+    assert len(small_cache) == 1
+    assert small_cache.used_bytes <= 100 * 100 * 4
+
+
+def test_zoomed_out_nodes_use_simplified_drawing(editor):
+    from renderer import LOD_FULL, LOD_MINIMAL, LOD_SIMPLE
+    node = Node(2000, 2000, 1)
+    other = Node(2400, 2000, 2)
+    editor._insert_node(node)
+    editor._insert_node(other)
+    editor._insert_connection(Connection(node, other, label="hidden"))
+    assert editor.renderer.level_of_detail() == LOD_FULL
+    editor.zoom = 0.3
+    assert editor.renderer.level_of_detail() == LOD_SIMPLE
+    editor.zoom = 0.15
+    assert editor.renderer.level_of_detail() == LOD_MINIMAL
+    editor.renderer.draw_connections()
+    editor.renderer.draw_nodes()
+    assert editor.renderer.drawn_nodes == 2
+    # No text or surface was rendered for the node
+    assert node._cache_surface is None
+    assert editor.screen.get_at((int(2040 * 0.15), int(2040 * 0.15)))[:3] == (128, 128, 128)
+
+
+def test_batched_lines_match_per_connection_drawing():
+    nodes = [Node(100 + 130 * i, 50 + 70 * (i % 5), i) for i in range(8)]
+    connections = [Connection(nodes[i], nodes[i + 1]) for i in range(7)]
+    connections[3].marked = True
+    for zoom in (0.37, 1.0, 1.6):
+        expected = pygame.Surface((1200, 800))
+        batched = pygame.Surface((1200, 800))
+        for conn in connections:
+            conn.draw(expected, 12.5, -7.25, zoom=zoom)
+        draw_connection_batch(batched, connections, 12.5, -7.25, zoom, max(1, int(2 * zoom)))
+        assert pygame.image.tobytes(expected, "RGB") == pygame.image.tobytes(batched, "RGB")
+
+
+def test_offscreen_indicators_are_counted_per_border_bucket_and_cached(editor):
+    indicators = editor.renderer.offscreen_indicators
+    left = Node(-5000, 400, 1)
+    for i in range(10):
+        editor._insert_node(Node(9000, 390 + i, 10 + i))
+    editor._insert_node(left)
+    editor._insert_node(Node(400, 300, 2))  # On screen, no marker
+    editor.renderer.draw_offscreen_indicators()
+    markers = indicators.markers
+    assert sorted(count for rect, count in markers) == [1, 10]
+    right_rect = next(rect for rect, count in markers if count == 10)
+    assert right_rect.right == editor.screen.get_width()
+    # Nothing changed: the markers are reused
+    editor.renderer.draw_offscreen_indicators()
+    assert indicators.markers is markers
+    editor._set_node_position(left, 400, 400)
+    editor.renderer.draw_offscreen_indicators()
+    assert [count for rect, count in indicators.markers] == [10]
+    # Panning to the right group leaves the other two nodes off the left edge
+    editor.panning_state.offset_x = 8800
+    editor.renderer.draw_offscreen_indicators()
+    assert [(rect.left, count) for rect, count in indicators.markers] == [(editor.toolbar.width, 2)]
+
+
+def test_offscreen_indicator_edge_follows_the_viewport_diagonals(editor):
+    screen_w, screen_h = editor.screen.get_size()
+    left = editor.toolbar.width
+    center_x = left + (screen_w - left) // 2
+    # Above the top edge but beyond the viewport diagonal, so the line from the centre leaves through the right edge
+    dy = screen_h
+    dx = dy * ((screen_w - left) / screen_h + screen_w / screen_h) / 2
+    editor._insert_node(Node(center_x + dx, screen_h // 2 - dy, 1))
+    editor.renderer.draw_offscreen_indicators()
+    [(rect, count)] = editor.renderer.offscreen_indicators.markers
+    assert rect.right == screen_w and rect.top > 0
@@ -0,0 +1,78 @@
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import pygame
+import pytest
+from conftest import lmb_down, lmb_up, mouse_move
+from editor import NodeEditor
+from node import Node
+from replay import EventRecorder, load_recording, replay
+
+
+@pytest.fixture(scope="module", autouse=True)
+def pygame_init():
+    pygame.init()
+    yield
+
+
+def make_editor():
+    editor = NodeEditor(headless=True, size=(640, 480))
+    editor._insert_node(Node(300, 200, 1))
+    return editor
+
+
+def test_headless_editor_renders_off_screen():
+    editor = make_editor()
+    assert editor.screen is not pygame.display.get_surface()
+    assert editor.screen.get_size() == (640, 480)
+    editor.draw([])
+    # The node body was painted into the off-screen surface
+    assert editor.screen.get_at((340, 210))[:3] != (0, 0, 0)
+    editor.dispatch_event(pygame.event.Event(pygame.VIDEORESIZE, size=(800, 600)))
+    assert editor.screen.get_size() == (800, 600)
+
+
+def test_recorded_drag_replays_to_the_same_scene(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    editor = make_editor()
+    recorder = EventRecorder(path, editor)
+    recorder.record_frame([lmb_down((310, 210))])
+    recorder.record_frame([mouse_move((310, 210), (360, 250), (1, 0, 0))])
+    recorder.record_frame([])
+    recorder.record_frame([lmb_up((360, 250)), pygame.event.Event(pygame.QUIT)])
+    recorder.record_frame([mouse_move((360, 250), (400, 300))])
+    recorder.close()
+
+    header, frames = load_recording(path)
+    assert header["size"] == [640, 480]
+    assert len(frames) == 5
+    # The starting graph was saved next to the recording
+    target = NodeEditor(headless=True, size=tuple(header["size"]))
+    target.load_graph(os.path.join(tmp_path, header["graph"]))
+    timings = replay(target, frames)
+    node = target.nodes[0]
+    assert (node.x, node.y) == (350, 240)
+    assert target.undo_stack.is_not_empty()
+    report = timings.report()
+    # Replay stops at QUIT: three full frames, the fourth was cut short
+    assert report["frames"]["count"] == 3
+    assert report["events"]["MouseButtonDown"]["count"] == 1
+    assert report["events"]["MouseButtonUp"]["count"] == 1
+
+
+def test_motion_events_are_coalesced_per_frame():
+    editor = make_editor()
+    moves = [mouse_move((310 + 5 * i, 210), (315 + 5 * i, 210), (1, 0, 0)) for i in range(10)]
+    events = [lmb_down((310, 210))] + moves[:4] + [lmb_up((330, 210))] + moves[4:]
+    coalesced = editor.coalesce_motion(events)
+    assert [event.type for event in coalesced] == [
+        pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION]
+    assert (coalesced[1].pos, coalesced[1].rel, coalesced[1].buttons) == ((330, 210), (20, 0), (1, 0, 0))
+    assert (coalesced[3].pos, coalesced[3].rel) == ((360, 210), (30, 0))
+    assert editor.coalesced_motion_events == 8
+
+    target = make_editor()
+    timings = replay(target, [[lmb_down((310, 210))] + moves, [lmb_up((360, 210))]], draw=False)
+    assert target.nodes[0].x == 350
+    report = timings.report()
+    assert report["events"]["MouseMotion"]["count"] == 1
+    assert report["coalesced_motion_events"] == 9
@@ -0,0 +1,97 @@
+import os
+import pytest
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+import pygame
+from conftest import lmb_down, lmb_up, mouse_move
+from connection import Connection
+from editor import NodeEditor
+from node import Node
+from spatial_index import SpatialIndex
+
+
+@pytest.fixture(scope="session", autouse=True)
+def pygame_init():
+    pygame.init()
+    yield
+    pygame.quit()
+
+
+@pytest.fixture
+def editor():
+    editor = NodeEditor()
+    editor.zoom = 1.0
+    editor.panning_state.offset_x = 0
+    editor.panning_state.offset_y = 0
+    return editor
+
+
+def test_segment_cells_are_connected():
+    index = SpatialIndex(cell_size=10)
+    cells = index._segment_cells(5, 5, 95, 42)
+    assert cells[0] == (0, 0)
+    assert cells[-1] == (9, 4)
+    for (ax, ay), (bx, by) in zip(cells, cells[1:]):
+        assert abs(ax - bx) + abs(ay - by) == 1
+
+
+def test_find_node_prefers_topmost(editor):
+    bottom = Node(0, 0, 1)
+    top = Node(40, 40, 2)
+    editor.nodes.extend([bottom, top])
+    assert editor._find_node_at(60, 60) is top
+    editor.nodes.bring_to_front(bottom)
+    assert editor._find_node_at(60, 60) is bottom
+    assert editor._find_node_at(500, 500) is None
+
+
+def test_dragged_node_is_found_at_new_position(editor):
+    node = Node(300, 300, 1)
+    editor._insert_node(node)
+    editor.dispatch_event(lmb_down((340, 340)))
+    editor.dispatch_event(mouse_move((340, 340), (1340, 940), buttons=(1, 0, 0)))
+    editor.dispatch_event(lmb_up((1340, 940)))
+    assert editor._find_node_at(340, 340) is None
+    assert editor._find_node_at(1340, 940) is node
+
+
+def test_connection_follows_moved_node(editor):
+    n1 = Node(0, 0, 1)
+    n2 = Node(1000, 0, 2)
+    editor._insert_node(n1)
+    editor._insert_node(n2)
+    conn = Connection(n1, n2)
+    editor._insert_connection(conn)
+    assert editor._find_connection_at(500, 40) is conn
+    editor._set_node_position(n2, 1000, 1000)
+    assert editor._find_connection_at(500, 40) is None
+    assert editor._find_connection_at(540, 540) is conn
+
+
+def test_connection_hit_keeps_list_order(editor):
+    n1 = Node(0, 0, 1)
+    n2 = Node(1000, 0, 2)
+    n3 = Node(-1000, 0, 3)
+    for node in (n1, n2, n3):
+        editor._insert_node(node)
+    first = Connection(n1, n2)
+    second = Connection(n3, n2)
+    editor._insert_connection(first)
+    editor._insert_connection(second)
+    assert editor._find_connection_at(500, 40) is first
+
+
+def test_floating_nodes_are_found_everywhere_until_landed():
+    index = SpatialIndex(cell_size=100)
+    a = Node(0, 0, 1)
+    b = Node(1000, 0, 2)
+    index.insert_node(a)
+    index.insert_node(b)
+    conn = Connection(a, b)
+    index.insert_connection(conn)
+    index.float_nodes([b])
+    b.x, b.y = 5000, 5000
+    assert b in index.nodes_at(5010, 5010)
+    assert conn in index.connections_in_rect(4000, 4000, 4100, 4100)
+    index.land_nodes()
+    assert b in index.nodes_at(5010, 5010) and b not in index.nodes_at(1010, 10)
+    assert conn not in index.connections_in_rect(900, 0, 1000, 10)
@@ -1,21 +1,216 @@
 from collections import deque
 import copy
 
+
+class UndoCommand:
+    """
+    Base class for reversible edits.
+
+    A command only stores what the edit touched, so recording it costs
+    O(size of the change) instead of a copy of the whole graph.
+    """
+    def apply(self, editor):
+        raise NotImplementedError
+
+    def revert(self, editor):
+        raise NotImplementedError
+
+    def referenced_nodes(self):
+        """The nodes apply() and revert() work on; they must stay the scene's node objects."""
+        return ()
+
+
+class AddNodeCommand(UndoCommand):
+    def __init__(self, node):
+        self.node = node
+
+    def apply(self, editor):
+        editor._insert_node(self.node)
+
+    def revert(self, editor):
+        editor._discard_node(self.node)
+
+    def referenced_nodes(self):
+        return (self.node,)
+
+    def __repr__(self):
+        return f"AddNodeCommand(id={self.node.id})"
+
+
+class RemoveNodeCommand(UndoCommand):
+    def __init__(self, node, connections=(), index=None):
+        self.node = node
+        # Connections touching the node, restored together with it
+        self.connections = list(connections)
+        self.index = index  # z-order position to restore the node at
+
+    def apply(self, editor):
+        for conn in self.connections:
+            editor._discard_connection(conn)
+        editor._discard_node(self.node)
+
+    def revert(self, editor):
+        editor._insert_node(self.node, index=self.index)
+        for conn in self.connections:
+            editor._insert_connection(conn)
+
+    def referenced_nodes(self):
+        return [self.node] + [end for conn in self.connections for end in (conn.start_node, conn.end_node)]
+
+    def __repr__(self):
+        return f"RemoveNodeCommand(id={self.node.id}, connections={len(self.connections)})"
+
+
+class MoveNodeCommand(UndoCommand):
+    def __init__(self, node, old_pos, new_pos):
+        self.node = node
+        self.old_pos = old_pos
+        self.new_pos = new_pos
+
+    def apply(self, editor):
+        editor._set_node_position(self.node, *self.new_pos)
+
+    def revert(self, editor):
+        editor._set_node_position(self.node, *self.old_pos)
+
+    def referenced_nodes(self):
+        return (self.node,)
+
+    def __repr__(self):
+        return f"MoveNodeCommand(id={self.node.id}, {self.old_pos} -> {self.new_pos})"
+
+
+class MoveNodesCommand(UndoCommand):
+    """Move of a group of nodes, e.g. a drag of the selection; positions are (xs, ys) arrays in node order."""
+    def __init__(self, nodes, old_positions, new_positions):
+        self.nodes = list(nodes)
+        self.old_positions = old_positions
+        self.new_positions = new_positions
+
+    def apply(self, editor):
+        editor._set_node_positions(self.nodes, *self.new_positions)
+
+    def revert(self, editor):
+        editor._set_node_positions(self.nodes, *self.old_positions)
+
+    def referenced_nodes(self):
+        return self.nodes
+
+    def __repr__(self):
+        return f"MoveNodesCommand({len(self.nodes)} nodes)"
+
+
+class RenameNodeCommand(UndoCommand):
+    def __init__(self, node, old_name, new_name):
+        self.node = node
+        self.old_name = old_name
+        self.new_name = new_name
+
+    def apply(self, editor):
+        editor._set_node_name(self.node, self.new_name)
+
+    def revert(self, editor):
+        editor._set_node_name(self.node, self.old_name)
+
+    def referenced_nodes(self):
+        return (self.node,)
+
+    def __repr__(self):
+        return f"RenameNodeCommand(id={self.node.id}, {self.old_name!r} -> {self.new_name!r})"
+
+
+class AddConnectionCommand(UndoCommand):
+    def __init__(self, connection):
+        self.connection = connection
+
+    def apply(self, editor):
+        editor._insert_connection(self.connection)
+
+    def revert(self, editor):
+        editor._discard_connection(self.connection)
+
+    def referenced_nodes(self):
+        return (self.connection.start_node, self.connection.end_node)
+
+    def __repr__(self):
+        return f"AddConnectionCommand({self.connection.start_node.id} -> {self.connection.end_node.id})"
+
+
+class RemoveConnectionCommand(AddConnectionCommand):
+    def apply(self, editor):
+        super().revert(editor)
+
+    def revert(self, editor):
+        super().apply(editor)
+
+    def __repr__(self):
+        return f"RemoveConnectionCommand({self.connection.start_node.id} -> {self.connection.end_node.id})"
+
+
+class RelabelConnectionCommand(UndoCommand):
+    def __init__(self, connection, old_label, new_label):
+        self.connection = connection
+        self.old_label = old_label
+        self.new_label = new_label
+
+    def apply(self, editor):
+        editor._set_connection_label(self.connection, self.new_label)
+
+    def revert(self, editor):
+        editor._set_connection_label(self.connection, self.old_label)
+
+    def referenced_nodes(self):
+        return (self.connection.start_node, self.connection.end_node)
+
+    def __repr__(self):
+        return (f"RelabelConnectionCommand({self.connection.start_node.id} -> {self.connection.end_node.id}, "
+                f"{self.old_label!r} -> {self.new_label!r})")
+
+
 class UndoStack:
+    """
+    Holds undo and redo entries.
+
+    An entry is either an UndoCommand or a graph snapshot. Snapshots are
+    deep-copied on push, exactly as before commands existed.
+    """
     def __init__(self, max_depth=20):
         self.stack = deque(maxlen=max_depth)
+        self.redo_stack = deque(maxlen=max_depth)
 
-    def push(self, nx_graph):
-        # Save a deep copy of the graph to avoid modifying the original
-        self.stack.append(copy.deepcopy(nx_graph))
+    def push(self, item, clear_redo=True, copy_graph=True):
+        # copy_graph=False hands over a graph nobody else changes, e.g. a new NodeEditor.nx_graph
+        if not isinstance(item, UndoCommand) and copy_graph:
+            # Save a deep copy of the graph to avoid modifying the original
+            item = copy.deepcopy(item)
+        self.stack.append(item)
+        if clear_redo:
+            # A new edit invalidates everything that could be redone
+            self.redo_stack.clear()
 
     def pop(self):
         if self.stack:
             return self.stack.pop()
         return None
 
+    def push_redo(self, item, copy_graph=True):
+        if not isinstance(item, UndoCommand) and copy_graph:
+            item = copy.deepcopy(item)
+        self.redo_stack.append(item)
+
+    def pop_redo(self):
+        if self.redo_stack:
+            return self.redo_stack.pop()
+        return None
+
     def clear(self):
         self.stack.clear()
+        self.redo_stack.clear()
+
+    def referenced_nodes(self):
+        """The nodes the commands on both stacks work on."""
+        return {node for stack in (self.stack, self.redo_stack) for item in stack
+                if isinstance(item, UndoCommand) for node in item.referenced_nodes()}
 
     def count_items_in_stack(self):
         return len(self.stack)
@@ -25,3 +220,6 @@ class UndoStack:
 
     def is_not_empty(self):
         return len(self.stack) > 0
+
+    def can_redo(self):
+        return len(self.redo_stack) > 0